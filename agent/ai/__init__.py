@@ -1,8 +1,10 @@
 from .types import AIMetricV1, AIResultEnvelope
 from .queue_store import AIQueueStore
+from .queue_maintenance import QueueMaintenance
 
 __all__ = [
     "AIMetricV1",
     "AIResultEnvelope",
     "AIQueueStore",
+    "QueueMaintenance",
 ]
@@ -0,0 +1,169 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any
+
+from agent.ai.feature_engineering.simhash import FINGERPRINT_BITS, hamming
+from agent.config import (
+    AI_ACTIVITY_INDEX_BANDS,
+    AI_ACTIVITY_INDEX_CAPACITY,
+    AI_ACTIVITY_MAX_HAMMING,
+)
+
+
+@dataclass
+class ActivityMatch:
+    cluster_id: str
+    seen_before: bool
+    distance: int | None = None
+    cached: Any = None
+
+
+class _Entry:
+    __slots__ = ("fingerprint", "cluster_id", "cached")
+
+    def __init__(self, fingerprint: int, cluster_id: str, cached=None):
+        self.fingerprint = fingerprint
+        self.cluster_id = cluster_id
+        self.cached = cached
+
+
+class ActivityIndex:
+    """
+    In-memory LSH index over recent SimHash fingerprints.
+
+    Fingerprints are split into `bands` equal bit ranges, each with its
+    own exact-match table. Two fingerprints within `max_distance` bits
+    share at least one band whenever max_distance < bands (pigeonhole),
+    so lookups only compare against a handful of candidates and never
+    miss a near-duplicate.
+
+    A fingerprint joins the cluster of its nearest indexed neighbour, or
+    founds a new cluster whose id is the founder's fingerprint in hex
+    (stable across agent restarts). Entries are evicted least recently
+    seen first once `capacity` is reached.
+    """
+
+    def __init__(
+        self,
+        capacity: int = AI_ACTIVITY_INDEX_CAPACITY,
+        max_distance: int = AI_ACTIVITY_MAX_HAMMING,
+        bands: int = AI_ACTIVITY_INDEX_BANDS,
+    ):
+        if FINGERPRINT_BITS % bands:
+            raise ValueError("bands must divide the fingerprint width")
+
+        self.capacity = max(1, capacity)
+        self.max_distance = max_distance
+        self.band_bits = FINGERPRINT_BITS // bands
+        self.band_mask = (1 << self.band_bits) - 1
+        self.bands = bands
+
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+        self._tables: list[dict[int, set[int]]] = [{} for _ in range(bands)]
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, fingerprint: int) -> ActivityMatch | None:
+        """
+        Nearest indexed fingerprint within max_distance, without recording.
+        """
+        with self._lock:
+            nearest = self._nearest(fingerprint)
+            if nearest is None:
+                return None
+            entry, distance = nearest
+            return ActivityMatch(entry.cluster_id, True, distance, entry.cached)
+
+    def observe(self, fingerprint: int, cached=None) -> ActivityMatch:
+        """
+        Looks up the fingerprint, then records it as seen.
+
+        cached is stored with the entry (e.g. reusable scoring results)
+        and returned by later matches; None keeps a previous value.
+        """
+        with self._lock:
+            nearest = self._nearest(fingerprint)
+            if nearest is None:
+                cluster_id = f"{fingerprint:016x}"
+                match = ActivityMatch(cluster_id=cluster_id, seen_before=False)
+            else:
+                entry, distance = nearest
+                cluster_id = entry.cluster_id
+                match = ActivityMatch(
+                    cluster_id=cluster_id,
+                    seen_before=True,
+                    distance=distance,
+                    cached=entry.cached,
+                )
+
+            self._insert(fingerprint, cluster_id, cached)
+            return match
+
+    def remember(self, fingerprint: int, cached):
+        """
+        Attaches cached results to an already indexed fingerprint.
+        """
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is not None:
+                entry.cached = cached
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "fingerprints": len(self._entries),
+                "clusters": len({entry.cluster_id for entry in self._entries.values()}),
+            }
+
+    # ---------------------------
+    # Internal
+    # ---------------------------
+
+    def _band_keys(self, fingerprint: int):
+        for band in range(self.bands):
+            yield band, (fingerprint >> (band * self.band_bits)) & self.band_mask
+
+    def _nearest(self, fingerprint: int):
+        exact = self._entries.get(fingerprint)
+        if exact is not None:
+            return exact, 0
+
+        candidates = set()
+        for band, key in self._band_keys(fingerprint):
+            bucket = self._tables[band].get(key)
+            if bucket:
+                candidates.update(bucket)
+
+        best = None
+        best_distance = self.max_distance + 1
+        for candidate in candidates:
+            distance = hamming(candidate, fingerprint)
+            if distance < best_distance:
+                best, best_distance = candidate, distance
+
+        if best is None:
+            return None
+        return self._entries[best], best_distance
+
+    def _insert(self, fingerprint: int, cluster_id: str, cached):
+        entry = self._entries.get(fingerprint)
+        if entry is not None:
+            self._entries.move_to_end(fingerprint)
+            if cached is not None:
+                entry.cached = cached
+            return
+
+        self._entries[fingerprint] = _Entry(fingerprint, cluster_id, cached)
+        for band, key in self._band_keys(fingerprint):
+            self._tables[band].setdefault(key, set()).add(fingerprint)
+
+        while len(self._entries) > self.capacity:
+            evicted, _ = self._entries.popitem(last=False)
+            for band, key in self._band_keys(evicted):
+                bucket = self._tables[band][key]
+                bucket.discard(evicted)
+                if not bucket:
+                    del self._tables[band][key]
@@ -1,64 +1,218 @@
-import math
 import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
 from pathlib import Path
 
+import numpy as np
+
+from agent.ai.feature_engineering.text_features import FEATURE_NAMES
+from agent.config import (
+    AI_BASELINE_FLUSH_EVERY,
+    AI_BASELINE_FLUSH_INTERVAL_SECONDS,
+    AI_BASELINE_HALF_LIFE_SECONDS,
+    AI_BASELINE_HOUR_OF_WEEK_BUCKETS,
+    AI_BASELINE_MIN_BUCKET_SAMPLES,
+    AI_BASELINE_MIN_SAMPLES,
+)
+
+
+HOURS_PER_WEEK = 7 * 24
+GLOBAL_BUCKET = 0
+
+# Arrays persisted per (feature, bucket) cell.
+ARRAY_NAMES = ("count", "weight", "weight_sq", "mean", "m2", "last_ts")
+
+
+def hour_of_week(timestamp: float) -> int:
+    """
+    0 = Monday 00:00-00:59 local time, 167 = Sunday 23:00-23:59.
+    """
+    local = time.localtime(timestamp)
+    return local.tm_wday * 24 + local.tm_hour
+
+
+@dataclass(frozen=True)
+class BaselineSnapshot:
+    """
+    Immutable, precomputed view of the baseline published after each update.
+    Readers grab `store.snapshot` once and never take the store lock.
+    """
+
+    feature_names: tuple[str, ...]
+    feature_index: dict[str, int]
+    mean: np.ndarray
+    std: np.ndarray
+    count: np.ndarray
+    ready: bool
+    hour_of_week_buckets: bool
+    min_bucket_samples: int
+
+    def lookup(self, timestamp: float | None = None):
+        """
+        Returns (mean, std, count) arrays over feature_names.
+
+        Each feature uses its hour-of-week bucket once that bucket has
+        `min_bucket_samples`, and the global bucket otherwise.
+        """
+        rows = np.arange(len(self.feature_names))
+        columns = np.full(len(rows), GLOBAL_BUCKET)
+
+        if self.hour_of_week_buckets:
+            timestamp = time.time() if timestamp is None else timestamp
+            bucket = 1 + hour_of_week(timestamp)
+            columns = np.where(
+                self.count[:, bucket] >= self.min_bucket_samples,
+                bucket,
+                GLOBAL_BUCKET,
+            )
+
+        return self.mean[rows, columns], self.std[rows, columns], self.count[rows, columns]
+
+    def stats(self, feature_name: str):
+        """
+        Returns mean, std, count for a feature (global bucket).
+        """
+        row = self.feature_index.get(feature_name)
+        if row is None or self.count[row, GLOBAL_BUCKET] < 2:
+            return None
+
+        return {
+            "mean": float(self.mean[row, GLOBAL_BUCKET]),
+            "std": float(self.std[row, GLOBAL_BUCKET]),
+            "count": int(self.count[row, GLOBAL_BUCKET]),
+        }
+
 
 class BaselineStore:
     """
     Maintains running statistics (mean + std) for numeric features.
-    Uses Welford's online algorithm for stability.
+    Uses an exponentially decayed form of Welford's online algorithm.
+
+    Statistics are kept in fixed NumPy arrays indexed by
+    (feature, bucket). Bucket 0 is the global baseline; when hour-of-week
+    bucketing is enabled, buckets 1..168 hold one baseline per local
+    hour of the week. Older samples lose half their weight every
+    `half_life_seconds` (None disables decay).
+
+    Readers use `snapshot`, an immutable BaselineSnapshot with std and
+    readiness precomputed, refreshed after every update. Readiness is
+    sticky: once any of `ready_features` reaches `min_ready_samples`
+    in the global bucket it stays true.
+
+    Arrays are flushed to a SQLite (WAL) file in one transaction every
+    `flush_every` updates or `flush_interval` seconds, whichever comes
+    first, so a crash never leaves a half-written baseline behind.
     """
 
-    def __init__(self, storage_path: str):
-        self.path = Path(storage_path)
-        self.data = self._load()
+    def __init__(
+        self,
+        storage_path: str,
+        logger=None,
+        feature_names=FEATURE_NAMES,
+        half_life_seconds: float | None = AI_BASELINE_HALF_LIFE_SECONDS,
+        hour_of_week_buckets: bool = AI_BASELINE_HOUR_OF_WEEK_BUCKETS,
+        min_bucket_samples: int = AI_BASELINE_MIN_BUCKET_SAMPLES,
+        ready_features=None,
+        min_ready_samples: int = AI_BASELINE_MIN_SAMPLES,
+        flush_every: int = AI_BASELINE_FLUSH_EVERY,
+        flush_interval: float = AI_BASELINE_FLUSH_INTERVAL_SECONDS,
+    ):
+        path = Path(storage_path)
+        self.path = path.with_suffix(".sqlite3") if path.suffix == ".json" else path
+        self.legacy_path = self.path.with_suffix(".json")
+        self.logger = logger
+
+        self.feature_names = tuple(feature_names)
+        self.feature_index = {name: index for index, name in enumerate(self.feature_names)}
+        self.half_life_seconds = half_life_seconds
+        self.hour_of_week_buckets = hour_of_week_buckets
+        self.bucket_count = 1 + (HOURS_PER_WEEK if hour_of_week_buckets else 0)
+        self.min_bucket_samples = min_bucket_samples
+        self.ready_rows = np.array(
+            [
+                self.feature_index[name]
+                for name in (ready_features or self.feature_names)
+                if name in self.feature_index
+            ],
+            dtype=np.int64,
+        )
+        self.min_ready_samples = min_ready_samples
+        self._ready = False
+        self.flush_every = max(1, flush_every)
+        self.flush_interval = flush_interval
+
+        shape = (len(self.feature_names), self.bucket_count)
+        self.count = np.zeros(shape, dtype=np.int64)
+        self.weight = np.zeros(shape)
+        self.weight_sq = np.zeros(shape)
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+        self.last_ts = np.zeros(shape)
+
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._pending_updates = 0
+        self._last_flush = time.monotonic()
+        self._flush_stats = {
+            "flushes": 0,
+            "bytes_written": 0,
+            "last_ms": 0.0,
+            "max_ms": 0.0,
+            "total_ms": 0.0,
+        }
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = self._connect()
+        self._load()
+        self.snapshot = self._build_snapshot()
 
     # ---------------------------
     # Public API
     # ---------------------------
 
-    def update(self, features: dict):
+    def update(self, features: dict, timestamp: float | None = None):
         """
         Update baseline statistics with new feature values.
-        Only numeric features are tracked.
+        Only numeric values of known features are tracked.
         """
+        timestamp = time.time() if timestamp is None else timestamp
+        values = self._vector(features)
+        rows = np.flatnonzero(~np.isnan(values))
 
-        for key, value in features.items():
-            if not isinstance(value, (int, float)):
-                continue
+        if rows.size:
+            with self._lock:
+                for bucket in self._buckets_for(timestamp):
+                    self._update_bucket(rows, bucket, values[rows], timestamp)
 
-            stats = self.data.setdefault(
-                key,
-                {"count": 0, "mean": 0.0, "M2": 0.0},
-            )
+                self.snapshot = self._build_snapshot()
+                self._dirty = True
+                self._pending_updates += 1
+                due = (
+                    self._pending_updates >= self.flush_every
+                    or time.monotonic() - self._last_flush >= self.flush_interval
+                )
 
-            stats["count"] += 1
-            count = stats["count"]
+            if due:
+                self.flush()
 
-            delta = value - stats["mean"]
-            stats["mean"] += delta / count
-            delta2 = value - stats["mean"]
-            stats["M2"] += delta * delta2
-
-        self._save()
+    def lookup(self, timestamp: float | None = None):
+        """
+        Returns (mean, std, count) arrays over feature_names
+        from the current snapshot.
+        """
+        return self.snapshot.lookup(timestamp)
 
     def get_stats(self, feature_name: str):
         """
-        Returns mean, std, count for a feature.
+        Returns mean, std, count for a feature (global bucket).
         """
-        stats = self.data.get(feature_name)
-
-        if not stats or stats["count"] < 2:
-            return None
+        return self.snapshot.stats(feature_name)
 
-        variance = stats["M2"] / (stats["count"] - 1)
-        std = math.sqrt(variance) if variance > 0 else 0.0
-
-        return {
-            "mean": stats["mean"],
-            "std": std,
-            "count": stats["count"],
-        }
+    @property
+    def ready(self) -> bool:
+        return self.snapshot.ready
 
     def z_score(self, feature_name: str, value: float):
         """
@@ -71,19 +225,247 @@ class BaselineStore:
 
         return abs(value - stats["mean"]) / stats["std"]
 
+    def flush(self):
+        """
+        Writes all baseline arrays in a single transaction.
+        """
+        with self._lock:
+            if not self._dirty:
+                self._last_flush = time.monotonic()
+                self._pending_updates = 0
+                return
+
+            blobs = [
+                (name, getattr(self, name).tobytes())
+                for name in ARRAY_NAMES
+            ]
+            meta = [
+                ("feature_names", json.dumps(self.feature_names)),
+                ("bucket_count", str(self.bucket_count)),
+            ]
+
+            started = time.perf_counter()
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO baseline_arrays (name, data) VALUES (?, ?)",
+                    blobs,
+                )
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO baseline_meta (key, value) VALUES (?, ?)",
+                    meta,
+                )
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            self._dirty = False
+            self._pending_updates = 0
+            self._last_flush = time.monotonic()
+
+            stats = self._flush_stats
+            stats["flushes"] += 1
+            stats["bytes_written"] += sum(len(data) for _, data in blobs)
+            stats["last_ms"] = round(elapsed_ms, 3)
+            stats["max_ms"] = round(max(stats["max_ms"], elapsed_ms), 3)
+            stats["total_ms"] = round(stats["total_ms"] + elapsed_ms, 3)
+
+    def flush_report(self) -> dict:
+        """
+        Flush cost so far, suitable for health snapshots.
+        """
+        with self._lock:
+            report = dict(self._flush_stats)
+            report["pending_updates"] = self._pending_updates
+        report["avg_ms"] = (
+            round(report["total_ms"] / report["flushes"], 3) if report["flushes"] else 0.0
+        )
+        return report
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+    # ---------------------------
+    # Statistics
+    # ---------------------------
+
+    def _vector(self, features: dict) -> np.ndarray:
+        values = np.full(len(self.feature_names), np.nan)
+        for key, value in features.items():
+            row = self.feature_index.get(key)
+            if row is not None and isinstance(value, (int, float)) and not isinstance(value, bool):
+                values[row] = value
+        return values
+
+    def _buckets_for(self, timestamp: float) -> tuple[int, ...]:
+        if self.hour_of_week_buckets:
+            return (GLOBAL_BUCKET, 1 + hour_of_week(timestamp))
+        return (GLOBAL_BUCKET,)
+
+    def _update_bucket(self, rows: np.ndarray, bucket: int, values: np.ndarray, timestamp: float):
+        decay = np.ones(rows.size)
+        if self.half_life_seconds:
+            elapsed = np.maximum(timestamp - self.last_ts[rows, bucket], 0.0)
+            seen = self.count[rows, bucket] > 0
+            decay = np.where(seen, 0.5 ** (elapsed / self.half_life_seconds), 1.0)
+
+        weight = decay * self.weight[rows, bucket] + 1.0
+        mean = self.mean[rows, bucket]
+        delta = values - mean
+        new_mean = mean + delta / weight
+
+        self.weight[rows, bucket] = weight
+        self.weight_sq[rows, bucket] = decay * decay * self.weight_sq[rows, bucket] + 1.0
+        self.m2[rows, bucket] = decay * self.m2[rows, bucket] + delta * (values - new_mean)
+        self.mean[rows, bucket] = new_mean
+        self.count[rows, bucket] += 1
+        # Frames can reach the baseline slightly out of capture order.
+        self.last_ts[rows, bucket] = np.maximum(self.last_ts[rows, bucket], timestamp)
+
+    def _std(self) -> np.ndarray:
+        # Unbiased weighted variance: M2 / (W - W2 / W); equals
+        # M2 / (n - 1) when decay is disabled.
+        safe_weight = np.where(self.weight > 0, self.weight, 1.0)
+        denominator = self.weight - self.weight_sq / safe_weight
+        valid = (self.count >= 2) & (denominator > 0)
+
+        variance = np.divide(
+            self.m2,
+            denominator,
+            out=np.zeros(self.m2.shape),
+            where=valid,
+        )
+        return np.sqrt(np.maximum(variance, 0.0))
+
+    def _build_snapshot(self) -> BaselineSnapshot:
+        if not self._ready and self.ready_rows.size:
+            self._ready = bool(
+                (self.count[self.ready_rows, GLOBAL_BUCKET] >= self.min_ready_samples).any()
+            )
+
+        mean = self.mean.copy()
+        std = self._std()
+        count = self.count.copy()
+        for array in (mean, std, count):
+            array.flags.writeable = False
+
+        return BaselineSnapshot(
+            feature_names=self.feature_names,
+            feature_index=self.feature_index,
+            mean=mean,
+            std=std,
+            count=count,
+            ready=self._ready,
+            hour_of_week_buckets=self.hour_of_week_buckets,
+            min_bucket_samples=self.min_bucket_samples,
+        )
+
     # ---------------------------
     # Persistence
     # ---------------------------
 
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS baseline_arrays (
+                    name TEXT PRIMARY KEY,
+                    data BLOB NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS baseline_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL
+                )
+                """
+            )
+        return conn
+
     def _load(self):
-        if not self.path.exists():
-            return {}
+        meta = dict(self._conn.execute("SELECT key, value FROM baseline_meta").fetchall())
+        arrays = dict(self._conn.execute("SELECT name, data FROM baseline_arrays").fetchall())
+
+        if meta and set(ARRAY_NAMES) <= set(arrays):
+            self._restore_arrays(meta, arrays)
+            return
+
+        legacy_rows = self._legacy_table_rows()
+        if not legacy_rows and self.legacy_path.exists():
+            legacy_rows = self._legacy_json_rows()
 
+        if legacy_rows:
+            self._import_global_stats(legacy_rows)
+            self._dirty = True
+            self.flush()
+            self._finish_legacy_migration()
+
+    def _restore_arrays(self, meta: dict, arrays: dict):
+        stored_names = json.loads(meta["feature_names"])
+        stored_buckets = int(meta["bucket_count"])
+        shape = (len(stored_names), stored_buckets)
+        # Bucketing may have been toggled; the global bucket always carries over.
+        buckets = self.bucket_count if stored_buckets == self.bucket_count else 1
+
+        for name in ARRAY_NAMES:
+            dtype = getattr(self, name).dtype
+            stored = np.frombuffer(arrays[name], dtype=dtype).reshape(shape)
+            target = getattr(self, name)
+            for stored_row, feature in enumerate(stored_names):
+                row = self.feature_index.get(feature)
+                if row is not None:
+                    target[row, :buckets] = stored[stored_row, :buckets]
+
+    def _legacy_table_rows(self) -> list[tuple]:
+        exists = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'baseline_stats'"
+        ).fetchone()
+        if not exists:
+            return []
+        return self._conn.execute("SELECT feature, count, mean, m2 FROM baseline_stats").fetchall()
+
+    def _legacy_json_rows(self) -> list[tuple]:
         try:
-            return json.loads(self.path.read_text())
-        except Exception:
-            return {}
+            data = json.loads(self.legacy_path.read_text())
+            return [
+                (key, stats["count"], stats["mean"], stats["M2"])
+                for key, stats in data.items()
+            ]
+        except Exception as exc:
+            corrupt_path = self.legacy_path.with_name(self.legacy_path.name + ".corrupt")
+            self.legacy_path.replace(corrupt_path)
+            self._warn(
+                "Baseline JSON unreadable; starting a fresh baseline",
+                {"path": str(corrupt_path), "error": str(exc)},
+            )
+            return []
 
-    def _save(self):
-        self.path.parent.mkdir(parents=True, exist_ok=True)
-        self.path.write_text(json.dumps(self.data))
+    def _import_global_stats(self, rows: list[tuple]):
+        """
+        Lifetime Welford stats map onto undecayed weights: W = W2 = n.
+        """
+        now = time.time()
+        for feature, count, mean, m2 in rows:
+            row = self.feature_index.get(feature)
+            if row is None:
+                continue
+            self.count[row, GLOBAL_BUCKET] = count
+            self.weight[row, GLOBAL_BUCKET] = count
+            self.weight_sq[row, GLOBAL_BUCKET] = count
+            self.mean[row, GLOBAL_BUCKET] = mean
+            self.m2[row, GLOBAL_BUCKET] = m2
+            self.last_ts[row, GLOBAL_BUCKET] = now
+
+    def _finish_legacy_migration(self):
+        with self._conn:
+            self._conn.execute("DROP TABLE IF EXISTS baseline_stats")
+        if self.legacy_path.exists():
+            self.legacy_path.replace(self.legacy_path.with_name(self.legacy_path.name + ".migrated"))
+
+    def _warn(self, message: str, metadata: dict):
+        if self.logger:
+            self.logger.warning(message, extra={"metadata": metadata})
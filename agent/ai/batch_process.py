@@ -0,0 +1,173 @@
+"""
+Offline batch processing for screenshot corpora.
+
+Runs the AIService pipeline over a directory or glob of images using a
+process pool, streams one AIMetricV1 JSON object per line (NDJSON) and
+prints throughput plus per-stage latency percentiles when done.
+
+Usage:
+    python -m agent.ai.batch_process "screens/**/*.png" -o metrics.ndjson
+    python -m agent.ai.batch_process screens/ --workers 8 --baseline-dir baselines/
+
+Each worker process keeps its own baseline (worker-<pid> under
+--baseline-dir, or a temporary directory discarded at exit), so anomaly
+scores start in static mode just like a fresh agent.
+"""
+
+import argparse
+import glob
+import json
+import logging
+import multiprocessing
+import multiprocessing.util
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp"}
+PERCENTILES = (50, 90, 99)
+
+_worker_service = None
+
+
+def discover_images(inputs, recursive: bool = False) -> list[str]:
+    """
+    Expands directories and glob patterns into a sorted list of image paths.
+    """
+    paths = set()
+    for entry in inputs:
+        path = Path(entry)
+        if path.is_dir():
+            candidates = path.rglob("*") if recursive else path.iterdir()
+        else:
+            candidates = (Path(match) for match in glob.glob(entry, recursive=True))
+
+        for candidate in candidates:
+            if candidate.is_file() and candidate.suffix.lower() in IMAGE_SUFFIXES:
+                paths.add(str(candidate))
+
+    return sorted(paths)
+
+
+def _init_worker(baseline_dir: str):
+    global _worker_service
+
+    from agent.services.ai_service import AIService
+
+    logger = logging.getLogger("worksight-batch")
+    agent_id = f"worker-{os.getpid()}"
+    _worker_service = AIService(
+        logger,
+        agent_id,
+        baseline_path=str(Path(baseline_dir) / f"{agent_id}.sqlite3"),
+    )
+    if multiprocessing.parent_process() is not None:
+        # Persist the baseline once, when the pool worker exits. Workers end
+        # with os._exit(), which skips atexit but runs multiprocessing finalizers.
+        multiprocessing.util.Finalize(None, _worker_service.baseline.flush, exitpriority=10)
+
+
+def _process_one(image_path: str) -> dict:
+    return _worker_service.process_screenshot(image_path).to_dict()
+
+
+def summarize(latencies: dict[str, list[float]], count: int, elapsed: float) -> str:
+    lines = [
+        f"processed {count} images in {elapsed:.2f}s "
+        f"({count / elapsed if elapsed > 0 else 0.0:.2f} images/s)",
+    ]
+    header = "".join(f"{f'p{p}':>10}" for p in PERCENTILES)
+    lines.append(f"{'stage':<14}{header}  (ms)")
+
+    for stage, values in latencies.items():
+        if not values:
+            continue
+        points = np.percentile(np.asarray(values), PERCENTILES)
+        lines.append(f"{stage:<14}" + "".join(f"{value:>10.2f}" for value in points))
+
+    return "\n".join(lines)
+
+
+def run(image_paths, output, workers: int, baseline_dir: str, chunksize: int = 4) -> dict:
+    """
+    Processes images and writes NDJSON rows to output (a text stream).
+    Returns collected per-stage latencies in milliseconds.
+    """
+    latencies: dict[str, list[float]] = {"total": []}
+    statuses: dict[str, int] = {}
+
+    if workers <= 1:
+        _init_worker(baseline_dir)
+        results = map(_process_one, image_paths)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(baseline_dir,),
+        )
+        results = executor.map(_process_one, image_paths, chunksize=chunksize)
+
+    try:
+        for row in results:
+            output.write(json.dumps(row) + "\n")
+
+            model_info = row.get("model_info") or {}
+            latencies["total"].append(model_info.get("latency_ms", 0.0))
+            for stage, value in (model_info.get("stage_latency_ms") or {}).items():
+                latencies.setdefault(stage, []).append(value)
+
+            status = row.get("pipeline_status", "unknown")
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        elif _worker_service is not None:
+            _worker_service.baseline.flush()
+
+    return {"latencies": latencies, "statuses": statuses}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run the WorkSight AI pipeline over a screenshot corpus.",
+    )
+    parser.add_argument("inputs", nargs="+", help="image directories or glob patterns")
+    parser.add_argument("-o", "--output", default="-", help="NDJSON output path (default: stdout)")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("-r", "--recursive", action="store_true", help="recurse into directories")
+    parser.add_argument("--baseline-dir", help="keep per-worker baselines in this directory")
+    parser.add_argument("--chunksize", type=int, default=4, help="images handed to a worker at once")
+    args = parser.parse_args(argv)
+
+    image_paths = discover_images(args.inputs, recursive=args.recursive)
+    if not image_paths:
+        print("no images found", file=sys.stderr)
+        return 1
+
+    with tempfile.TemporaryDirectory(prefix="worksight-baselines-") as scratch_dir:
+        baseline_dir = args.baseline_dir or scratch_dir
+        Path(baseline_dir).mkdir(parents=True, exist_ok=True)
+
+        output = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+        started = time.perf_counter()
+        try:
+            report = run(image_paths, output, args.workers, baseline_dir, args.chunksize)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+        elapsed = time.perf_counter() - started
+
+    print(summarize(report["latencies"], len(image_paths), elapsed), file=sys.stderr)
+    print(f"pipeline status: {report['statuses']}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from agent.config import AI_PIPELINE_TIMEOUT_SECONDS, AI_STAGE_BUDGETS_SECONDS
+
+
+# Upper edges of the latency-to-budget ratio histogram buckets.
+BUDGET_RATIO_EDGES = (0.25, 0.5, 1.0, 2.0)
+HISTOGRAM_WINDOW = 1024
+
+
+class Deadline:
+    """
+    Per-frame time budget carried through the AI pipeline stages.
+
+    Stages run back to back; lap(stage) closes the current stage, records
+    its wall time and reports whether it overran its own budget or the
+    total deadline. Long stages that can be interrupted (OCR) ask
+    timeout_for(stage) how long they may run.
+
+    For a batch of `items` frames processed together, budgets and the
+    total apply per frame: stage time is divided by items before it is
+    checked and recorded.
+
+    `started` (a time.perf_counter() value) resumes a deadline begun in
+    an earlier pipeline stage, so time spent there and in between counts
+    against the total.
+    """
+
+    def __init__(
+        self,
+        budgets: dict[str, float] | None = None,
+        total_seconds: float = AI_PIPELINE_TIMEOUT_SECONDS,
+        histogram: "StageLatencyHistogram | None" = None,
+        items: int = 1,
+        started: float | None = None,
+    ):
+        self.budgets = AI_STAGE_BUDGETS_SECONDS if budgets is None else budgets
+        self.total_seconds = total_seconds
+        self.histogram = histogram
+        self.items = max(1, items)
+
+        self._mark = time.perf_counter()
+        self.started = self._mark if started is None else started
+        self.timings = {}
+        self.overrun_stage = None
+
+    def remaining(self) -> float:
+        return max(0.0, self.total_seconds - (time.perf_counter() - self.started) / self.items)
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def timeout_for(self, stage: str) -> float:
+        budget = self.budgets.get(stage)
+        remaining = self.remaining()
+        return remaining if budget is None else min(budget, remaining)
+
+    def lap(self, stage: str) -> bool:
+        """
+        Ends `stage`. Returns True (and remembers the first such stage)
+        when it overran its budget or the total deadline.
+        """
+        now = time.perf_counter()
+        elapsed = (now - self._mark) / self.items
+        self._mark = now
+        self.timings[stage] = round(elapsed * 1000, 3)
+
+        budget = self.budgets.get(stage)
+        if self.histogram is not None:
+            self.histogram.record(stage, elapsed, budget, self.items)
+
+        overran = (budget is not None and elapsed > budget) or self.expired()
+        if overran and self.overrun_stage is None:
+            self.overrun_stage = stage
+        return overran
+
+    def mark_overrun(self, stage: str):
+        if self.overrun_stage is None:
+            self.overrun_stage = stage
+
+
+class StageLatencyHistogram:
+    """
+    Stage latency against budget, shared by all pipeline calls.
+
+    Keeps overrun counts, a histogram of latency / budget ratios
+    (BUDGET_RATIO_EDGES) and percentiles over the last HISTOGRAM_WINDOW
+    samples per stage.
+    """
+
+    def __init__(self, window: int = HISTOGRAM_WINDOW):
+        self.window = window
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float, budget: float | None, count: int = 1):
+        """
+        Adds `count` samples of `seconds` each (a batch, amortized per frame).
+        """
+        with self._lock:
+            entry = self._stages.get(stage)
+            if entry is None:
+                entry = self._stages[stage] = {
+                    "budget": budget,
+                    "count": 0,
+                    "overruns": 0,
+                    "buckets": [0] * (len(BUDGET_RATIO_EDGES) + 1),
+                    "recent": deque(maxlen=self.window),
+                }
+
+            entry["budget"] = budget
+            entry["count"] += count
+            entry["recent"].append(seconds)
+            if budget:
+                ratio = seconds / budget
+                entry["overruns"] += count if ratio > 1.0 else 0
+                entry["buckets"][int(np.searchsorted(BUDGET_RATIO_EDGES, ratio))] += count
+
+    def report(self) -> dict:
+        with self._lock:
+            snapshot = {
+                stage: {**entry, "recent": np.asarray(entry["recent"]) * 1000}
+                for stage, entry in self._stages.items()
+            }
+
+        labels = [f"<={edge:g}x" for edge in BUDGET_RATIO_EDGES] + [f">{BUDGET_RATIO_EDGES[-1]:g}x"]
+        report = {}
+        for stage, entry in snapshot.items():
+            recent = entry["recent"]
+            p50, p95, p99 = np.percentile(recent, [50, 95, 99]) if recent.size else (0.0, 0.0, 0.0)
+            report[stage] = {
+                "budget_ms": round(entry["budget"] * 1000, 3) if entry["budget"] else None,
+                "count": entry["count"],
+                "overruns": entry["overruns"],
+                "p50_ms": round(float(p50), 3),
+                "p95_ms": round(float(p95), 3),
+                "p99_ms": round(float(p99), 3),
+                "budget_ratio_histogram": dict(zip(labels, entry["buckets"])),
+            }
+        return report
@@ -1,3 +1,4 @@
+import numpy as np
 from PIL import Image
 
 try:
@@ -14,10 +15,13 @@ class OCRExtractor:
     No AI decisions.
     """
 
-    def extract_text(self, image_path: str) -> tuple[str, str | None, str | None]:
+    def extract_text(self, image_path: str, timeout: float | None = None) -> tuple[str, str | None, str | None]:
         """
         Extracts text from a screenshot.
 
+        With a timeout (seconds) the tesseract process is killed once it
+        runs longer, and OCR_TIMEOUT is returned.
+
         Returns:
             text: extracted OCR text (empty string if unavailable)
             error_code: machine-readable error code (or None)
@@ -30,8 +34,36 @@ class OCRExtractor:
 
         try:
             image = Image.open(image_path)
-            text = pytesseract.image_to_string(image)
-            return text, None, None
+            return self._image_to_string(image, timeout)
+
+        except Exception as exc:
+            return "", "OCR_ERROR", str(exc)
+
+    def extract_from_image(self, image, timeout: float | None = None) -> tuple[str, str | None, str | None]:
+        """
+        Same as extract_text() for an in-memory image: a PIL image or an
+        (H, W[, 3]) uint8 array such as a captured frame.
+        """
+        if pytesseract is None:
+            return "", "OCR_UNAVAILABLE", "pytesseract is not installed"
+
+        try:
+            if isinstance(image, np.ndarray):
+                image = Image.fromarray(image)
+            return self._image_to_string(image, timeout)
 
         except Exception as exc:
             return "", "OCR_ERROR", str(exc)
+
+    def _image_to_string(self, image, timeout: float | None) -> tuple[str, str | None, str | None]:
+        if timeout is not None and timeout <= 0:
+            return "", "OCR_TIMEOUT", "no time left for OCR"
+
+        try:
+            text = pytesseract.image_to_string(image, timeout=timeout or 0)
+        except RuntimeError as exc:
+            # pytesseract kills tesseract and raises this on timeout
+            if "timeout" in str(exc).lower():
+                return "", "OCR_TIMEOUT", f"OCR exceeded {timeout}s"
+            raise
+        return text, None, None
@@ -0,0 +1,94 @@
+import time
+
+import numpy as np
+
+from agent.ai.feature_engineering.text_features import FEATURE_NAMES
+from agent.config import (
+    AI_FRAME_BLOCK_SIZE,
+    AI_FRAME_DOWNSAMPLE,
+    AI_FRAME_PIXEL_THRESHOLD,
+)
+
+
+FRAME_FEATURE_NAMES = (
+    "changed_pixel_ratio",
+    "dirty_blocks",
+    "seconds_since_change",
+)
+
+# Column order for feature matrices that mix OCR and frame features.
+PIPELINE_FEATURE_NAMES = FEATURE_NAMES + FRAME_FEATURE_NAMES
+
+# ITU-R BT.601 luma weights scaled to 8 bits.
+_LUMA_WEIGHTS = np.array([77, 150, 29], dtype=np.uint16)
+
+
+def to_gray(frame: np.ndarray, step: int = 1) -> np.ndarray:
+    """
+    Strided downsample plus integer luma conversion of an (H, W[, 3|4]) frame.
+    """
+    sampled = frame[::step, ::step]
+    if sampled.ndim == 2:
+        return sampled.astype(np.int16)
+    return ((sampled[..., :3] @ _LUMA_WEIGHTS) >> 8).astype(np.int16)
+
+
+class FrameActivityTracker:
+    """
+    Screen-change features from consecutive captured frames.
+
+    Frames are downsampled by striding and compared in grayscale:
+
+        changed_pixel_ratio   share of sampled pixels whose luma moved
+                              by more than `pixel_threshold`
+        dirty_blocks          number of block_size x block_size tiles
+                              (in sampled pixels) with any changed pixel
+        seconds_since_change  time since the last frame with a dirty block
+
+    The first frame, or a frame with a new resolution, counts as fully
+    changed.
+    """
+
+    def __init__(
+        self,
+        downsample: int = AI_FRAME_DOWNSAMPLE,
+        block_size: int = AI_FRAME_BLOCK_SIZE,
+        pixel_threshold: int = AI_FRAME_PIXEL_THRESHOLD,
+    ):
+        self.downsample = max(1, downsample)
+        self.block_size = max(1, block_size)
+        self.pixel_threshold = pixel_threshold
+
+        self._previous = None
+        self._last_change_at = None
+
+    def update(self, frame: np.ndarray, timestamp: float | None = None) -> dict:
+        timestamp = time.time() if timestamp is None else timestamp
+        gray = to_gray(frame, self.downsample)
+        rows = -(-gray.shape[0] // self.block_size)
+        cols = -(-gray.shape[1] // self.block_size)
+
+        if self._previous is None or self._previous.shape != gray.shape:
+            changed_ratio = 1.0
+            dirty_blocks = rows * cols
+        else:
+            changed = np.abs(gray - self._previous) > self.pixel_threshold
+            changed_ratio = float(changed.mean())
+            dirty_blocks = self._dirty_blocks(changed, rows, cols) if changed_ratio else 0
+
+        self._previous = gray
+        if dirty_blocks or self._last_change_at is None:
+            self._last_change_at = timestamp
+
+        return {
+            "changed_pixel_ratio": round(changed_ratio, 4),
+            "dirty_blocks": dirty_blocks,
+            "seconds_since_change": round(max(0.0, timestamp - self._last_change_at), 3),
+        }
+
+    def _dirty_blocks(self, changed: np.ndarray, rows: int, cols: int) -> int:
+        size = self.block_size
+        padded = np.zeros((rows * size, cols * size), dtype=bool)
+        padded[: changed.shape[0], : changed.shape[1]] = changed
+        return int(padded.reshape(rows, size, cols, size).any(axis=(1, 3)).sum())
+
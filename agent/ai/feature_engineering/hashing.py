@@ -0,0 +1,132 @@
+import base64
+import zlib
+from typing import NamedTuple
+
+import numpy as np
+
+from agent.config import AI_HASHING_FEATURES
+
+
+# Sorted indices are delta-encoded as little-endian uint32, followed by
+# float32 values, then zlib-compressed and base64-encoded for JSON.
+SPARSE_ENCODING = "zlib-delta-u32-f32"
+
+_TOKEN_CACHE_LIMIT = 1 << 16
+
+
+class SparseVector(NamedTuple):
+    """
+    Sparse feature vector: sorted uint32 indices with float32 values.
+    """
+
+    indices: np.ndarray
+    values: np.ndarray
+    dim: int
+
+    @property
+    def nnz(self) -> int:
+        return len(self.indices)
+
+    def to_dense(self) -> np.ndarray:
+        dense = np.zeros(self.dim, dtype=np.float32)
+        dense[self.indices] = self.values
+        return dense
+
+    def to_bytes(self) -> bytes:
+        deltas = np.diff(self.indices, prepend=np.uint32(0)).astype("<u4")
+        return zlib.compress(deltas.tobytes() + self.values.astype("<f4").tobytes())
+
+    def to_payload(self) -> dict:
+        """
+        JSON-safe form carried in AIMetricV1.sparse_features.
+        """
+        return {
+            "encoding": SPARSE_ENCODING,
+            "dim": self.dim,
+            "nnz": self.nnz,
+            "data": base64.b64encode(self.to_bytes()).decode("ascii"),
+        }
+
+    @classmethod
+    def from_bytes(cls, raw: bytes, dim: int) -> "SparseVector":
+        body = zlib.decompress(raw)
+        if len(body) % 8:
+            raise ValueError("sparse payload length is not a multiple of 8 bytes")
+
+        nnz = len(body) // 8
+        indices = np.cumsum(np.frombuffer(body, dtype="<u4", count=nnz), dtype=np.uint32)
+        values = np.frombuffer(body, dtype="<f4", offset=nnz * 4).astype(np.float32)
+        if nnz and int(indices[-1]) >= dim:
+            raise ValueError("sparse index out of range")
+        return cls(indices, values, dim)
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> "SparseVector":
+        if payload.get("encoding") != SPARSE_ENCODING:
+            raise ValueError(f"unsupported sparse encoding {payload.get('encoding')!r}")
+        return cls.from_bytes(base64.b64decode(payload["data"]), int(payload["dim"]))
+
+
+class HashingVectorizer:
+    """
+    Fixed-size hashing vectorizer over word tokens and bigrams.
+
+    Each n-gram is hashed with CRC32 into `n_features` buckets (a power
+    of two); the top hash bit picks a +1/-1 sign so collisions cancel
+    out on average instead of piling up. Values are signed counts.
+
+    Bigram hashes continue the CRC of their first token, so no bigram
+    strings are built. Unigram hashes are cached because OCR text
+    repeats the same UI vocabulary frame after frame.
+    """
+
+    def __init__(self, n_features: int = AI_HASHING_FEATURES, bigrams: bool = True):
+        if n_features <= 0 or n_features & (n_features - 1):
+            raise ValueError("n_features must be a power of two")
+
+        self.n_features = n_features
+        self.bigrams = bigrams
+        self._mask = n_features - 1
+        self._cache: dict[str, int] = {}
+
+    def transform(self, tokens: list[str]) -> SparseVector:
+        hashes = self._hashes(tokens)
+        if not hashes:
+            return SparseVector(
+                np.zeros(0, dtype=np.uint32),
+                np.zeros(0, dtype=np.float32),
+                self.n_features,
+            )
+
+        raw = np.fromiter(hashes, dtype=np.uint32, count=len(hashes))
+        signs = np.where(raw >> 31, -1.0, 1.0)
+        indices, inverse = np.unique(raw & self._mask, return_inverse=True)
+        values = np.bincount(inverse, weights=signs, minlength=len(indices))
+
+        keep = values != 0
+        return SparseVector(
+            indices[keep].astype(np.uint32),
+            values[keep].astype(np.float32),
+            self.n_features,
+        )
+
+    def _hashes(self, tokens: list[str]) -> list[int]:
+        cache = self._cache
+        if len(cache) > _TOKEN_CACHE_LIMIT:
+            cache.clear()
+
+        unigrams = []
+        for token in tokens:
+            value = cache.get(token)
+            if value is None:
+                value = cache[token] = zlib.crc32(token.encode("utf-8"))
+            unigrams.append(value)
+
+        if not self.bigrams or len(tokens) < 2:
+            return unigrams
+
+        bigrams = [
+            zlib.crc32(b" " + second.encode("utf-8"), first)
+            for first, second in zip(unigrams, tokens[1:])
+        ]
+        return unigrams + bigrams
@@ -0,0 +1,115 @@
+import re
+from collections import deque
+from pathlib import Path
+from typing import Iterable
+
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Lowercased word tokens, identical to the tokens used for word counts.
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def load_lexicon(path: Path) -> list[str]:
+    """
+    Reads one term or phrase per line.
+    Blank lines and lines starting with '#' are ignored.
+    """
+    terms = []
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if line and not line.startswith("#"):
+            terms.append(line)
+    return terms
+
+
+class KeywordMatcher:
+    """
+    Token-level Aho-Corasick automaton over one or more lexicons.
+
+    Terms are case-folded and split into word tokens, so multi-word
+    phrases ("visual studio code") and mixed-case app names
+    ("JioHotstar") match the same tokens the feature extractor counts.
+    The automaton is built once; matching is a single pass over tokens.
+    """
+
+    def __init__(self, lexicons: dict[str, Iterable[str]]):
+        self.categories = list(lexicons)
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._out: list[tuple[int, ...]] = [()]
+
+        for index, category in enumerate(self.categories):
+            for term in lexicons[category]:
+                self._add(tokenize(term), index)
+
+        self._build_failure_links()
+
+    # ---------------------------
+    # Construction
+    # ---------------------------
+
+    def _add(self, tokens: list[str], category: int):
+        if not tokens:
+            return
+
+        node = 0
+        for token in tokens:
+            nxt = self._goto[node].get(token)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][token] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            node = nxt
+
+        # The same term listed twice must not double count.
+        if category not in self._out[node]:
+            self._out[node] = self._out[node] + (category,)
+
+    def _build_failure_links(self):
+        pending = deque(self._goto[0].values())
+
+        while pending:
+            node = pending.popleft()
+            for token, child in self._goto[node].items():
+                pending.append(child)
+
+                fallback = self._fail[node]
+                while fallback and token not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+
+                self._fail[child] = self._goto[fallback].get(token, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    # ---------------------------
+    # Matching
+    # ---------------------------
+
+    def count(self, tokens: Iterable[str]) -> list[int]:
+        """
+        Returns the number of lexicon hits per category,
+        in the order the lexicons were given.
+        """
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        hits = [0] * len(self.categories)
+
+        node = 0
+        for token in tokens:
+            while node and token not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(token, 0)
+            for category in out[node]:
+                hits[category] += 1
+
+        return hits
+
+    def __len__(self) -> int:
+        return len(self._goto) - 1
@@ -0,0 +1,55 @@
+import hashlib
+from collections import Counter
+
+import numpy as np
+
+
+FINGERPRINT_BITS = 64
+
+_BIT_SHIFTS = np.arange(FINGERPRINT_BITS, dtype=np.uint64)
+_TOKEN_CACHE_LIMIT = 1 << 16
+_token_hashes: dict[str, int] = {}
+
+
+def _token_hash(token: str) -> int:
+    value = _token_hashes.get(token)
+    if value is None:
+        if len(_token_hashes) > _TOKEN_CACHE_LIMIT:
+            _token_hashes.clear()
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        value = _token_hashes[token] = int.from_bytes(digest, "little")
+    return value
+
+
+def simhash(tokens: list[str]) -> int:
+    """
+    64-bit SimHash over word tokens and bigrams, weighted by count.
+
+    Texts that share most tokens get fingerprints a few bits apart, so
+    a changed line moves the fingerprint only slightly. Digit-only tokens
+    (clocks, counters) are folded into one placeholder first.
+    Returns 0 for an empty token list.
+    """
+    if not tokens:
+        return 0
+
+    tokens = ["#" if token.isdigit() else token for token in tokens]
+
+    shingles = Counter(tokens)
+    shingles.update(f"{first} {second}" for first, second in zip(tokens, tokens[1:]))
+
+    hashes = np.fromiter(
+        (_token_hash(shingle) for shingle in shingles),
+        dtype=np.uint64,
+        count=len(shingles),
+    )
+    weights = np.fromiter(shingles.values(), dtype=np.float64, count=len(shingles))
+
+    bits = ((hashes[:, None] >> _BIT_SHIFTS) & np.uint64(1)).astype(np.float64)
+    totals = weights @ (2.0 * bits - 1.0)
+
+    return int(np.packbits(totals > 0, bitorder="little").view("<u8")[0])
+
+
+def hamming(left: int, right: int) -> int:
+    return (left ^ right).bit_count()
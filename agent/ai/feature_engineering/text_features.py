@@ -1,26 +1,120 @@
 import re
+import string
+from pathlib import Path
+
+import numpy as np
+
+from agent.ai.feature_engineering.hashing import HashingVectorizer, SparseVector
+from agent.ai.feature_engineering.keyword_matcher import KeywordMatcher, load_lexicon, tokenize
+from agent.config import (
+    AI_DISTRACTION_LEXICON_PATH,
+    AI_FEATURE_VERSION,
+    AI_FOCUS_LEXICON_PATH,
+    AI_HASHING_FEATURES,
+)
+
+
+EMAIL_PATTERN = re.compile(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}")
+NUMBER_PATTERN = re.compile(r"\b\d{3,}\b")
+ASCII_LETTERS = string.ascii_letters.encode("ascii")
+
+# Column order of feature matrices produced by extract_batch().
+FEATURE_NAMES = (
+    "word_count",
+    "line_count",
+    "focus_keyword_hits",
+    "distraction_keyword_hits",
+    "alpha_ratio",
+)
+
+# Used when a configured lexicon file is missing.
+DEFAULT_FOCUS_TERMS = (
+    "jira", "ticket", "design", "spec",
+    "review", "code", "build", "deploy",
+    "Python", "Word",
+)
+
+DEFAULT_DISTRACTION_TERMS = (
+    "youtube", "netflix", "game", "shopping", "JioHotstar", "Instagram",
+)
+
+
+def _lexicon_or_default(path: Path | None, default: tuple[str, ...]) -> list[str]:
+    if path is not None and Path(path).exists():
+        return load_lexicon(path)
+    return list(default)
+
+
+def feature_matrix(rows, feature_names=FEATURE_NAMES) -> np.ndarray:
+    """
+    Packs feature dicts into an (N, F) float array.
+    Missing or non-numeric values become NaN.
+    """
+    matrix = np.full((len(rows), len(feature_names)), np.nan)
+    for row_index, row in enumerate(rows):
+        for col_index, name in enumerate(feature_names):
+            value = row.get(name)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                matrix[row_index, col_index] = value
+    return matrix
+
+
+def _count_alpha(text: str) -> int:
+    if text.isascii():
+        raw = text.encode("ascii")
+        return len(raw) - len(raw.translate(None, ASCII_LETTERS))
+    return sum(map(str.isalpha, text))
 
 
 class TextFeatureEngineer:
     """
     Converts raw text into structured numeric features.
     This is feature engineering — the heart of AI logic.
+
+    Focus/distraction lexicons are compiled once into a keyword
+    automaton, so extraction cost does not grow with lexicon size.
+
+    Feature version "v2" adds a hashed bag of words/bigrams as a
+    SparseVector, computed from the same tokens as the v1 scalars.
     """
 
+    def __init__(
+        self,
+        focus_terms=None,
+        distraction_terms=None,
+        focus_lexicon_path: Path | None = AI_FOCUS_LEXICON_PATH,
+        distraction_lexicon_path: Path | None = AI_DISTRACTION_LEXICON_PATH,
+        feature_version: str = AI_FEATURE_VERSION,
+        hashing_features: int = AI_HASHING_FEATURES,
+    ):
+        if focus_terms is None:
+            focus_terms = _lexicon_or_default(focus_lexicon_path, DEFAULT_FOCUS_TERMS)
+        if distraction_terms is None:
+            distraction_terms = _lexicon_or_default(
+                distraction_lexicon_path,
+                DEFAULT_DISTRACTION_TERMS,
+            )
+
+        self.matcher = KeywordMatcher(
+            {
+                "focus": focus_terms,
+                "distraction": distraction_terms,
+            }
+        )
+
+        self.feature_version = feature_version
+        self.vectorizer = (
+            HashingVectorizer(hashing_features) if feature_version == "v2" else None
+        )
+
     def redact(self, text: str) -> str:
         """
         Removes potentially sensitive information like emails and large numbers.
         """
 
-        # Replace emails
-        redacted = re.sub(
-            r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}",
-            "[EMAIL]",
-            text,
-        )
-
-        # Replace large numbers
-        redacted = re.sub(r"\b\d{3,}\b", "[NUMBER]", redacted)
+        # Replace emails, then large numbers
+        redacted = EMAIL_PATTERN.sub("[EMAIL]", text) if "@" in text else text
+        redacted = NUMBER_PATTERN.sub("[NUMBER]", redacted)
 
         return redacted.strip()
 
@@ -29,29 +123,73 @@ class TextFeatureEngineer:
         Converts cleaned text into numeric features.
         """
 
-        words = re.findall(r"\w+", text.lower())
-        lines = [line for line in text.splitlines() if line.strip()]
+        return self._extract_tokens(text, tokenize(text))
 
-        focus_terms = {
-            "jira", "ticket", "design", "spec",
-            "review", "code", "build", "deploy",
-            "Python", "Word"
-        }
-
-        distract_terms = {
-            "youtube", "netflix", "game", "shopping", "JioHotstar", "Instagram"
-        }
+    def _extract_tokens(self, text: str, words: list[str]) -> dict:
+        focus_hits, distract_hits = self.matcher.count(words)
 
-        focus_hits = sum(1 for token in words if token in focus_terms)
-        distract_hits = sum(1 for token in words if token in distract_terms)
-
-        alpha_chars = sum(1 for ch in text if ch.isalpha())
+        line_count = sum(1 for line in text.splitlines() if line.strip())
+        alpha_chars = _count_alpha(text)
         total_chars = len(text) if text else 1
 
         return {
             "word_count": len(words),
-            "line_count": len(lines),
+            "line_count": line_count,
             "focus_keyword_hits": focus_hits,
             "distraction_keyword_hits": distract_hits,
             "alpha_ratio": round(alpha_chars / total_chars, 4),
         }
+
+    def analyze(self, text: str) -> tuple[str, dict]:
+        """
+        Redacts raw OCR text and extracts features from the redacted text.
+
+        Returns:
+            redacted: text safe to hash or persist
+            features: numeric feature dict (same as extract(redacted))
+        """
+        redacted = self.redact(text)
+        return redacted, self.extract(redacted)
+
+    def analyze_sparse(self, text: str) -> tuple[str, dict, SparseVector | None]:
+        """
+        analyze() plus the hashed bag-of-words vector (None for v1).
+        Both are computed from a single tokenization.
+        """
+        redacted = self.redact(text)
+        words = tokenize(redacted)
+        return (redacted, *self.featurize(redacted, words))
+
+    def featurize(self, redacted: str, words: list[str]) -> tuple[dict, SparseVector | None]:
+        """
+        Features for already redacted and tokenized text, for callers
+        that reuse the tokens (e.g. activity fingerprinting).
+        """
+        sparse = self.vectorizer.transform(words) if self.vectorizer else None
+        return self._extract_tokens(redacted, words), sparse
+
+    def extract_batch(self, texts) -> np.ndarray:
+        """
+        Extracts features for many cleaned texts.
+        Returns an (N, F) array with columns in FEATURE_NAMES order.
+        """
+        return feature_matrix([self.extract(text) for text in texts])
+
+    def analyze_batch(self, texts) -> tuple[list[str], np.ndarray]:
+        """
+        Batch form of analyze(): redacted texts plus an (N, F) feature array.
+        """
+        redacted = [self.redact(text) for text in texts]
+        return redacted, self.extract_batch(redacted)
+
+    def analyze_batch_sparse(self, texts) -> tuple[list[str], np.ndarray, list]:
+        """
+        Batch form of analyze_sparse(): redacted texts, an (N, F) feature
+        array and one SparseVector (or None) per text.
+        """
+        results = [self.analyze_sparse(text) for text in texts]
+        return (
+            [redacted for redacted, _, _ in results],
+            feature_matrix([features for _, features, _ in results]),
+            [sparse for _, _, sparse in results],
+        )
@@ -1,7 +1,11 @@
-import math
+import numpy as np
 
+from agent.ai.feature_engineering.frame_activity import PIPELINE_FEATURE_NAMES
+from agent.ai.feature_engineering.text_features import FEATURE_NAMES
+from agent.config import AI_BASELINE_MIN_SAMPLES
 
-MIN_BASELINE_SAMPLES = 10
+
+MIN_BASELINE_SAMPLES = AI_BASELINE_MIN_SAMPLES
 
 
 class AnomalyModel:
@@ -9,11 +13,21 @@ class AnomalyModel:
     Hybrid anomaly detection:
     - Uses statistical z-score detection when baseline mature
     - Falls back to static rule-based logic when immature
+
+    The static branch uses the "anomaly_static" head of the active
+    LoadedModel (see models/runtime.py) when one is passed in.
+
+    Each call reads one BaselineSnapshot, so readiness and statistics
+    are consistent for the whole call and no store lock is taken.
     """
 
     def __init__(self, baseline_store):
         self.baseline = baseline_store
 
+        rows = [baseline_store.feature_index.get(key) for key in features_tracked()]
+        self._tracked_known = np.array([row is not None for row in rows])
+        self._tracked_rows = np.array([row if row is not None else 0 for row in rows])
+
     # ------------------------------------
     # Public API
     # ------------------------------------
@@ -23,8 +37,9 @@ class AnomalyModel:
         Returns anomaly score between 0.0 and 1.0
         """
 
-        if self._baseline_ready():
-            return self._statistical_anomaly(features)
+        snapshot = self.baseline.snapshot
+        if snapshot.ready:
+            return self._evaluate_statistical(features, snapshot=snapshot)[0]
 
         return self._static_anomaly(features)
     
@@ -45,36 +60,69 @@ class AnomalyModel:
 
         return "normal"
     
-    def evaluate(self, features: dict):
+    def evaluate(self, features: dict, timestamp: float | None = None, model=None):
         """
         Returns:
             anomaly_score (float),
             explanation (dict)
         """
 
-        if self._baseline_ready():
-            return self._evaluate_statistical(features)
+        snapshot = self.baseline.snapshot
+        if snapshot.ready:
+            return self._evaluate_statistical(features, timestamp, snapshot)
+
+        if model is not None and model.head("anomaly_static") is not None:
+            return self._evaluate_model(features, model)
 
         return self._evaluate_static(features)
-    
-    def _evaluate_statistical(self, features: dict):
 
-        z_scores = {}
-        collected = []
+    def evaluate_batch(
+        self,
+        features: np.ndarray,
+        feature_names=FEATURE_NAMES,
+        timestamp: float | None = None,
+        model=None,
+    ):
+        """
+        Vectorized evaluate() over an (N, F) feature array (NaN = missing).
+
+        Returns:
+            anomaly_scores (np.ndarray of shape (N,)),
+            mode (str, shared by the whole batch)
+        """
+        columns = {name: index for index, name in enumerate(feature_names)}
+
+        snapshot = self.baseline.snapshot
+        if snapshot.ready:
+            return self._statistical_batch(features, columns, snapshot, timestamp), "statistical"
 
-        for key in features_tracked():
-            value = features.get(key)
-            if value is None:
-                continue
+        if model is not None and model.head("anomaly_static") is not None:
+            return model.predict("anomaly_static", features, feature_names), "static"
 
-            z = self.baseline.z_score(key, value)
-            z_scores[key] = round(z, 3)
-            collected.append(z)
+        return self._static_batch(features, columns), "static"
 
-        if not collected:
+    def label_batch(self, anomaly_scores: np.ndarray) -> np.ndarray:
+        """
+        Vectorized label().
+        """
+        return np.where(
+            anomaly_scores >= 0.75,
+            "critical",
+            np.where(anomaly_scores >= 0.4, "suspicious", "normal"),
+        )
+    
+    def _evaluate_statistical(self, features: dict, timestamp: float | None = None, snapshot=None):
+
+        tracked = features_tracked()
+        values = np.array([[_as_float(features.get(key)) for key in tracked]])
+        present = ~np.isnan(values[0])
+
+        if not present.any():
             return 0.0, {"mode": "statistical", "details": {}}
 
-        avg_z = sum(collected) / len(collected)
+        snapshot = snapshot or self.baseline.snapshot
+        z = self._z_matrix(values, snapshot, timestamp)[0]
+        avg_z = float(z[present].mean())
         normalized = min(avg_z / 3.0, 1.0)
 
         return (
@@ -82,7 +130,11 @@ class AnomalyModel:
             {
                 "mode": "statistical",
                 "avg_z": round(avg_z, 3),
-                "feature_z_scores": z_scores,
+                "feature_z_scores": {
+                    key: round(float(z[index]), 3)
+                    for index, key in enumerate(tracked)
+                    if present[index]
+                },
             },
         )
     
@@ -111,20 +163,70 @@ class AnomalyModel:
             },
         )
 
+    def _evaluate_model(self, features: dict, model):
+        row = np.array([[_as_float(features.get(name)) for name in PIPELINE_FEATURE_NAMES]])
+        score = float(model.predict("anomaly_static", row, PIPELINE_FEATURE_NAMES)[0])
+
+        return (
+            score,
+            {
+                "mode": "static",
+                "model": f"{model.name}/{model.version}",
+            },
+        )
+
+    def _statistical_batch(self, features: np.ndarray, columns: dict, snapshot, timestamp: float | None = None) -> np.ndarray:
+        values = np.full((len(features), len(features_tracked())), np.nan)
+        for index, key in enumerate(features_tracked()):
+            if key in columns:
+                values[:, index] = features[:, columns[key]]
+
+        present = ~np.isnan(values)
+        z = np.where(present, self._z_matrix(values, snapshot, timestamp), 0.0)
+        counts = present.sum(axis=1)
+
+        avg_z = np.divide(z.sum(axis=1), counts, out=np.zeros(len(features)), where=counts > 0)
+        return np.round(np.minimum(avg_z / 3.0, 1.0), 3)
+
+    def _z_matrix(self, values: np.ndarray, snapshot, timestamp: float | None) -> np.ndarray:
+        """
+        Z-scores for an (N, tracked) value array in one vectorized pass.
+        Features without a usable baseline (std == 0) score 0.
+        """
+        mean, std, _ = snapshot.lookup(timestamp)
+
+        tracked_mean = np.where(self._tracked_known, mean[self._tracked_rows], 0.0)
+        tracked_std = np.where(self._tracked_known, std[self._tracked_rows], 0.0)
+
+        return np.divide(
+            np.abs(values - tracked_mean),
+            tracked_std,
+            out=np.zeros(values.shape),
+            where=tracked_std > 0,
+        )
+
+    def _static_batch(self, features: np.ndarray, columns: dict) -> np.ndarray:
+        def column(name, default):
+            values = features[:, columns[name]] if name in columns else np.full(len(features), np.nan)
+            return np.where(np.isnan(values), default, values)
+
+        score = np.full(len(features), 0.1)
+        score += np.where(column("word_count", 0) < 2, 0.4, 0.0)
+        score += np.where(column("alpha_ratio", 1.0) < 0.2, 0.3, 0.0)
+        score += np.where(column("distraction_keyword_hits", 0) > 1, 0.3, 0.0)
+
+        return np.round(np.minimum(score, 1.0), 3)
+
     # ------------------------------------
     # Baseline Logic
     # ------------------------------------
 
     def _baseline_ready(self) -> bool:
         """
-        Baseline considered ready if any tracked feature
-        has sufficient sample size.
+        Baseline considered ready once any tracked feature
+        has had sufficient samples (precomputed, sticky).
         """
-        for key in features_tracked():
-            stats = self.baseline.get_stats(key)
-            if stats and stats["count"] >= MIN_BASELINE_SAMPLES:
-                return True
-        return False
+        return self.baseline.snapshot.ready
 
     # ------------------------------------
     # Statistical Anomaly
@@ -134,28 +236,7 @@ class AnomalyModel:
         """
         Uses z-score across selected features.
         """
-
-        z_scores = []
-
-        for key in features_tracked():
-            value = features.get(key)
-            if value is None:
-                continue
-
-            z = self.baseline.z_score(key, value)
-            z_scores.append(z)
-
-        if not z_scores:
-            return 0.0
-
-        # Convert average z-score into 0–1 scale
-        avg_z = sum(z_scores) / len(z_scores)
-
-        # Normalize:
-        # z >= 3 → strong anomaly (≈1.0)
-        normalized = min(avg_z / 3.0, 1.0)
-
-        return round(normalized, 3)
+        return self._evaluate_statistical(features)[0]
 
     # ------------------------------------
     # Static Fallback
@@ -184,10 +265,15 @@ class AnomalyModel:
 # Utility
 # ------------------------------------
 
+def _as_float(value) -> float:
+    return np.nan if value is None else float(value)
+
+
 def features_tracked():
     return [
         "word_count",
         "focus_keyword_hits",
         "distraction_keyword_hits",
         "alpha_ratio",
+        "changed_pixel_ratio",
     ]
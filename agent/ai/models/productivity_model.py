@@ -1,10 +1,23 @@
+import numpy as np
+
+from agent.ai.feature_engineering.frame_activity import PIPELINE_FEATURE_NAMES
+from agent.ai.feature_engineering.text_features import FEATURE_NAMES
+from agent.config import AI_IDLE_SECONDS
+
+
 class ProductivityModel:
     """
     Rule-based productivity scoring model.
-    Later this can be replaced with trained ML weights.
+
+    When the active LoadedModel (see models/runtime.py) carries a
+    "productivity" head, that head scores instead of the rules.
     """
 
-    def predict(self, text: str, features: dict) -> float:
+    def predict(self, text: str, features: dict, model=None) -> float:
+        if model is not None and model.head("productivity") is not None:
+            row = np.array([[_as_float(features.get(name)) for name in PIPELINE_FEATURE_NAMES]])
+            return float(model.predict("productivity", row, PIPELINE_FEATURE_NAMES)[0])
+
         base = 50.0
 
         # Reward focus keywords
@@ -21,4 +34,37 @@ class ProductivityModel:
         if not text:
             base -= 15.0
 
+        # Penalize a screen that has not changed for a while
+        if (features.get("seconds_since_change") or 0) >= AI_IDLE_SECONDS:
+            base -= 20.0
+
         return round(max(0.0, min(100.0, base)), 2)
+
+    def predict_batch(self, texts, features: np.ndarray, feature_names=FEATURE_NAMES, model=None) -> np.ndarray:
+        """
+        Vectorized predict() over an (N, F) feature array.
+        Returns an (N,) array of scores.
+        """
+        if model is not None and model.head("productivity") is not None:
+            return model.predict("productivity", features, feature_names)
+
+        columns = {name: index for index, name in enumerate(feature_names)}
+        focus = features[:, columns["focus_keyword_hits"]]
+        distraction = features[:, columns["distraction_keyword_hits"]]
+        word_count = features[:, columns["word_count"]]
+        empty = np.fromiter((not text for text in texts), dtype=bool, count=len(features))
+
+        base = np.full(len(features), 50.0)
+        base += np.minimum(focus * 6.0, 30.0)
+        base -= np.minimum(distraction * 10.0, 40.0)
+        base -= np.where(word_count < 3, 10.0, 0.0)
+        base -= np.where(empty, 15.0, 0.0)
+        if "seconds_since_change" in columns:
+            idle = np.nan_to_num(features[:, columns["seconds_since_change"]]) >= AI_IDLE_SECONDS
+            base -= np.where(idle, 20.0, 0.0)
+
+        return np.round(np.clip(base, 0.0, 100.0), 2)
+
+
+def _as_float(value) -> float:
+    return np.nan if value is None else float(value)
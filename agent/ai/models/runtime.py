@@ -0,0 +1,381 @@
+"""
+Artifact-backed model runtime.
+
+A model artifact is a directory AI_MODEL_DIR/<name>/<version>/ holding:
+
+    manifest.json          name, version, feature_names and one entry per head
+    <head>.<array>.npy     head parameters, memory-mapped read-only at load
+
+Heads replace the rule-based scorers they are named after:
+
+    productivity     ProductivityModel (score in 0..100)
+    anomaly_static   AnomalyModel static branch (score in 0..1)
+
+Supported head kinds:
+
+    logistic   sigmoid(X @ weights + bias) * scale
+    stumps     gradient-boosted depth-1 trees:
+               base + sum(where(X[:, feature] <= threshold, left, right)),
+               optionally passed through a sigmoid, then * scale
+
+A missing artifact or head falls back to the heuristic models, so the
+default AI_MODEL_NAME keeps the original behaviour.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from agent.ai.feature_engineering.text_features import FEATURE_NAMES
+from agent.config import (
+    AI_MODEL_DIR,
+    AI_MODEL_NAME,
+    AI_MODEL_POLL_SECONDS,
+    AI_MODEL_SELECTOR_PATH,
+    AI_MODEL_VERSION,
+)
+
+
+MANIFEST_NAME = "manifest.json"
+HEAD_KINDS = {
+    "logistic": ("weights", "bias"),
+    "stumps": ("feature", "threshold", "left", "right"),
+}
+HEAD_RANGES = {
+    "productivity": (0.0, 100.0, 2),
+    "anomaly_static": (0.0, 1.0, 3),
+}
+
+
+class ModelArtifactError(Exception):
+    """
+    Raised when an artifact directory is missing or malformed, or when
+    save_artifact() would overwrite an existing version.
+    """
+
+
+def _sigmoid(values: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-values))
+
+
+class ModelHead:
+    """
+    One scoring head with its parameters (NumPy arrays, usually memmaps).
+    """
+
+    def __init__(self, name: str, spec: dict, arrays: dict[str, np.ndarray]):
+        self.name = name
+        self.kind = spec["kind"]
+        self.scale = float(spec.get("scale", 1.0))
+        self.link = spec.get("link", "sigmoid" if self.kind == "logistic" else "identity")
+        self.base = float(spec.get("base", 0.0))
+        self.arrays = arrays
+        self.low, self.high, self.decimals = HEAD_RANGES.get(name, (-np.inf, np.inf, 6))
+
+        # Plain ndarray views over the memmaps skip np.memmap's
+        # per-operation subclass overhead; pages are still shared.
+        self._views = {key: np.asarray(value) for key, value in arrays.items()}
+        if self.kind == "logistic":
+            self.base = float(self._views["bias"].reshape(-1)[0])
+
+    def predict(self, matrix: np.ndarray) -> np.ndarray:
+        """
+        Scores an (N, F) matrix laid out in the artifact's feature order.
+        """
+        views = self._views
+        if self.kind == "logistic":
+            raw = matrix @ views["weights"] + self.base
+        else:
+            raw = self.base + np.where(
+                matrix[:, views["feature"]] <= views["threshold"],
+                views["left"],
+                views["right"],
+            ).sum(axis=1)
+
+        if self.link == "sigmoid":
+            raw = _sigmoid(raw)
+
+        return np.round(np.clip(raw * self.scale, self.low, self.high), self.decimals)
+
+
+class LoadedModel:
+    """
+    An immutable, fully loaded artifact. The heuristic fallback is a
+    LoadedModel with no heads.
+    """
+
+    def __init__(self, name: str, version: str, feature_names=FEATURE_NAMES, heads=None, path=None):
+        self.name = name
+        self.version = version
+        self.feature_names = tuple(feature_names)
+        self.heads = heads or {}
+        self.path = path
+        self._layouts: dict[tuple, tuple[np.ndarray, np.ndarray]] = {}
+
+    def head(self, name: str) -> ModelHead | None:
+        return self.heads.get(name)
+
+    def prepare(self, features: np.ndarray, feature_names=FEATURE_NAMES) -> np.ndarray:
+        """
+        Reorders an (N, F) pipeline feature array into the artifact's
+        feature order. Missing columns and NaNs become 0.
+        """
+        key = tuple(feature_names)
+        layout = self._layouts.get(key)
+        if layout is None:
+            columns = {name: index for index, name in enumerate(key)}
+            known = np.array([name in columns for name in self.feature_names])
+            index = np.array([columns.get(name, 0) for name in self.feature_names], dtype=np.int64)
+            layout = self._layouts[key] = (known, index)
+
+        known, index = layout
+        matrix = features[:, index]
+        if not known.all():
+            matrix[:, ~known] = 0.0
+        return np.nan_to_num(matrix, nan=0.0, copy=False)
+
+    def predict(self, head_name: str, features: np.ndarray, feature_names=FEATURE_NAMES) -> np.ndarray | None:
+        """
+        Batched inference for one head, or None when the head is absent.
+        """
+        head = self.heads.get(head_name)
+        if head is None:
+            return None
+        return head.predict(self.prepare(features, feature_names))
+
+    def info(self) -> dict:
+        return {"name": self.name, "version": self.version}
+
+
+def heuristic_model(name: str = AI_MODEL_NAME, version: str = AI_MODEL_VERSION) -> LoadedModel:
+    return LoadedModel(name, version)
+
+
+def load_artifact(model_dir, name: str, version: str) -> LoadedModel:
+    """
+    Loads and validates an artifact. Arrays are memory-mapped read-only.
+    """
+    path = Path(model_dir) / name / version
+    manifest_path = path / MANIFEST_NAME
+    try:
+        manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    except FileNotFoundError as exc:
+        raise ModelArtifactError(f"no artifact at {path}") from exc
+    except (OSError, ValueError) as exc:
+        raise ModelArtifactError(f"unreadable manifest {manifest_path}: {exc}") from exc
+
+    feature_names = tuple(manifest.get("feature_names") or ())
+    heads = {}
+    for head_name, spec in (manifest.get("heads") or {}).items():
+        kind = spec.get("kind")
+        if kind not in HEAD_KINDS:
+            raise ModelArtifactError(f"head {head_name!r} has unknown kind {kind!r}")
+
+        arrays = {}
+        for array_name in HEAD_KINDS[kind]:
+            array_path = path / f"{head_name}.{array_name}.npy"
+            try:
+                arrays[array_name] = np.load(array_path, mmap_mode="r", allow_pickle=False)
+            except (OSError, ValueError) as exc:
+                raise ModelArtifactError(f"cannot load {array_path}: {exc}") from exc
+
+        _validate_head(head_name, kind, arrays, len(feature_names))
+        heads[head_name] = ModelHead(head_name, spec, arrays)
+
+    return LoadedModel(
+        manifest.get("name", name),
+        manifest.get("version", version),
+        feature_names=feature_names,
+        heads=heads,
+        path=path,
+    )
+
+
+def _validate_head(head_name: str, kind: str, arrays: dict, feature_count: int):
+    if kind == "logistic":
+        if arrays["weights"].shape != (feature_count,) or arrays["bias"].size != 1:
+            raise ModelArtifactError(f"head {head_name!r}: weights must match feature_names")
+        return
+
+    shapes = {arrays[key].shape for key in HEAD_KINDS["stumps"]}
+    if len(shapes) != 1 or len(next(iter(shapes))) != 1:
+        raise ModelArtifactError(f"head {head_name!r}: stump arrays must be 1-D and equal length")
+    if arrays["feature"].size and (
+        arrays["feature"].min() < 0 or arrays["feature"].max() >= feature_count
+    ):
+        raise ModelArtifactError(f"head {head_name!r}: stump feature index out of range")
+
+
+def save_artifact(model_dir, name: str, version: str, feature_names, heads: dict) -> Path:
+    """
+    Writes an artifact for training/export scripts.
+
+    heads maps head name -> {"kind": ..., <array name>: array-like,
+    optional "scale"/"link"/"base"}. The version directory is written
+    next to its final location and renamed into place, so a polling
+    agent never sees a half-written artifact.
+
+    Versions are immutable: saving over an existing one raises
+    ModelArtifactError, since an agent may be loading it at that moment.
+    Export under a new version and point the selector at it instead.
+    """
+    target = Path(model_dir) / name / version
+    if target.exists():
+        raise ModelArtifactError(f"artifact {name}/{version} already exists at {target}")
+    target.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f".{version}-", dir=target.parent))
+
+    manifest_heads = {}
+    try:
+        for head_name, spec in heads.items():
+            kind = spec["kind"]
+            manifest_heads[head_name] = {
+                key: value for key, value in spec.items() if key not in HEAD_KINDS.get(kind, ())
+            }
+            for array_name in HEAD_KINDS[kind]:
+                dtype = np.int64 if array_name == "feature" else np.float64
+                np.save(staging / f"{head_name}.{array_name}.npy", np.asarray(spec[array_name], dtype=dtype))
+
+        (staging / MANIFEST_NAME).write_text(
+            json.dumps(
+                {
+                    "name": name,
+                    "version": version,
+                    "feature_names": list(feature_names),
+                    "heads": manifest_heads,
+                },
+                indent=2,
+            ),
+            encoding="utf-8",
+        )
+
+        try:
+            os.replace(staging, target)
+        except OSError as exc:
+            if not target.exists():
+                raise
+            # Another export created the version after the check above.
+            raise ModelArtifactError(f"artifact {name}/{version} already exists at {target}") from exc
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    return target
+
+
+class ModelRuntime:
+    """
+    Owns the active model and swaps it atomically.
+
+    Callers read `current` once per frame/batch and use that LoadedModel
+    throughout, so a swap never mixes versions inside one metric. A new
+    artifact is fully loaded and validated before the reference is
+    replaced; on failure the previous model stays active.
+
+    The selector file (JSON {"name": ..., "version": ...}) is polled
+    every `poll_seconds` so a rollout only needs a new artifact plus a
+    selector write, no agent restart.
+    """
+
+    def __init__(
+        self,
+        logger=None,
+        model_dir=AI_MODEL_DIR,
+        name: str = AI_MODEL_NAME,
+        version: str = AI_MODEL_VERSION,
+        selector_path=AI_MODEL_SELECTOR_PATH,
+        poll_seconds: float = AI_MODEL_POLL_SECONDS,
+    ):
+        self.logger = logger
+        self.model_dir = Path(model_dir)
+        self.selector_path = Path(selector_path) if selector_path else None
+        self.poll_seconds = poll_seconds
+
+        self._lock = threading.Lock()
+        self._selector_mtime = None
+        self._next_poll = 0.0
+        self.swaps = 0
+
+        self.current = heuristic_model(name, version)
+        self.activate(name, version, quiet_missing=True)
+        self.refresh(force=True)
+
+    def activate(self, name: str, version: str, quiet_missing: bool = False) -> bool:
+        """
+        Loads name/version and makes it current. Returns True on success.
+        """
+        try:
+            model = load_artifact(self.model_dir, name, version)
+        except ModelArtifactError as exc:
+            if not (quiet_missing and not (self.model_dir / name / version).exists()):
+                self._log(
+                    "warning",
+                    "Model artifact rejected, keeping current model",
+                    {"requested": f"{name}/{version}", "active": self._ref(), "error": str(exc)},
+                )
+            return False
+
+        with self._lock:
+            previous = self._ref()
+            self.current = model
+            self.swaps += 1
+
+        self._log(
+            "info",
+            "Model activated",
+            {"previous": previous, "active": self._ref(), "heads": sorted(model.heads)},
+        )
+        return True
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Re-reads the selector file when it changed. Cheap enough to call
+        per batch; the stat itself is throttled by poll_seconds.
+        """
+        if self.selector_path is None:
+            return False
+
+        now = time.monotonic()
+        if not force and now < self._next_poll:
+            return False
+        self._next_poll = now + self.poll_seconds
+
+        try:
+            mtime = self.selector_path.stat().st_mtime_ns
+        except OSError:
+            return False
+        if mtime == self._selector_mtime:
+            return False
+        self._selector_mtime = mtime
+
+        try:
+            selector = json.loads(self.selector_path.read_text(encoding="utf-8"))
+            name, version = selector["name"], selector["version"]
+        except (OSError, ValueError, KeyError, TypeError) as exc:
+            self._log("warning", "Model selector unreadable", {"path": str(self.selector_path), "error": str(exc)})
+            return False
+
+        if (name, version) == (self.current.name, self.current.version):
+            return False
+        return self.activate(name, version)
+
+    def report(self) -> dict:
+        model = self.current
+        return {
+            "active": self._ref(),
+            "heads": sorted(model.heads),
+            "swaps": self.swaps,
+        }
+
+    def _ref(self) -> str:
+        return f"{self.current.name}/{self.current.version}"
+
+    def _log(self, level: str, message: str, metadata: dict):
+        if self.logger is not None:
+            getattr(self.logger, level)(message, extra={"metadata": {"source": "model_runtime", **metadata}})
@@ -0,0 +1,285 @@
+"""
+OCR and feature extraction in child processes.
+
+Each child owns an OCRExtractor and a TextFeatureEngineer and handles
+one frame at a time. Frames reach it through a per-child shared memory
+slot (multiprocessing.shared_memory), so only a small task dict crosses
+the pipe; the slot is reallocated when a larger frame arrives.
+
+The child returns the text analysis AIService.score_frames() expects:
+
+    ocr              (raw_text, error_code, error_message, ocr_skipped)
+    redacted         redacted OCR text
+    fingerprint      SimHash of the redacted tokens (None for no text)
+    features         v1 text features
+    sparse_features  v2 payload, or None
+
+Scoring, the activity index and the baseline stay in the parent, which
+owns that state. A child that exits or misses the task deadline is
+restarted and its frame is reported as a WORKER_CRASHED/WORKER_TIMEOUT
+partial result. The task deadline follows the frame's remaining OCR
+budget (`timeout`), so a stuck child holds a frame only slightly longer
+than in-process OCR would.
+"""
+
+import multiprocessing as mp
+import threading
+import time
+from multiprocessing import shared_memory
+from queue import Queue
+
+import numpy as np
+
+from agent.config import (
+    AI_HASHING_FEATURES,
+    AI_PROCESS_TASK_GRACE_SECONDS,
+    AI_PROCESS_TASK_TIMEOUT_SECONDS,
+    AI_STAGE_BUDGETS_SECONDS,
+)
+
+
+# Children never inherit the parent's threads or locks.
+_CONTEXT = mp.get_context("spawn")
+
+
+def _worker_main(conn, feature_version: str, hashing_features: int):
+    from agent.ai.extractors.ocr_extractor import OCRExtractor
+    from agent.ai.feature_engineering.keyword_matcher import tokenize
+    from agent.ai.feature_engineering.simhash import simhash
+    from agent.ai.feature_engineering.text_features import TextFeatureEngineer
+
+    extractor = OCRExtractor()
+    engineer = TextFeatureEngineer(feature_version=feature_version, hashing_features=hashing_features)
+    segment = None
+
+    try:
+        while True:
+            task = conn.recv()
+            if task is None:
+                break
+
+            try:
+                ocr_skipped = task.get("raw_text") is not None
+                if ocr_skipped:
+                    raw_text, err_code, err_msg = task["raw_text"], None, None
+                else:
+                    if segment is None or segment.name != task["shm"]:
+                        if segment is not None:
+                            segment.close()
+                        segment = shared_memory.SharedMemory(name=task["shm"])
+
+                    budget = task.get("timeout") or AI_STAGE_BUDGETS_SECONDS["ocr"]
+                    started = time.perf_counter()
+                    frame = np.ndarray(task["shape"], dtype=task["dtype"], buffer=segment.buf)
+                    raw_text, err_code, err_msg = extractor.extract_from_image(frame.copy(), timeout=budget)
+                    del frame
+                    if (time.perf_counter() - started) > budget and not err_code:
+                        err_code = "PIPELINE_TIMEOUT"
+                        err_msg = "ocr stage exceeded its budget"
+
+                redacted = engineer.redact(raw_text)
+                tokens = tokenize(redacted)
+                features, sparse = engineer.featurize(redacted, tokens)
+                conn.send(
+                    {
+                        "ocr": (raw_text, err_code, err_msg, ocr_skipped),
+                        "redacted": redacted,
+                        "tokens": None,
+                        "fingerprint": simhash(tokens) if tokens else None,
+                        "features": features,
+                        "sparse_features": sparse.to_payload() if sparse is not None else None,
+                    }
+                )
+            except Exception as exc:
+                conn.send({"error": str(exc)})
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        if segment is not None:
+            segment.close()
+
+
+class _Worker:
+    def __init__(self, index: int, args: tuple):
+        self.index = index
+        self.args = args
+        self.slot = None
+        self.start()
+
+    def start(self):
+        self.conn, child_conn = _CONTEXT.Pipe()
+        self.process = _CONTEXT.Process(
+            target=_worker_main,
+            args=(child_conn, *self.args),
+            name=f"ai-process-{self.index}",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+
+    def stop(self, timeout: float = 2.0):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(timeout)
+        self.conn.close()
+
+    def write_frame(self, frame: np.ndarray) -> dict:
+        if self.slot is None or self.slot.size < frame.nbytes:
+            self.release_slot()
+            self.slot = shared_memory.SharedMemory(create=True, size=max(1, frame.nbytes))
+
+        view = np.ndarray(frame.shape, dtype=frame.dtype, buffer=self.slot.buf)
+        view[...] = frame
+        del view
+        return {"shm": self.slot.name, "shape": frame.shape, "dtype": frame.dtype.str}
+
+    def release_slot(self):
+        if self.slot is not None:
+            self.slot.close()
+            self.slot.unlink()
+            self.slot = None
+
+
+class AIProcessPool:
+    """
+    Fixed set of supervised child processes for OCR + text features.
+
+    analyze() is thread-safe: each call checks out an idle child, so up
+    to `workers` frames are processed in parallel.
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        logger,
+        feature_version: str,
+        hashing_features: int = AI_HASHING_FEATURES,
+        task_timeout: float = AI_PROCESS_TASK_TIMEOUT_SECONDS,
+        task_grace: float = AI_PROCESS_TASK_GRACE_SECONDS,
+    ):
+        self.logger = logger
+        self.task_timeout = task_timeout
+        self.task_grace = task_grace
+
+        self._workers = [
+            _Worker(index, (feature_version, hashing_features))
+            for index in range(max(1, workers))
+        ]
+        self._idle = Queue()
+        for worker in self._workers:
+            self._idle.put(worker)
+
+        self._lock = threading.Lock()
+        self.tasks = 0
+        self.failed = 0
+        self.restarts = 0
+
+    def analyze(
+        self,
+        frame: np.ndarray | None,
+        raw_text: str | None = None,
+        timeout: float | None = None,
+    ) -> dict:
+        """
+        OCR + features for one frame. When raw_text is given (e.g. reused
+        OCR of an unchanged screen) OCR is skipped and frame may be None.
+        `timeout` is the OCR time left for the frame; the child is given
+        up on task_grace seconds after it.
+        """
+        worker = self._idle.get()
+        try:
+            result = self._run(worker, frame, raw_text, timeout)
+        finally:
+            self._idle.put(worker)
+
+        with self._lock:
+            self.tasks += 1
+            if "error" in result:
+                self.failed += 1
+
+        if "error" in result:
+            code, message = result["error"]
+            return {
+                "ocr": ("", code, message, False),
+                "redacted": "",
+                "tokens": [],
+                "fingerprint": None,
+                "features": None,
+                "sparse_features": None,
+            }
+        return result
+
+    def report(self) -> dict:
+        with self._lock:
+            return {
+                "workers": len(self._workers),
+                "alive": sum(1 for worker in self._workers if worker.process.is_alive()),
+                "tasks": self.tasks,
+                "failed": self.failed,
+                "restarts": self.restarts,
+            }
+
+    def close(self):
+        for worker in self._workers:
+            worker.stop()
+            worker.release_slot()
+
+    # ---------------------------
+    # Internal
+    # ---------------------------
+
+    def _run(self, worker: _Worker, frame, raw_text, timeout: float | None = None) -> dict:
+        if not worker.process.is_alive():
+            self._restart(worker, "exited")
+
+        task_timeout = self.task_timeout
+        if raw_text is not None:
+            task = {"raw_text": raw_text}
+        else:
+            task = worker.write_frame(frame)
+            if timeout is not None:
+                task["timeout"] = max(timeout, 0.001)
+                task_timeout = min(task_timeout, timeout + self.task_grace)
+        try:
+            worker.conn.send(task)
+        except (BrokenPipeError, OSError) as exc:
+            self._restart(worker, "broken pipe")
+            return {"error": ("WORKER_CRASHED", str(exc))}
+
+        deadline = time.monotonic() + task_timeout
+        while True:
+            if worker.conn.poll(0.1):
+                try:
+                    result = worker.conn.recv()
+                except (EOFError, OSError):
+                    break
+                if "error" in result:
+                    return {"error": ("WORKER_ERROR", result["error"])}
+                return result
+
+            if not worker.process.is_alive():
+                break
+
+            if time.monotonic() > deadline:
+                self._restart(worker, "timeout")
+                return {"error": ("WORKER_TIMEOUT", f"AI worker exceeded {task_timeout:.3g}s")}
+
+        exitcode = worker.process.exitcode
+        self._restart(worker, "crashed")
+        return {"error": ("WORKER_CRASHED", f"AI worker exited with code {exitcode}")}
+
+    def _restart(self, worker: _Worker, reason: str):
+        worker.stop(timeout=0.5)
+        worker.start()
+        with self._lock:
+            self.restarts += 1
+
+        self.logger.warning(
+            "AI worker process restarted",
+            extra={"metadata": {"worker": worker.index, "reason": reason, "restarts": self.restarts}},
+        )
@@ -0,0 +1,164 @@
+"""
+Maintenance for the local AI upload queue.
+
+The agent runs QueueMaintenance.run() periodically; the same operations
+are available from the command line for support staff:
+
+Usage:
+    python -m agent.ai.queue_maintenance stats
+    python -m agent.ai.queue_maintenance list [--limit 50]
+    python -m agent.ai.queue_maintenance requeue [ID ...] [--all]
+    python -m agent.ai.queue_maintenance purge [ID ...] [--all]
+    python -m agent.ai.queue_maintenance compact
+
+Pass --db to work on another queue file than AI_QUEUE_DB_PATH. Stop the
+agent before purging or compacting a live queue.
+"""
+
+import argparse
+import json
+import math
+import sys
+import threading
+import time
+from pathlib import Path
+
+from agent.ai.queue_store import AIQueueStore
+from agent.config import (
+    AI_DEAD_LETTER_MAX_REQUEUES,
+    AI_QUEUE_DB_PATH,
+    AI_QUEUE_MAX_BYTES,
+    AI_QUEUE_VACUUM_IDLE_SECONDS,
+    AI_QUEUE_VACUUM_PAGES,
+)
+
+
+class QueueMaintenance:
+    """
+    Keeps the AI queue file bounded and dead letters from piling up.
+
+    Each run():
+      - requeues dead letters while uploads succeed (`uploads_succeeding`),
+        e.g. after an outage, at most `max_requeues` times per row so a
+        metric the server rejects does not cycle forever
+      - evicts the oldest rows, dead letters first, while the used size
+        is above `max_bytes`
+      - returns free pages to the filesystem with an incremental VACUUM
+        when nothing was written for `vacuum_idle_seconds`
+    """
+
+    def __init__(
+        self,
+        store: AIQueueStore,
+        logger,
+        max_bytes: int = AI_QUEUE_MAX_BYTES,
+        vacuum_idle_seconds: float = AI_QUEUE_VACUUM_IDLE_SECONDS,
+        vacuum_pages: int = AI_QUEUE_VACUUM_PAGES,
+        max_requeues: int = AI_DEAD_LETTER_MAX_REQUEUES,
+    ):
+        self.store = store
+        self.logger = logger
+        self.max_bytes = max_bytes
+        self.vacuum_idle_seconds = vacuum_idle_seconds
+        self.vacuum_pages = vacuum_pages
+        self.max_requeues = max_requeues
+
+        self._lock = threading.Lock()
+        self.requeued = 0
+        self.evicted = 0
+        self.vacuumed_pages = 0
+        self.last_run_at = None
+
+    def run(self, uploads_succeeding: bool = False) -> dict:
+        with self._lock:
+            requeued = self.store.requeue_dead_letters(max_requeues=self.max_requeues) if uploads_succeeding else 0
+            evicted = self.enforce_cap()
+            vacuumed = 0
+            if (time.time() - self.store.last_write_at) >= self.vacuum_idle_seconds:
+                vacuumed = self.store.incremental_vacuum(self.vacuum_pages)
+
+            self.requeued += requeued
+            self.vacuumed_pages += vacuumed
+            self.last_run_at = time.time()
+
+        if requeued:
+            self.logger.info(
+                "Requeued dead-lettered AI metrics",
+                extra={"metadata": {"requeued": requeued}},
+            )
+        return {"requeued": requeued, "evicted": evicted, "vacuumed_pages": vacuumed}
+
+    def enforce_cap(self) -> int:
+        """
+        Evicts oldest-first until the used size fits max_bytes.
+        """
+        evicted = 0
+        stats = self.store.size_stats()
+        while stats["used_bytes"] > self.max_bytes and stats["rows"] > 0:
+            excess = stats["used_bytes"] - self.max_bytes
+            bytes_per_row = stats["used_bytes"] / stats["rows"]
+            deleted = self.store.evict_oldest(max(1, math.ceil(excess / bytes_per_row)))
+            if not deleted:
+                break
+            evicted += deleted
+            stats = self.store.size_stats()
+
+        if evicted:
+            self.evicted += evicted
+            self.logger.warning(
+                "AI queue over its size cap; evicted oldest items",
+                extra={"metadata": {"evicted": evicted, "max_bytes": self.max_bytes, **stats}},
+            )
+        return evicted
+
+    def report(self) -> dict:
+        return {
+            **self.store.size_stats(),
+            "max_bytes": self.max_bytes,
+            "dead_letters": self.store.dead_letter_count(),
+            "requeued": self.requeued,
+            "evicted": self.evicted,
+            "vacuumed_pages": self.vacuumed_pages,
+            "last_run_at": self.last_run_at,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and maintain the WorkSight AI upload queue.")
+    parser.add_argument("--db", type=Path, default=AI_QUEUE_DB_PATH, help="queue database path")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("stats", help="file size, backlog and dead-letter counts")
+    list_parser = commands.add_parser("list", help="show dead letters")
+    list_parser.add_argument("--limit", type=int, default=50)
+    for name, help_text in (("requeue", "move dead letters back to the backlog"), ("purge", "delete dead letters")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("ids", nargs="*", type=int)
+        command.add_argument("--all", action="store_true", help="every dead letter")
+    commands.add_parser("compact", help="return all free pages to the filesystem")
+    args = parser.parse_args(argv)
+
+    if args.command in ("requeue", "purge") and not (args.ids or args.all):
+        parser.error(f"{args.command} needs dead-letter ids or --all")
+
+    store = AIQueueStore(args.db)
+    try:
+        if args.command == "stats":
+            result = {**store.size_stats(), "backlog": store.backlog_count(), "dead_letters": store.dead_letter_count()}
+        elif args.command == "list":
+            result = store.dead_letters(args.limit)
+        elif args.command == "requeue":
+            result = {"requeued": store.requeue_dead_letters(None if args.all else args.ids)}
+        elif args.command == "purge":
+            result = {"purged": store.purge_dead_letters(None if args.all else args.ids)}
+        else:
+            result = {"vacuumed_pages": store.incremental_vacuum(store.size_stats()["free_pages"])}
+    finally:
+        store.close()
+
+    print(json.dumps(result, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,75 +1,284 @@
 import json
+import math
 import sqlite3
+import threading
 import time
+import zlib
+from collections import deque
+from datetime import datetime, timezone
 from pathlib import Path
 
+import numpy as np
+
 from agent.ai.types import AIResultEnvelope
+from agent.config import AI_UPLOAD_LEASE_SECONDS, AI_UPLOAD_STARVATION_SHARE
+
+
+# SQLite's default limit on bound parameters is 999 on older builds.
+_MAX_PARAMS = 500
+
+# Rows written before payloads were compressed hold plain JSON text.
+PAYLOAD_JSON = "json"
+PAYLOAD_ZLIB_JSON = "zlib+json"
+
+# Upload priority classes, most urgent first.
+PRIORITY_CLASSES = ("critical", "suspicious", "routine")
+PRIORITY_ROUTINE = len(PRIORITY_CLASSES) - 1
+DELIVERY_WINDOW = 1024
+
+# Columns added after the first release; older queue files gain them on open.
+_ADDED_COLUMNS = {
+    "claimed_until": "REAL NOT NULL DEFAULT 0",
+    "claimer": "TEXT",
+    "payload_encoding": f"TEXT NOT NULL DEFAULT '{PAYLOAD_JSON}'",
+    "requeue_count": "INTEGER NOT NULL DEFAULT 0",
+    "priority": f"INTEGER NOT NULL DEFAULT {PRIORITY_ROUTINE}",
+}
+
+
+def priority_for(metric: dict) -> int:
+    """
+    Index into PRIORITY_CLASSES. Failed pipeline runs carry a fallback
+    "critical" label, so they stay routine.
+    """
+    if metric.get("pipeline_status") == "failed":
+        return PRIORITY_ROUTINE
+    label = metric.get("anomaly_label")
+    if label in PRIORITY_CLASSES[:-1]:
+        return PRIORITY_CLASSES.index(label)
+    return PRIORITY_ROUTINE
+
+
+def encode_payload(metric: dict) -> bytes:
+    """
+    Canonical JSON (sorted keys, no whitespace), zlib-compressed.
+    """
+    body = json.dumps(metric, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return zlib.compress(body.encode("utf-8"))
+
+
+def decode_payload(payload, encoding: str) -> bytes:
+    """
+    Stored payload -> UTF-8 JSON request body.
+    """
+    if encoding == PAYLOAD_ZLIB_JSON:
+        return zlib.decompress(payload)
+    return payload.encode("utf-8") if isinstance(payload, str) else bytes(payload)
 
 
 class AIQueueStore:
-    def __init__(self, db_path: Path):
+    """
+    SQLite-backed outbox for AI metrics awaiting upload.
+
+    Each thread keeps one long-lived connection. The database runs in WAL
+    mode with synchronous=NORMAL, so readers never block the writer and a
+    commit costs a WAL append instead of an fsync (a power loss may drop
+    the last commits, never corrupt the file).
+
+    backlog_count() reads a counter row kept current by triggers instead
+    of counting the table. complete_batch() settles a whole upload batch
+    in one transaction.
+
+    Payloads are stored as zlib-compressed canonical JSON BLOBs and
+    handed to uploaders as ready-to-send JSON bytes, never re-parsed.
+
+    claim() hands out critical anomalies first (see priority_for), except
+    for a `starvation_share` of every batch that goes to the oldest due
+    items whatever their class. Time from enqueue to server ack is
+    tracked per class (delivery_report()).
+
+    Uploaders claim() items under a lease (claimed_until, claimer), taken
+    in a BEGIN IMMEDIATE transaction so concurrent threads or processes
+    never claim the same row. Items whose lease expires unsettled, e.g.
+    after a crash mid-batch, are claimed again by the next uploader.
+
+    The file uses auto_vacuum=INCREMENTAL; dead-letter handling, eviction
+    and vacuuming are driven by QueueMaintenance.
+    """
+
+    def __init__(self, db_path: Path, starvation_share: float = AI_UPLOAD_STARVATION_SHARE):
         self.db_path = db_path
+        self.starvation_share = starvation_share
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._claimers = {}
+        self._claimers_lock = threading.Lock()
+        self.last_write_at = time.time()
+        self._delivery = {name: deque(maxlen=DELIVERY_WINDOW) for name in PRIORITY_CLASSES}
+        self._delivered = dict.fromkeys(PRIORITY_CLASSES, 0)
+        self._delivery_lock = threading.Lock()
         self._init_db()
 
-    def _connect(self):
-        return sqlite3.connect(self.db_path)
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        """
+        Closes every thread's connection; later calls reconnect.
+        """
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                # Closed from another thread than its creator; SQLite
+                # releases it when that thread's handle is collected.
+                pass
+        self._local = threading.local()
 
     def _init_db(self):
-        with self._connect() as conn:
+        conn = self._connect()
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            # Takes effect right away on a new file; existing files are
+            # rebuilt once so freed pages can be returned incrementally.
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+        conn.execute("PRAGMA journal_mode=WAL")
+        with conn:
             conn.execute(
                 """
                 CREATE TABLE IF NOT EXISTS ai_queue (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     idempotency_key TEXT NOT NULL UNIQUE,
-                    payload TEXT NOT NULL,
+                    payload BLOB NOT NULL,
                     attempt INTEGER NOT NULL DEFAULT 0,
                     queued_at TEXT NOT NULL,
                     next_retry_at REAL NOT NULL DEFAULT 0,
                     dead_letter INTEGER NOT NULL DEFAULT 0,
-                    last_error TEXT
+                    last_error TEXT,
+                    claimed_until REAL NOT NULL DEFAULT 0,
+                    claimer TEXT,
+                    payload_encoding TEXT NOT NULL DEFAULT 'json',
+                    requeue_count INTEGER NOT NULL DEFAULT 0,
+                    priority INTEGER NOT NULL DEFAULT 2
                 )
                 """
             )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(ai_queue)")}
+            for name, definition in _ADDED_COLUMNS.items():
+                if name not in columns:
+                    conn.execute(f"ALTER TABLE ai_queue ADD COLUMN {name} {definition}")
             conn.execute(
                 "CREATE INDEX IF NOT EXISTS idx_ai_queue_retry ON ai_queue(dead_letter, next_retry_at)"
             )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_ai_queue_priority ON ai_queue(dead_letter, priority, id)"
+            )
+            self._init_backlog_counter(conn)
+
+    def _init_backlog_counter(self, conn: sqlite3.Connection):
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ai_queue_stats (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+            """
+        )
+        # Seeded from a full count once, when the counter is introduced.
+        conn.execute(
+            """
+            INSERT OR IGNORE INTO ai_queue_stats (name, value)
+            SELECT 'backlog', COUNT(*) FROM ai_queue WHERE dead_letter = 0
+            """
+        )
+        conn.executescript(
+            """
+            CREATE TRIGGER IF NOT EXISTS ai_queue_backlog_insert
+            AFTER INSERT ON ai_queue WHEN NEW.dead_letter = 0
+            BEGIN
+                UPDATE ai_queue_stats SET value = value + 1 WHERE name = 'backlog';
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS ai_queue_backlog_delete
+            AFTER DELETE ON ai_queue WHEN OLD.dead_letter = 0
+            BEGIN
+                UPDATE ai_queue_stats SET value = value - 1 WHERE name = 'backlog';
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS ai_queue_backlog_dead_letter
+            AFTER UPDATE OF dead_letter ON ai_queue WHEN OLD.dead_letter != NEW.dead_letter
+            BEGIN
+                UPDATE ai_queue_stats
+                SET value = value + CASE WHEN NEW.dead_letter = 0 THEN 1 ELSE -1 END
+                WHERE name = 'backlog';
+            END;
+            """
+        )
 
     def enqueue(self, envelope: AIResultEnvelope, idempotency_key: str) -> bool:
-        body = envelope.to_dict()
-        with self._connect() as conn:
-            try:
-                conn.execute(
-                    """
-                    INSERT INTO ai_queue (
-                        idempotency_key, payload, attempt, queued_at, next_retry_at
-                    ) VALUES (?, ?, ?, ?, ?)
-                    """,
-                    (
-                        idempotency_key,
-                        json.dumps(body["metric"]),
-                        body["attempt"],
-                        body["queued_at"],
-                        body["next_retry_at"],
-                    ),
+        return self.enqueue_many([(envelope, idempotency_key)]) == 1
+
+    def enqueue_many(self, entries) -> int:
+        """
+        Inserts (envelope, idempotency_key) pairs in one transaction.
+        Duplicates are skipped; returns the number inserted.
+        """
+        rows = []
+        for envelope, idempotency_key in entries:
+            body = envelope.to_dict()
+            rows.append(
+                (
+                    idempotency_key,
+                    encode_payload(body["metric"]),
+                    PAYLOAD_ZLIB_JSON,
+                    priority_for(body["metric"]),
+                    body["attempt"],
+                    body["queued_at"],
+                    body["next_retry_at"],
                 )
-                return True
-            except sqlite3.IntegrityError:
-                return False
+            )
 
-    def ready_items(self, limit: int) -> list[dict]:
-        now_ts = time.time()
-        with self._connect() as conn:
-            rows = conn.execute(
+        conn = self._connect()
+        self.last_write_at = time.time()
+        with conn:
+            cursor = conn.executemany(
                 """
-                SELECT id, idempotency_key, payload, attempt
-                FROM ai_queue
-                WHERE dead_letter = 0 AND next_retry_at <= ?
-                ORDER BY id ASC
-                LIMIT ?
+                INSERT OR IGNORE INTO ai_queue (
+                    idempotency_key, payload, payload_encoding, priority, attempt, queued_at, next_retry_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?)
                 """,
-                (now_ts, limit),
-            ).fetchall()
+                rows,
+            )
+            # rowcount sums sqlite3_changes(), which leaves out rows changed by triggers
+            return cursor.rowcount
+
+    def claim(self, claimer: str, limit: int, lease_seconds: float = AI_UPLOAD_LEASE_SECONDS) -> list[dict]:
+        """
+        Atomically leases up to `limit` due items to `claimer` for
+        `lease_seconds`, most urgent class first. Items with a live lease
+        are skipped; expired leases are taken over.
+        """
+        now_ts = time.time()
+        oldest_slots = math.ceil(limit * self.starvation_share) if limit > 1 else 0
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        with conn:
+            rows = self._due_rows(conn, now_ts, oldest_slots, by_priority=False)
+            rows += self._due_rows(conn, now_ts, limit - len(rows), by_priority=True, exclude=[row[0] for row in rows])
+            if rows:
+                conn.execute(
+                    f"""
+                    UPDATE ai_queue SET claimed_until = ?, claimer = ?
+                    WHERE id IN ({','.join('?' * len(rows))})
+                    """,
+                    (now_ts + lease_seconds, claimer, *(row[0] for row in rows)),
+                )
+
+        if rows:
+            self.last_write_at = time.time()
+        reclaimed = sum(1 for row in rows if row[4] > 0)
+        self._count(claimer, claimed=len(rows), reclaimed=reclaimed)
 
         items = []
         for row in rows:
@@ -77,41 +286,283 @@ class AIQueueStore:
                 {
                     "id": row[0],
                     "idempotency_key": row[1],
-                    "metric": json.loads(row[2]),
+                    "body": decode_payload(row[2], row[5]),
                     "attempt": row[3],
                 }
             )
         return items
 
+    def _due_rows(self, conn, now_ts: float, limit: int, by_priority: bool, exclude=()) -> list:
+        if limit <= 0:
+            return []
+        # Walk an index already in the wanted order and stop at LIMIT; left
+        # alone the planner prefers the retry index plus a full sort.
+        order, source = ("priority, id", "INDEXED BY idx_ai_queue_priority") if by_priority else ("id", "NOT INDEXED")
+        excluded = f"AND id NOT IN ({','.join('?' * len(exclude))})" if exclude else ""
+        return conn.execute(
+            f"""
+            SELECT id, idempotency_key, payload, attempt, claimed_until, payload_encoding
+            FROM ai_queue {source}
+            WHERE dead_letter = 0 AND next_retry_at <= ? AND claimed_until <= ? {excluded}
+            ORDER BY {order}
+            LIMIT ?
+            """,
+            (now_ts, now_ts, *exclude, limit),
+        ).fetchall()
+
     def mark_success(self, row_id: int):
-        with self._connect() as conn:
-            conn.execute("DELETE FROM ai_queue WHERE id = ?", (row_id,))
+        self.complete_batch(acked=[row_id])
+
+    def ack_many(self, row_ids):
+        self.complete_batch(acked=row_ids)
 
     def reschedule(self, row_id: int, attempt: int, next_retry_at: float, error: str):
-        with self._connect() as conn:
-            conn.execute(
-                """
-                UPDATE ai_queue
-                SET attempt = ?, next_retry_at = ?, last_error = ?
-                WHERE id = ?
-                """,
-                (attempt, next_retry_at, error[:500], row_id),
-            )
+        self.complete_batch(rescheduled=[(row_id, attempt, next_retry_at, error)])
+
+    def reschedule_many(self, updates):
+        self.complete_batch(rescheduled=updates)
 
     def mark_dead_letter(self, row_id: int, error: str):
-        with self._connect() as conn:
-            conn.execute(
-                """
-                UPDATE ai_queue
-                SET dead_letter = 1, last_error = ?
-                WHERE id = ?
-                """,
-                (error[:500], row_id),
+        self.complete_batch(dead_lettered=[(row_id, error)])
+
+    def complete_batch(self, acked=(), rescheduled=(), dead_lettered=(), claimer: str | None = None):
+        """
+        Applies the outcome of an upload batch in a single transaction:
+        acked row ids are deleted, rescheduled (row_id, attempt,
+        next_retry_at, error) rows wait for a retry, dead_lettered
+        (row_id, error) rows leave the backlog. Leases are released.
+
+        With `claimer`, retries and dead letters only apply to rows that
+        claimer still holds, so a stale uploader cannot undo a newer
+        claim. Acks always apply: the item reached the server.
+        """
+        acked = list(acked)
+        rescheduled = list(rescheduled)
+        dead_lettered = list(dead_lettered)
+        owner = " AND claimer = ?" if claimer is not None else ""
+        owner_args = (claimer,) if claimer is not None else ()
+        conn = self._connect()
+        self.last_write_at = time.time()
+        delivered = []
+        with conn:
+            for start in range(0, len(acked), _MAX_PARAMS):
+                chunk = acked[start:start + _MAX_PARAMS]
+                delivered += conn.execute(
+                    f"SELECT priority, queued_at FROM ai_queue WHERE id IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                conn.execute(
+                    f"DELETE FROM ai_queue WHERE id IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+            if rescheduled:
+                conn.executemany(
+                    """
+                    UPDATE ai_queue
+                    SET attempt = ?, next_retry_at = ?, last_error = ?,
+                        claimed_until = 0, claimer = NULL
+                    WHERE id = ?"""
+                    + owner,
+                    [
+                        (attempt, next_retry_at, error[:500], row_id, *owner_args)
+                        for row_id, attempt, next_retry_at, error in rescheduled
+                    ],
+                )
+            if dead_lettered:
+                conn.executemany(
+                    """
+                    UPDATE ai_queue
+                    SET dead_letter = 1, last_error = ?, claimed_until = 0, claimer = NULL
+                    WHERE id = ?"""
+                    + owner,
+                    [(error[:500], row_id, *owner_args) for row_id, error in dead_lettered],
+                )
+
+        self._record_delivery(delivered)
+        if claimer is not None:
+            self._count(
+                claimer,
+                acked=len(acked),
+                rescheduled=len(rescheduled),
+                dead_lettered=len(dead_lettered),
             )
 
     def backlog_count(self) -> int:
-        with self._connect() as conn:
-            row = conn.execute(
-                "SELECT COUNT(*) FROM ai_queue WHERE dead_letter = 0"
-            ).fetchone()
+        row = self._connect().execute(
+            "SELECT value FROM ai_queue_stats WHERE name = 'backlog'"
+        ).fetchone()
         return row[0] if row else 0
+
+    # ---------------------------
+    # Maintenance
+    # ---------------------------
+
+    def dead_letter_count(self) -> int:
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM ai_queue WHERE dead_letter = 1"
+        ).fetchone()[0]
+
+    def dead_letters(self, limit: int = 100) -> list[dict]:
+        rows = self._connect().execute(
+            """
+            SELECT id, idempotency_key, attempt, queued_at, last_error, requeue_count
+            FROM ai_queue
+            WHERE dead_letter = 1
+            ORDER BY id ASC
+            LIMIT ?
+            """,
+            (limit,),
+        ).fetchall()
+        keys = ("id", "idempotency_key", "attempt", "queued_at", "last_error", "requeue_count")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def requeue_dead_letters(self, ids=None, max_requeues: int | None = None) -> int:
+        """
+        Moves dead letters (all, or the given ids) back into the backlog
+        with a fresh retry budget. With max_requeues, rows already
+        requeued that many times stay dead. Returns the rows requeued.
+        """
+        where = "dead_letter = 1"
+        args = []
+        if max_requeues is not None:
+            where += " AND requeue_count < ?"
+            args.append(max_requeues)
+        return self._update_dead_letters(
+            f"""
+            UPDATE ai_queue
+            SET dead_letter = 0, attempt = 0, next_retry_at = 0, requeue_count = requeue_count + 1,
+                claimed_until = 0, claimer = NULL
+            WHERE {where}
+            """,
+            args,
+            ids,
+        )
+
+    def purge_dead_letters(self, ids=None) -> int:
+        return self._update_dead_letters("DELETE FROM ai_queue WHERE dead_letter = 1", [], ids)
+
+    def evict_oldest(self, count: int) -> int:
+        """
+        Deletes up to `count` rows, dead letters first, then the oldest
+        backlog items. Returns the rows deleted.
+        """
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                """
+                DELETE FROM ai_queue WHERE id IN (
+                    SELECT id FROM ai_queue ORDER BY dead_letter DESC, id ASC LIMIT ?
+                )
+                """,
+                (count,),
+            )
+            return cursor.rowcount
+
+    def size_stats(self) -> dict:
+        conn = self._connect()
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        wal_path = self.db_path.with_name(self.db_path.name + "-wal")
+        file_bytes = self.db_path.stat().st_size + (wal_path.stat().st_size if wal_path.exists() else 0)
+        return {
+            "file_bytes": file_bytes,
+            "used_bytes": (page_count - free_pages) * page_size,
+            "free_pages": free_pages,
+            "page_size": page_size,
+            "rows": conn.execute("SELECT COUNT(*) FROM ai_queue").fetchone()[0],
+        }
+
+    def incremental_vacuum(self, pages: int) -> int:
+        """
+        Returns up to `pages` free pages to the filesystem and checkpoints
+        the WAL. Returns the pages freed.
+        """
+        conn = self._connect()
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        # executescript steps the pragma to completion; execute() frees one page.
+        conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+        return before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+    def _update_dead_letters(self, statement: str, args: list, ids) -> int:
+        conn = self._connect()
+        with conn:
+            if ids is None:
+                return conn.execute(statement, args).rowcount
+
+            ids = list(ids)
+            changed = 0
+            for start in range(0, len(ids), _MAX_PARAMS):
+                chunk = ids[start:start + _MAX_PARAMS]
+                changed += conn.execute(
+                    f"{statement} AND id IN ({','.join('?' * len(chunk))})",
+                    [*args, *chunk],
+                ).rowcount
+            return changed
+
+    def delivery_report(self) -> dict:
+        """
+        Seconds from enqueue to server ack per priority class, over the
+        last DELIVERY_WINDOW acks of each class.
+        """
+        with self._delivery_lock:
+            snapshot = {name: (self._delivered[name], np.asarray(recent)) for name, recent in self._delivery.items()}
+
+        report = {}
+        for name, (count, recent) in snapshot.items():
+            p50, p95 = np.percentile(recent, [50, 95]) if recent.size else (0.0, 0.0)
+            report[name] = {
+                "delivered": count,
+                "p50_seconds": round(float(p50), 3),
+                "p95_seconds": round(float(p95), 3),
+                "max_seconds": round(float(recent.max()), 3) if recent.size else 0.0,
+            }
+        return report
+
+    def _record_delivery(self, delivered: list):
+        now = datetime.now(timezone.utc)
+        with self._delivery_lock:
+            for priority, queued_at in delivered:
+                try:
+                    queued = datetime.fromisoformat(queued_at)
+                except (TypeError, ValueError):
+                    continue
+                if queued.tzinfo is None:
+                    queued = queued.replace(tzinfo=timezone.utc)
+                name = PRIORITY_CLASSES[min(max(priority, 0), PRIORITY_ROUTINE)]
+                self._delivery[name].append(max(0.0, (now - queued).total_seconds()))
+                self._delivered[name] += 1
+
+    def claimer_report(self) -> dict:
+        """
+        Per-claimer counters and ack throughput for uploaders in this
+        process.
+        """
+        with self._claimers_lock:
+            report = {}
+            for claimer, stats in self._claimers.items():
+                elapsed = stats["last_at"] - stats["first_at"]
+                report[claimer] = {
+                    **{key: value for key, value in stats.items() if not key.endswith("_at")},
+                    "acked_per_second": round(stats["acked"] / elapsed, 3) if elapsed > 0 else None,
+                }
+            return report
+
+    def _count(self, claimer: str, **counts):
+        now_ts = time.time()
+        with self._claimers_lock:
+            stats = self._claimers.get(claimer)
+            if stats is None:
+                stats = self._claimers[claimer] = {
+                    "claimed": 0,
+                    "reclaimed": 0,
+                    "acked": 0,
+                    "rescheduled": 0,
+                    "dead_lettered": 0,
+                    "first_at": now_ts,
+                    "last_at": now_ts,
+                }
+            for key, value in counts.items():
+                stats[key] += value
+            stats["last_at"] = now_ts
@@ -0,0 +1,73 @@
+import random
+import time
+
+from agent.ai.activity_index import ActivityIndex
+from agent.ai.feature_engineering.keyword_matcher import tokenize
+from agent.ai.feature_engineering.simhash import hamming, simhash
+
+
+SCREEN = (
+    "Inbox (3) - Outlook\nSprint review notes for the deploy pipeline\n"
+    "Build 482 passed on main, waiting for design spec sign-off\n"
+    "Calendar: standup, code review, planning, retro\n"
+    "Pull request 1193: move baseline flushes to a background thread\n"
+    "Reviewers requested, 2 approvals, checks pending on linux and windows runners\n"
+    "Slack: #platform thread about the release train and rollout window for Friday\n"
+    "Terminal: pytest agent services, 43 passed, coverage report written to htmlcov"
+)
+
+
+def test_simhash_is_local_to_small_text_changes():
+    base = simhash(tokenize(SCREEN + " 10:41 AM"))
+    tick = simhash(tokenize(SCREEN + " 10:42 AM"))
+    edited = simhash(tokenize(SCREEN.replace("planning", "grooming")))
+    other = simhash(tokenize("youtube trending music videos playlist shorts subscriptions library"))
+
+    assert base == tick
+    assert hamming(base, edited) <= 6
+    assert hamming(base, other) > 16
+    assert simhash([]) == 0
+
+
+def test_near_duplicates_join_the_founding_cluster():
+    index = ActivityIndex(max_distance=3)
+    first = index.observe(0b1011 << 40)
+    again = index.observe((0b1011 << 40) ^ 0b101)
+    unrelated = index.observe((1 << 64) - 1)
+
+    assert not first.seen_before
+    assert again.seen_before and again.distance == 2
+    assert again.cluster_id == first.cluster_id
+    assert not unrelated.seen_before and unrelated.cluster_id != first.cluster_id
+
+
+def test_band_index_finds_every_neighbour_within_the_threshold():
+    rng = random.Random(3)
+    index = ActivityIndex(capacity=5000)
+    stored = [rng.getrandbits(64) for _ in range(4000)]
+    for fingerprint in stored:
+        index.observe(fingerprint)
+
+    for fingerprint in stored[::97]:
+        probe = fingerprint
+        for bit in rng.sample(range(64), index.max_distance):
+            probe ^= 1 << bit
+        match = index.lookup(probe)
+        assert match is not None and match.distance <= index.max_distance
+
+    started = time.perf_counter()
+    for _ in range(1000):
+        index.lookup(rng.getrandbits(64))
+    assert (time.perf_counter() - started) / 1000 < 0.001
+
+
+def test_least_recently_seen_entries_are_evicted():
+    index = ActivityIndex(capacity=2, max_distance=0)
+    index.observe(1)
+    index.observe(2)
+    index.observe(1)
+    index.observe(4)
+
+    assert index.lookup(2) is None
+    assert index.lookup(1) is not None
+    assert index.stats() == {"fingerprints": 2, "clusters": 2}
@@ -0,0 +1,191 @@
+import json
+import math
+import sqlite3
+import statistics
+
+from agent.ai.baseline_store import BaselineStore, hour_of_week
+
+
+SAMPLE_TS = 1_700_470_800.0  # buckets use local time, so only offsets matter
+
+
+class _Logger:
+    def __init__(self):
+        self.warnings = []
+
+    def warning(self, message, extra=None):
+        self.warnings.append((message, extra))
+
+
+def _store(path, **kwargs):
+    kwargs.setdefault("half_life_seconds", None)
+    kwargs.setdefault("hour_of_week_buckets", False)
+    return BaselineStore(str(path), **kwargs)
+
+
+def test_undecayed_stats_match_lifetime_welford(tmp_path):
+    store = _store(tmp_path / "agent.sqlite3")
+    values = [3.0, 7.0, 8.0, 1.0, 12.0]
+    for value in values:
+        store.update({"word_count": value, "label": "ignored", "unknown": 4.0})
+
+    stats = store.get_stats("word_count")
+
+    assert stats["count"] == 5
+    assert math.isclose(stats["mean"], statistics.mean(values))
+    assert math.isclose(stats["std"], statistics.stdev(values))
+    assert store.get_stats("unknown") is None
+
+
+def test_decay_favours_recent_samples(tmp_path):
+    store = _store(tmp_path / "agent.sqlite3", half_life_seconds=3600)
+    for offset in range(10):
+        store.update({"word_count": 10.0}, timestamp=SAMPLE_TS + offset)
+    for offset in range(10):
+        store.update({"word_count": 100.0}, timestamp=SAMPLE_TS + 7 * 24 * 3600 + offset)
+
+    stats = store.get_stats("word_count")
+
+    assert stats["count"] == 20
+    assert stats["mean"] > 99.0
+
+
+def test_late_sample_does_not_rewind_decay_clock(tmp_path):
+    store = _store(tmp_path / "agent.sqlite3", half_life_seconds=3600)
+    store.update({"word_count": 10.0}, timestamp=SAMPLE_TS)
+    store.update({"word_count": 10.0}, timestamp=SAMPLE_TS - 1800)
+
+    assert store.last_ts[store.feature_index["word_count"], 0] == SAMPLE_TS
+
+
+def test_lookup_uses_hour_bucket_once_it_has_enough_samples(tmp_path):
+    store = _store(tmp_path / "agent.sqlite3", hour_of_week_buckets=True, min_bucket_samples=3)
+    other_hour = SAMPLE_TS + 5 * 3600
+    for offset in range(6):
+        store.update({"word_count": 50.0 + offset}, timestamp=other_hour + offset)
+
+    mean, std, count = store.lookup(SAMPLE_TS)
+    row = store.feature_index["word_count"]
+    assert count[row] == 6  # falls back to the global bucket
+
+    for offset in range(3):
+        store.update({"word_count": 5.0 + offset}, timestamp=SAMPLE_TS + offset)
+
+    mean, std, count = store.lookup(SAMPLE_TS)
+    assert count[row] == 3
+    assert math.isclose(mean[row], 6.0)
+    assert math.isclose(std[row], 1.0)
+    assert hour_of_week(SAMPLE_TS) != hour_of_week(other_hour)
+
+
+def test_updates_are_buffered_until_flush_threshold(tmp_path):
+    path = tmp_path / "agent.sqlite3"
+    store = _store(path, flush_every=3, flush_interval=3600)
+
+    store.update({"word_count": 10})
+    store.update({"word_count": 12})
+    assert _store(path).get_stats("word_count") is None
+
+    store.update({"word_count": 14})
+    assert _store(path).get_stats("word_count")["count"] == 3
+
+    report = store.flush_report()
+    assert report["flushes"] == 1
+    assert report["bytes_written"] > 0
+    assert report["pending_updates"] == 0
+
+
+def test_close_flushes_and_reload_restores_arrays(tmp_path):
+    path = tmp_path / "agent.sqlite3"
+    store = BaselineStore(str(path), flush_every=100, flush_interval=3600)
+    for offset, value in enumerate((1.0, 2.0, 3.0, 4.0)):
+        store.update({"alpha_ratio": value}, timestamp=SAMPLE_TS + offset)
+    expected = store.lookup(SAMPLE_TS)
+    store.close()
+
+    reloaded = BaselineStore(str(path))
+
+    for before, after in zip(expected, reloaded.lookup(SAMPLE_TS)):
+        assert before.tolist() == after.tolist()
+
+
+def test_reload_remaps_changed_feature_list(tmp_path):
+    path = tmp_path / "agent.sqlite3"
+    store = _store(path, feature_names=("word_count", "alpha_ratio"))
+    for value in (1.0, 2.0, 3.0):
+        store.update({"word_count": value, "alpha_ratio": value / 10})
+    store.close()
+
+    reloaded = _store(path, feature_names=("alpha_ratio", "changed_pixel_ratio"))
+
+    assert reloaded.get_stats("alpha_ratio")["count"] == 3
+    assert reloaded.get_stats("changed_pixel_ratio") is None
+
+
+def test_legacy_json_baseline_is_migrated_once(tmp_path):
+    legacy = tmp_path / "agent.json"
+    legacy.write_text(json.dumps({"word_count": {"count": 12, "mean": 5.0, "M2": 22.0}}))
+
+    store = _store(legacy)
+
+    assert store.path == tmp_path / "agent.sqlite3"
+    assert store.get_stats("word_count") == {"mean": 5.0, "std": math.sqrt(2.0), "count": 12}
+    assert not legacy.exists()
+    assert (tmp_path / "agent.json.migrated").exists()
+    assert _store(tmp_path / "agent.sqlite3").get_stats("word_count")["count"] == 12
+
+
+def test_row_per_feature_table_is_migrated(tmp_path):
+    path = tmp_path / "agent.sqlite3"
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE baseline_stats (feature TEXT PRIMARY KEY, count INTEGER, mean REAL, m2 REAL)")
+        conn.execute("INSERT INTO baseline_stats VALUES ('line_count', 4, 2.0, 3.0)")
+
+    store = _store(path)
+
+    assert store.get_stats("line_count") == {"mean": 2.0, "std": 1.0, "count": 4}
+    with sqlite3.connect(path) as conn:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert "baseline_stats" not in tables
+
+
+def test_corrupt_legacy_json_is_kept_aside_and_reported(tmp_path):
+    legacy = tmp_path / "agent.json"
+    legacy.write_text('{"word_count": {"count": 3,')
+    logger = _Logger()
+
+    store = _store(legacy, logger=logger)
+
+    assert store.get_stats("word_count") is None
+    assert (tmp_path / "agent.json.corrupt").exists()
+    assert logger.warnings and "unreadable" in logger.warnings[0][0]
+
+
+def test_snapshot_is_immutable_and_replaced_on_update(tmp_path):
+    store = _store(tmp_path / "agent.sqlite3")
+    store.update({"word_count": 1.0})
+    before = store.snapshot
+
+    store.update({"word_count": 3.0})
+
+    assert store.snapshot is not before
+    assert before.stats("word_count") is None
+    assert store.snapshot.stats("word_count")["count"] == 2
+    assert not store.snapshot.mean.flags.writeable
+    assert math.isclose(store.snapshot.std[store.feature_index["word_count"], 0], math.sqrt(2.0))
+
+
+def test_readiness_is_sticky_and_limited_to_ready_features(tmp_path):
+    path = tmp_path / "agent.sqlite3"
+    store = _store(path, ready_features=("alpha_ratio",), min_ready_samples=3)
+
+    for value in range(5):
+        store.update({"line_count": float(value)})
+    assert not store.ready
+
+    for value in range(3):
+        store.update({"alpha_ratio": value / 10})
+    assert store.ready
+    store.close()
+
+    assert _store(path, ready_features=("alpha_ratio",), min_ready_samples=3).snapshot.ready
@@ -0,0 +1,69 @@
+import io
+import json
+
+from PIL import Image
+
+from agent.ai.batch_process import discover_images, main, run, summarize
+
+
+def _make_images(directory, count):
+    directory.mkdir(parents=True, exist_ok=True)
+    for index in range(count):
+        Image.new("RGB", (8, 8), color=(index, index, index)).save(directory / f"shot_{index}.png")
+
+
+def test_discover_images_handles_dirs_globs_and_recursion(tmp_path):
+    _make_images(tmp_path / "a", 2)
+    _make_images(tmp_path / "a" / "nested", 1)
+    (tmp_path / "a" / "notes.txt").write_text("not an image")
+
+    assert len(discover_images([str(tmp_path / "a")])) == 2
+    assert len(discover_images([str(tmp_path / "a")], recursive=True)) == 3
+    assert len(discover_images([str(tmp_path / "**" / "*.png")])) == 3
+
+
+def test_run_streams_one_ndjson_row_per_image(tmp_path):
+    _make_images(tmp_path / "shots", 3)
+    output = io.StringIO()
+
+    report = run(
+        discover_images([str(tmp_path / "shots")]),
+        output,
+        workers=1,
+        baseline_dir=str(tmp_path / "baselines"),
+    )
+
+    rows = [json.loads(line) for line in output.getvalue().splitlines()]
+    assert len(rows) == 3
+    assert all(row["source_type"] == "screenshot" for row in rows)
+    assert len(report["latencies"]["total"]) == 3
+    assert len(report["latencies"]["ocr"]) == 3
+    assert "images/s" in summarize(report["latencies"], 3, 0.5)
+
+
+def test_main_with_process_pool_writes_output_file(tmp_path):
+    _make_images(tmp_path / "shots", 4)
+    out_path = tmp_path / "metrics.ndjson"
+
+    exit_code = main([str(tmp_path / "shots"), "-o", str(out_path), "-w", "2"])
+
+    assert exit_code == 0
+    assert len(out_path.read_text(encoding="utf-8").splitlines()) == 4
+
+
+def test_baselines_are_flushed_once_per_worker(tmp_path):
+    import sqlite3
+
+    from agent.ai import batch_process
+
+    _make_images(tmp_path / "shots", 3)
+    run(discover_images([str(tmp_path / "shots")]), io.StringIO(), workers=1, baseline_dir=str(tmp_path / "single"))
+    assert batch_process._worker_service.baseline.flush_report()["flushes"] == 1
+
+    pooled = tmp_path / "pooled"
+    main([str(tmp_path / "shots"), "-o", str(tmp_path / "metrics.ndjson"), "-w", "2", "--baseline-dir", str(pooled)])
+    stored = 0
+    for path in pooled.glob("worker-*.sqlite3"):
+        with sqlite3.connect(path) as conn:
+            stored += conn.execute("SELECT COUNT(*) FROM baseline_arrays").fetchone()[0]
+    assert stored > 0
@@ -0,0 +1,46 @@
+import time
+
+from agent.ai.deadline import Deadline, StageLatencyHistogram
+
+
+def test_lap_flags_the_first_stage_over_budget():
+    histogram = StageLatencyHistogram()
+    deadline = Deadline({"ocr": 0.005, "features": 1.0}, total_seconds=10.0, histogram=histogram)
+
+    time.sleep(0.01)
+    assert deadline.lap("ocr") is True
+    assert deadline.lap("features") is False
+
+    assert deadline.overrun_stage == "ocr"
+    assert set(deadline.timings) == {"ocr", "features"}
+    report = histogram.report()
+    assert report["ocr"]["overruns"] == 1
+    assert report["ocr"]["budget_ratio_histogram"][">2x"] == 1
+    assert report["features"]["budget_ratio_histogram"]["<=0.25x"] == 1
+
+
+def test_timeout_for_is_capped_by_the_total_deadline():
+    deadline = Deadline({"ocr": 2.0}, total_seconds=0.5)
+
+    assert deadline.timeout_for("ocr") <= 0.5
+    assert deadline.timeout_for("unbudgeted") <= 0.5
+    assert not deadline.expired()
+
+
+def test_batch_budgets_apply_per_frame():
+    histogram = StageLatencyHistogram()
+    deadline = Deadline({"features": 0.004}, total_seconds=10.0, histogram=histogram, items=4)
+
+    time.sleep(0.01)
+
+    assert deadline.lap("features") is False
+    assert histogram.report()["features"]["count"] == 4
+
+
+def test_resumed_deadline_counts_time_spent_upstream():
+    deadline = Deadline({"anomaly": 1.0}, total_seconds=0.05, started=time.perf_counter() - 0.1)
+
+    assert deadline.expired()
+    assert deadline.lap("anomaly") is True
+    assert deadline.overrun_stage == "anomaly"
+    assert deadline.timings["anomaly"] < 50
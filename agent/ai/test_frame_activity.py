@@ -0,0 +1,48 @@
+import numpy as np
+
+from agent.ai.feature_engineering.frame_activity import FrameActivityTracker, to_gray
+
+
+def _frame(height=64, width=96, value=40):
+    return np.full((height, width, 3), value, dtype=np.uint8)
+
+
+def test_first_frame_counts_as_fully_changed():
+    tracker = FrameActivityTracker(downsample=2, block_size=8)
+
+    activity = tracker.update(_frame(), timestamp=100.0)
+
+    # 32 x 48 sampled pixels -> 4 x 6 blocks
+    assert activity == {"changed_pixel_ratio": 1.0, "dirty_blocks": 24, "seconds_since_change": 0.0}
+
+
+def test_unchanged_frames_accumulate_idle_time():
+    tracker = FrameActivityTracker(downsample=2, block_size=8)
+    tracker.update(_frame(), timestamp=100.0)
+
+    tracker.update(_frame(value=45), timestamp=110.0)  # below the threshold
+    activity = tracker.update(_frame(value=45), timestamp=130.0)
+
+    assert activity == {"changed_pixel_ratio": 0.0, "dirty_blocks": 0, "seconds_since_change": 30.0}
+
+
+def test_localised_change_marks_only_touched_blocks():
+    tracker = FrameActivityTracker(downsample=2, block_size=8)
+    tracker.update(_frame(), timestamp=100.0)
+
+    changed = _frame()
+    changed[0:4, 0:4] = 255  # 2 x 2 sampled pixels inside the first block
+    changed[60:64, 90:96] = 0  # bottom-right, partially filled block
+    activity = tracker.update(changed, timestamp=105.0)
+
+    assert activity["dirty_blocks"] == 2
+    assert activity["changed_pixel_ratio"] == round(10 / (32 * 48), 4)
+    assert activity["seconds_since_change"] == 0.0
+
+
+def test_gray_conversion_accepts_rgba_and_single_channel():
+    rgba = np.zeros((4, 4, 4), dtype=np.uint8)
+    rgba[..., :3] = 255
+
+    assert to_gray(rgba).max() == 255
+    assert to_gray(np.full((4, 4), 7, dtype=np.uint8)).tolist() == [[7] * 4] * 4
@@ -0,0 +1,164 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from agent.ai.baseline_store import BaselineStore
+from agent.ai.feature_engineering.text_features import FEATURE_NAMES
+from agent.ai.models.anomaly_model import AnomalyModel
+from agent.ai.models.productivity_model import ProductivityModel
+from agent.ai.models.runtime import ModelArtifactError, ModelRuntime, load_artifact, save_artifact
+
+
+FEATURES = np.array(
+    [
+        [12.0, 2.0, 3.0, 0.0, 0.8],
+        [1.0, 1.0, 0.0, 4.0, 0.1],
+        [np.nan, 0.0, 0.0, 0.0, 0.5],
+    ]
+)
+
+
+class _Logger:
+    def __init__(self):
+        self.records = []
+
+    def info(self, message, extra=None):
+        self.records.append(("info", message))
+
+    def warning(self, message, extra=None):
+        self.records.append(("warning", message))
+
+
+def _save(model_dir, version, weight=0.5):
+    return save_artifact(
+        model_dir,
+        "edge",
+        version,
+        feature_names=("focus_keyword_hits", "distraction_keyword_hits", "word_count"),
+        heads={
+            "productivity": {
+                "kind": "logistic",
+                "scale": 100.0,
+                "weights": [weight, -0.8, 0.05],
+                "bias": [0.1],
+            },
+            "anomaly_static": {
+                "kind": "stumps",
+                "base": 0.1,
+                "feature": [2, 1],
+                "threshold": [1.5, 1.0],
+                "left": [0.4, 0.0],
+                "right": [0.0, 0.3],
+            },
+        },
+    )
+
+
+def _runtime(tmp_path, **kwargs):
+    kwargs.setdefault("poll_seconds", 0)
+    return ModelRuntime(
+        _Logger(),
+        model_dir=tmp_path,
+        selector_path=tmp_path / "active.json",
+        **kwargs,
+    )
+
+
+def test_artifact_heads_are_memory_mapped_and_score_in_feature_order(tmp_path):
+    _save(tmp_path, "1")
+    model = load_artifact(tmp_path, "edge", "1")
+
+    assert isinstance(model.heads["productivity"].arrays["weights"], np.memmap)
+
+    columns = {name: index for index, name in enumerate(FEATURE_NAMES)}
+    focus = FEATURE_NAMES.index("focus_keyword_hits")
+    distraction = FEATURE_NAMES.index("distraction_keyword_hits")
+    words = np.nan_to_num(FEATURES[:, columns["word_count"]])
+    logits = 0.5 * FEATURES[:, focus] - 0.8 * FEATURES[:, distraction] + 0.05 * words + 0.1
+    expected = np.round(100.0 / (1.0 + np.exp(-logits)), 2)
+
+    np.testing.assert_array_equal(model.predict("productivity", FEATURES), expected)
+    np.testing.assert_allclose(model.predict("anomaly_static", FEATURES), [0.1, 0.8, 0.5])
+    assert model.predict("missing", FEATURES) is None
+
+
+def test_scalar_and_batch_paths_use_the_model_heads(tmp_path):
+    _save(tmp_path, "1")
+    model = load_artifact(tmp_path, "edge", "1")
+    anomaly = AnomalyModel(BaselineStore(str(tmp_path / "baseline.sqlite3")))
+    productivity = ProductivityModel()
+    rows = [dict(zip(FEATURE_NAMES, row)) for row in FEATURES[:2]]
+
+    scores, mode = anomaly.evaluate_batch(FEATURES[:2], model=model)
+
+    assert mode == "static"
+    assert [anomaly.evaluate(row, model=model)[0] for row in rows] == scores.tolist()
+    assert anomaly.evaluate(rows[0], model=model)[1]["model"] == "edge/1"
+    assert [productivity.predict("", row, model=model) for row in rows] == (
+        productivity.predict_batch(["", ""], FEATURES[:2], model=model).tolist()
+    )
+
+
+def test_missing_artifact_falls_back_to_heuristics(tmp_path):
+    runtime = _runtime(tmp_path, name="edge", version="404")
+
+    assert runtime.current.heads == {}
+    assert runtime.report()["active"] == "edge/404"
+    assert ProductivityModel().predict_batch([""], FEATURES[:1], model=runtime.current).tolist() == [
+        ProductivityModel().predict("", dict(zip(FEATURE_NAMES, FEATURES[0])))
+    ]
+
+
+def test_selector_file_hot_swaps_and_rejects_bad_artifacts(tmp_path):
+    _save(tmp_path, "1")
+    runtime = _runtime(tmp_path, name="edge", version="1")
+    first = runtime.current
+    assert first.version == "1"
+
+    _save(tmp_path, "2", weight=2.0)
+    (tmp_path / "active.json").write_text(json.dumps({"name": "edge", "version": "2"}))
+    assert runtime.refresh()
+    assert runtime.current.version == "2"
+    assert first.predict("productivity", FEATURES) is not None  # old reference stays usable
+
+    broken = tmp_path / "edge" / "3"
+    broken.mkdir()
+    (broken / "manifest.json").write_text(json.dumps({"feature_names": ["word_count"], "heads": {"x": {"kind": "tree"}}}))
+    selector = tmp_path / "active.json"
+    selector.write_text(json.dumps({"name": "edge", "version": "3"}))
+    os.utime(selector, ns=(1, 1))
+
+    assert not runtime.refresh()
+    assert runtime.current.version == "2"
+    assert ("warning", "Model artifact rejected, keeping current model") in runtime.logger.records
+
+
+def test_resaving_a_version_is_refused_while_it_is_being_loaded(tmp_path):
+    _save(tmp_path, "1")
+    stop = threading.Event()
+    loaded = []
+    errors = []
+
+    def load_repeatedly():
+        while not stop.is_set():
+            try:
+                loaded.append(load_artifact(tmp_path, "edge", "1").heads["productivity"].arrays["weights"][0])
+            except Exception as exc:
+                errors.append(exc)
+
+    loader = threading.Thread(target=load_repeatedly)
+    loader.start()
+    try:
+        for _ in range(20):
+            with pytest.raises(ModelArtifactError, match="already exists"):
+                _save(tmp_path, "1", weight=2.0)
+    finally:
+        stop.set()
+        loader.join()
+
+    assert errors == []
+    assert loaded and set(loaded) == {0.5}
+    assert [path.name for path in (tmp_path / "edge").iterdir()] == ["1"]
@@ -0,0 +1,91 @@
+import os
+import signal
+import time
+
+import numpy as np
+import pytest
+
+from agent.ai.feature_engineering.keyword_matcher import tokenize
+from agent.ai.feature_engineering.simhash import simhash
+from agent.ai.process_pool import AIProcessPool
+from agent.services.ai_service import AIService
+
+
+TEXT = "Jira ticket review for the deploy build\nsecond line with bob@example.com"
+
+
+class _Logger:
+    def __init__(self):
+        self.warnings = []
+
+    def info(self, *args, **kwargs):
+        pass
+
+    def warning(self, message, extra=None):
+        self.warnings.append((message, extra))
+
+    def error(self, *args, **kwargs):
+        pass
+
+
+@pytest.fixture
+def pool():
+    pool = AIProcessPool(1, _Logger(), feature_version="v2", hashing_features=1 << 10, task_timeout=10)
+    yield pool
+    pool.close()
+
+
+def test_child_analysis_matches_in_process_features(pool, tmp_path):
+    service = AIService(_Logger(), "agent-x", baseline_path=str(tmp_path / "baseline.json"))
+
+    result = pool.analyze(None, raw_text=TEXT)
+    local = service._analyze_text((TEXT, None, None, True))
+
+    assert result["ocr"] == (TEXT, None, None, True)
+    assert result["redacted"] == local["redacted"]
+    assert result["fingerprint"] == simhash(tokenize(local["redacted"]))
+    assert result["features"] == service.feature_engineer.extract(local["redacted"])
+    assert result["sparse_features"]["dim"] == 1 << 10
+
+
+def test_frames_are_handed_over_through_shared_memory(pool):
+    small = np.zeros((8, 8, 3), dtype=np.uint8)
+    large = np.full((32, 48, 3), 255, dtype=np.uint8)
+
+    first = pool.analyze(small)
+    slot = pool._workers[0].slot.name
+    second = pool.analyze(large)
+
+    assert first["ocr"][3] is False
+    assert second["ocr"][3] is False
+    assert pool._workers[0].slot.name != slot
+    assert pool._workers[0].slot.size >= large.nbytes
+    assert pool.report()["failed"] == 0
+
+
+def test_crashed_child_is_restarted(pool):
+    pool._workers[0].process.kill()
+    pool._workers[0].process.join()
+
+    result = pool.analyze(None, raw_text=TEXT)
+
+    assert result["ocr"][0] == TEXT
+    assert pool.report()["restarts"] == 1
+    assert pool.report()["alive"] == 1
+    assert pool.logger.warnings[0][1]["metadata"]["reason"] == "exited"
+
+
+def test_stuck_child_is_given_up_on_at_the_frame_deadline():
+    pool = AIProcessPool(1, _Logger(), feature_version="v2", task_timeout=30, task_grace=0.2)
+    try:
+        pool.analyze(None, raw_text=TEXT)  # child is up
+        os.kill(pool._workers[0].process.pid, signal.SIGSTOP)
+
+        started = time.monotonic()
+        result = pool.analyze(np.zeros((8, 8, 3), dtype=np.uint8), timeout=0.3)
+
+        assert result["ocr"][1] == "WORKER_TIMEOUT"
+        assert time.monotonic() - started < 5
+        assert pool.logger.warnings[0][1]["metadata"]["reason"] == "timeout"
+    finally:
+        pool.close()
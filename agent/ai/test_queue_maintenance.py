@@ -0,0 +1,93 @@
+import json
+
+from agent.ai.queue_maintenance import QueueMaintenance, main
+from agent.ai.queue_store import AIQueueStore
+from agent.ai.test_queue_store import _envelope
+
+
+class _Logger:
+    def __init__(self):
+        self.infos = []
+        self.warnings = []
+
+    def info(self, message, extra=None):
+        self.infos.append((message, extra))
+
+    def warning(self, message, extra=None):
+        self.warnings.append((message, extra))
+
+
+def _dead_lettered_store(tmp_path, count=3) -> AIQueueStore:
+    store = AIQueueStore(tmp_path / "queue.sqlite3")
+    store.enqueue_many([(_envelope(index), f"key-{index}") for index in range(count)])
+    items = store.claim("uploader", count)
+    store.complete_batch(dead_lettered=[(item["id"], "HTTP 503") for item in items], claimer="uploader")
+    return store
+
+
+def test_dead_letters_are_listed_requeued_and_purged(tmp_path):
+    store = _dead_lettered_store(tmp_path)
+
+    listed = store.dead_letters()
+    assert [row["last_error"] for row in listed] == ["HTTP 503"] * 3
+    assert store.backlog_count() == 0
+
+    assert store.requeue_dead_letters([listed[0]["id"]]) == 1
+    assert store.backlog_count() == 1
+    assert store.dead_letter_count() == 2
+
+    assert store.purge_dead_letters() == 2
+    assert store.dead_letter_count() == 0
+    assert store.backlog_count() == 1
+
+
+def test_requeue_on_recovery_is_bounded_per_row(tmp_path):
+    store = _dead_lettered_store(tmp_path, count=1)
+    maintenance = QueueMaintenance(store, _Logger(), max_requeues=1)
+
+    assert maintenance.run(uploads_succeeding=False)["requeued"] == 0
+    assert maintenance.run(uploads_succeeding=True)["requeued"] == 1
+
+    item = store.claim("uploader", 1)[0]
+    store.complete_batch(dead_lettered=[(item["id"], "HTTP 400")], claimer="uploader")
+    assert maintenance.run(uploads_succeeding=True)["requeued"] == 0
+    assert store.dead_letter_count() == 1
+
+
+def test_size_cap_evicts_dead_letters_then_oldest_and_vacuum_shrinks_file(tmp_path):
+    store = AIQueueStore(tmp_path / "queue.sqlite3")
+    store.enqueue_many([(_envelope(index), f"key-{index}") for index in range(400)])
+    dead = store.claim("uploader", 1)[0]
+    store.complete_batch(dead_lettered=[(dead["id"], "HTTP 400")], claimer="uploader")
+
+    logger = _Logger()
+    cap = store.size_stats()["used_bytes"] // 2
+    maintenance = QueueMaintenance(store, logger, max_bytes=cap, vacuum_idle_seconds=0, vacuum_pages=0)
+    result = maintenance.run()
+
+    stats = store.size_stats()
+    assert result["evicted"] > 0
+    assert result["vacuumed_pages"] > 0
+    assert stats["used_bytes"] <= cap
+    assert stats["free_pages"] == 0
+    assert store.dead_letter_count() == 0
+    assert store.backlog_count() == stats["rows"]
+    assert store.claim("uploader", 1)[0]["idempotency_key"] == f"key-{400 - stats['rows']}"
+    assert logger.warnings[0][1]["metadata"]["evicted"] == result["evicted"]
+
+    report = maintenance.report()
+    assert report["evicted"] == result["evicted"]
+    assert report["file_bytes"] > 0
+
+
+def test_cli_requeues_all_dead_letters(tmp_path, capsys):
+    store = _dead_lettered_store(tmp_path)
+    store.close()
+
+    assert main(["--db", str(store.db_path), "requeue", "--all"]) == 0
+    assert json.loads(capsys.readouterr().out) == {"requeued": 3}
+
+    main(["--db", str(store.db_path), "stats"])
+    stats = json.loads(capsys.readouterr().out)
+    assert stats["backlog"] == 3
+    assert stats["dead_letters"] == 0
@@ -0,0 +1,204 @@
+import json
+import sqlite3
+import threading
+import time
+
+from agent.ai.queue_store import AIQueueStore, priority_for
+from agent.ai.types import AIMetricV1, AIResultEnvelope
+
+
+def _envelope(index: int = 0, anomaly_label: str = "normal", pipeline_status: str = "ok") -> AIResultEnvelope:
+    return AIResultEnvelope(
+        metric=AIMetricV1(
+            agent_timestamp="2026-01-01T00:00:00+00:00",
+            source_type="screenshot",
+            source_ref=f"shot-{index}.png",
+            feature_version="v1",
+            features={"word_count": index},
+            productivity_score=0.5,
+            anomaly_score=0.0,
+            anomaly_label=anomaly_label,
+            model_info={},
+            pipeline_status=pipeline_status,
+        )
+    )
+
+
+def _count(store) -> int:
+    with sqlite3.connect(store.db_path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM ai_queue WHERE dead_letter = 0").fetchone()[0]
+
+
+def test_uses_wal_and_reuses_the_thread_connection(tmp_path):
+    store = AIQueueStore(tmp_path / "queue.sqlite3")
+
+    conn = store._connect()
+    assert store._connect() is conn
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(store._connect()))
+    thread.start()
+    thread.join()
+    assert other[0] is not conn
+
+
+def test_enqueue_skips_duplicates(tmp_path):
+    store = AIQueueStore(tmp_path / "queue.sqlite3")
+
+    assert store.enqueue(_envelope(1), "key-1") is True
+    assert store.enqueue(_envelope(1), "key-1") is False
+    assert store.enqueue_many([(_envelope(1), "key-1"), (_envelope(2), "key-2"), (_envelope(3), "key-3")]) == 2
+    assert store.backlog_count() == 3
+
+
+def test_complete_batch_settles_outcomes_and_keeps_counter_exact(tmp_path):
+    store = AIQueueStore(tmp_path / "queue.sqlite3")
+    store.enqueue_many([(_envelope(index), f"key-{index}") for index in range(6)])
+    ids = [item["id"] for item in store.claim("uploader", 5)]
+
+    store.complete_batch(
+        acked=ids[:3],
+        rescheduled=[(ids[3], 1, time.time() + 60, "timeout")],
+        dead_lettered=[(ids[4], "bad request")],
+        claimer="uploader",
+    )
+
+    assert store.backlog_count() == _count(store) == 2
+    ids.append(store.claim("uploader", 10)[0]["id"])
+    assert len(ids) == 6
+
+    store.ack_many(ids)
+    assert store.backlog_count() == _count(store) == 0
+
+
+def test_counter_is_seeded_for_an_existing_queue(tmp_path):
+    path = tmp_path / "queue.sqlite3"
+    store = AIQueueStore(path)
+    store.enqueue_many([(_envelope(index), f"key-{index}") for index in range(4)])
+    store.close()
+
+    with sqlite3.connect(path) as conn:
+        conn.execute("DROP TABLE ai_queue_stats")
+
+    assert AIQueueStore(path).backlog_count() == 4
+
+
+def test_concurrent_claimers_never_share_items(tmp_path):
+    store = AIQueueStore(tmp_path / "queue.sqlite3")
+    store.enqueue_many([(_envelope(index), f"key-{index}") for index in range(200)])
+    claimed = {}
+
+    def drain(claimer):
+        other = AIQueueStore(store.db_path)
+        ids = claimed.setdefault(claimer, [])
+        while True:
+            batch = other.claim(claimer, 7)
+            if not batch:
+                break
+            ids.extend(item["id"] for item in batch)
+            other.complete_batch(acked=[item["id"] for item in batch], claimer=claimer)
+
+    threads = [threading.Thread(target=drain, args=(f"uploader-{index}",)) for index in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    all_ids = [row_id for ids in claimed.values() for row_id in ids]
+    assert len(all_ids) == len(set(all_ids)) == 200
+    assert store.backlog_count() == 0
+
+
+def test_expired_lease_is_reclaimed_and_stale_claimer_cannot_reschedule(tmp_path):
+    store = AIQueueStore(tmp_path / "queue.sqlite3")
+    store.enqueue(_envelope(), "key-0")
+
+    first = store.claim("crashed", 10, lease_seconds=-1)  # lease already expired
+    second = store.claim("live", 10, lease_seconds=60)
+
+    assert [item["id"] for item in second] == [item["id"] for item in first]
+    assert store.claim("third", 10) == []
+
+    store.complete_batch(rescheduled=[(first[0]["id"], 1, 0.0, "late")], claimer="crashed")
+    assert store.claim("third", 10) == []
+
+    report = store.claimer_report()
+    assert report["crashed"]["claimed"] == 1
+    assert report["live"]["reclaimed"] == 1
+
+
+def test_payload_is_stored_compressed_and_claimed_as_json_bytes(tmp_path):
+    store = AIQueueStore(tmp_path / "queue.sqlite3")
+    envelope = _envelope(7)
+    store.enqueue(envelope, "key-7")
+
+    with sqlite3.connect(store.db_path) as conn:
+        stored, encoding = conn.execute("SELECT payload, payload_encoding FROM ai_queue").fetchone()
+        conn.execute(
+            "INSERT INTO ai_queue (idempotency_key, payload, queued_at) VALUES ('legacy', '{\"a\": 1}', 'x')"
+        )
+
+    bodies = {item["idempotency_key"]: item["body"] for item in store.claim("uploader", 10)}
+    body = bodies["key-7"]
+    assert encoding == "zlib+json"
+    assert isinstance(stored, bytes) and len(stored) < len(body)
+    assert json.loads(body) == envelope.to_dict()["metric"]
+    assert body == json.dumps(json.loads(body), sort_keys=True, separators=(",", ":")).encode("utf-8")
+    assert bodies["legacy"] == b'{"a": 1}'
+
+
+def test_priority_classes_follow_label_and_status():
+    assert priority_for({"anomaly_label": "critical", "pipeline_status": "ok"}) == 0
+    assert priority_for({"anomaly_label": "suspicious", "pipeline_status": "partial"}) == 1
+    assert priority_for({"anomaly_label": "normal", "pipeline_status": "ok"}) == 2
+    assert priority_for({"anomaly_label": "critical", "pipeline_status": "failed"}) == 2
+
+
+def test_claim_drains_critical_first_but_keeps_oldest_moving(tmp_path):
+    store = AIQueueStore(tmp_path / "queue.sqlite3", starvation_share=0.25)
+    entries = [(_envelope(index), f"routine-{index}") for index in range(10)]
+    entries += [(_envelope(100, anomaly_label="suspicious"), "suspicious")]
+    entries += [(_envelope(200 + index, anomaly_label="critical"), f"critical-{index}") for index in range(3)]
+    store.enqueue_many(entries)
+
+    keys = [item["idempotency_key"] for item in store.claim("uploader", 4)]
+    assert keys == ["routine-0", "critical-0", "critical-1", "critical-2"]
+
+    keys = [item["idempotency_key"] for item in store.claim("uploader", 4)]
+    assert keys == ["routine-1", "suspicious", "routine-2", "routine-3"]
+
+    assert [item["idempotency_key"] for item in store.claim("uploader", 1)] == ["routine-4"]
+
+
+def test_delivery_report_tracks_time_to_server_per_class(tmp_path):
+    store = AIQueueStore(tmp_path / "queue.sqlite3")
+    late = _envelope(1, anomaly_label="critical")
+    late.queued_at = "2026-01-01T00:00:00+00:00"
+    store.enqueue_many([(late, "critical"), (_envelope(2), "routine")])
+
+    store.ack_many([item["id"] for item in store.claim("uploader", 10)])
+
+    report = store.delivery_report()
+    assert report["critical"]["delivered"] == 1
+    assert report["critical"]["p95_seconds"] > 3600
+    assert report["routine"]["delivered"] == 1
+    assert report["routine"]["max_seconds"] < 60
+    assert report["suspicious"]["delivered"] == 0
+
+
+def test_enqueue_count_ignores_trigger_writes(tmp_path):
+    store = AIQueueStore(tmp_path / "queue.sqlite3")
+    with sqlite3.connect(store.db_path) as conn:
+        conn.execute("CREATE TABLE audit (key TEXT)")
+        conn.execute(
+            "CREATE TRIGGER audit_insert AFTER INSERT ON ai_queue "
+            "BEGIN INSERT INTO audit VALUES (NEW.idempotency_key); END"
+        )
+    store.close()
+    store = AIQueueStore(store.db_path)
+
+    assert store.enqueue(_envelope(1), "key-1") is True
+    assert store.enqueue_many([(_envelope(1), "key-1"), (_envelope(2), "key-2"), (_envelope(3), "key-3")]) == 2
+    assert store.backlog_count() == 3
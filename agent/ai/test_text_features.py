@@ -0,0 +1,141 @@
+import json
+import zlib
+
+import numpy as np
+
+from agent.ai.feature_engineering.hashing import HashingVectorizer, SparseVector
+from agent.ai.feature_engineering.keyword_matcher import KeywordMatcher, load_lexicon, tokenize
+from agent.ai.feature_engineering.text_features import TextFeatureEngineer
+
+
+def test_matcher_counts_single_terms_and_phrases():
+    matcher = KeywordMatcher(
+        {
+            "focus": ["code", "visual studio code", "pull request"],
+            "distraction": ["youtube"],
+        }
+    )
+
+    hits = matcher.count("open visual studio code then review the pull request on youtube".split())
+
+    # "code" and "visual studio code" both end on the same token.
+    assert hits == [3, 1]
+
+
+def test_matcher_follows_failure_links_across_partial_phrases():
+    matcher = KeywordMatcher({"focus": ["a b c", "b c d"], "distraction": []})
+
+    assert matcher.count(["a", "b", "c", "d"]) == [2, 0]
+    assert matcher.count(["a", "b", "x", "b", "c", "d"]) == [1, 0]
+
+
+def test_matcher_ignores_duplicate_terms():
+    matcher = KeywordMatcher({"focus": ["jira", "JIRA", "Jira"]})
+
+    assert matcher.count(["jira", "jira"]) == [2]
+
+
+def test_mixed_case_lexicon_entries_match_lowercased_text():
+    engineer = TextFeatureEngineer(
+        focus_terms=["Python", "Word"],
+        distraction_terms=["JioHotstar", "Instagram"],
+    )
+
+    features = engineer.extract("PYTHON notebook\nwatching JioHotstar and instagram")
+
+    assert features["focus_keyword_hits"] == 1
+    assert features["distraction_keyword_hits"] == 2
+
+
+def test_extract_features_shape_is_unchanged():
+    engineer = TextFeatureEngineer(focus_terms=["jira"], distraction_terms=["netflix"])
+
+    features = engineer.extract("Jira ticket 42\n\n  \nnetflix!")
+
+    assert features == {
+        "word_count": 4,
+        "line_count": 2,
+        "focus_keyword_hits": 1,
+        "distraction_keyword_hits": 1,
+        "alpha_ratio": round(17 / 27, 4),
+    }
+
+
+def test_analyze_redacts_before_extracting():
+    engineer = TextFeatureEngineer(focus_terms=["review"], distraction_terms=[])
+
+    redacted, features = engineer.analyze("  mail bob@example.com re review 123456 ")
+
+    assert redacted == "mail [EMAIL] re review [NUMBER]"
+    assert features == engineer.extract(redacted)
+    assert features["focus_keyword_hits"] == 1
+
+
+def test_lexicon_files_are_loaded_and_comments_skipped(tmp_path):
+    focus = tmp_path / "focus.txt"
+    focus.write_text("# comment\n\nGoogle Docs\nfigma\n", encoding="utf-8")
+    distraction = tmp_path / "distraction.txt"
+    distraction.write_text("Prime Video\n", encoding="utf-8")
+
+    assert load_lexicon(focus) == ["Google Docs", "figma"]
+
+    engineer = TextFeatureEngineer(
+        focus_lexicon_path=focus,
+        distraction_lexicon_path=distraction,
+    )
+    features = engineer.extract("google docs and Figma, later prime video")
+
+    assert features["focus_keyword_hits"] == 2
+    assert features["distraction_keyword_hits"] == 1
+
+
+def test_missing_lexicon_files_fall_back_to_defaults(tmp_path):
+    engineer = TextFeatureEngineer(
+        focus_lexicon_path=tmp_path / "missing_focus.txt",
+        distraction_lexicon_path=tmp_path / "missing_distraction.txt",
+    )
+
+    features = engineer.extract("deploy build then youtube")
+
+    assert features["focus_keyword_hits"] == 2
+    assert features["distraction_keyword_hits"] == 1
+
+
+def test_alpha_ratio_handles_non_ascii_text():
+    engineer = TextFeatureEngineer(focus_terms=[], distraction_terms=[])
+
+    assert engineer.extract("héllo 12")["alpha_ratio"] == round(5 / 8, 4)
+
+
+def test_v2_hashed_features_share_the_v1_pass():
+    engineer = TextFeatureEngineer(feature_version="v2", hashing_features=1 << 10)
+    text = "Deploy build review\nbuild deploy mail bob@example.com 12345"
+
+    redacted, features, sparse = engineer.analyze_sparse(text)
+
+    assert (redacted, features) == engineer.analyze(text)
+    assert sparse.dim == 1 << 10
+    assert np.all(np.diff(sparse.indices.astype(np.int64)) > 0)
+    tokens = tokenize(redacted)
+    assert np.abs(sparse.values).sum() <= 2 * len(tokens) - 1
+    assert TextFeatureEngineer().analyze_sparse(text)[2] is None
+
+
+def test_bigram_hash_continues_the_first_token_crc():
+    vectorizer = HashingVectorizer(1 << 20)
+
+    hashes = vectorizer._hashes(["visual", "studio"])
+
+    assert hashes[-1] == zlib.crc32(b"visual studio")
+
+
+def test_sparse_payload_round_trips():
+    vectorizer = HashingVectorizer(1 << 12)
+    sparse = vectorizer.transform(tokenize("jira ticket jira ticket spec " * 20))
+
+    payload = sparse.to_payload()
+    decoded = SparseVector.from_payload(json.loads(json.dumps(payload)))
+
+    assert payload["nnz"] == sparse.nnz
+    np.testing.assert_array_equal(decoded.indices, sparse.indices)
+    np.testing.assert_array_equal(decoded.to_dense(), sparse.to_dense())
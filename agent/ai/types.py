@@ -24,9 +24,12 @@ class AIMetricV1:
     ocr_text_hash: str | None = None
     error_code: str | None = None
     error_message: str | None = None
+    sparse_features: dict[str, Any] | None = None
+    activity_cluster_id: str | None = None
+    activity_seen_before: bool | None = None
 
     def to_dict(self) -> dict[str, Any]:
-        return {
+        payload = {
             "agent_timestamp": self.agent_timestamp,
             "source_type": self.source_type,
             "source_ref": self.source_ref,
@@ -40,7 +43,12 @@ class AIMetricV1:
             "pipeline_status": self.pipeline_status,
             "error_code": self.error_code,
             "error_message": self.error_message,
+            "activity_cluster_id": self.activity_cluster_id,
+            "activity_seen_before": self.activity_seen_before,
         }
+        if self.sparse_features is not None:
+            payload["sparse_features"] = self.sparse_features
+        return payload
 
 
 @dataclass
@@ -1,26 +1,91 @@
+import gzip
+import json
+import re
+import threading
 import requests
 import time
+from collections import deque
 from datetime import datetime, timezone
+from urllib.parse import urlsplit
 
+import numpy as np
+from requests.adapters import HTTPAdapter
+
+try:
+    import zstandard
+except ImportError:  # optional; HTTP_COMPRESSION="zstd" falls back to gzip
+    zstandard = None
+
+from agent.circuit_breaker import CircuitBreaker
 from agent.config import (
     SESSION_ENDPOINT,
     SCREENSHOT_ENDPOINT,
     AI_METRICS_ENDPOINT_TEMPLATE,
+    AI_METRICS_BATCH_ENDPOINT_TEMPLATE,
     REQUEST_TIMEOUT_SECONDS,
     REQUEST_MAX_RETRIES,
     REQUEST_BACKOFF_BASE_SECONDS,
+    HTTP_POOL_CONNECTIONS,
+    HTTP_POOL_MAXSIZE,
+    HTTP_COMPRESSION,
+    HTTP_COMPRESSION_MIN_BYTES,
+    HTTP_ENDPOINT_CONCURRENCY,
     AGENT_NAME,
     AGENT_VERSION,
 )
 
 
+LATENCY_WINDOW = 512
+
+
 class BackendClient:
-    def __init__(self, logger):
+    """
+    HTTP client for the WorkSight backend.
+
+    Every thread gets its own requests.Session (sessions are not safe to
+    share), but all of them mount one HTTPAdapter whose urllib3 pool is,
+    so keep-alive connections are reused across the heartbeat, capture,
+    upload and recording threads. http_report() exposes connection reuse
+    and per-endpoint latency.
+
+    JSON bodies are compressed with HTTP_COMPRESSION when it is set;
+    multipart uploads (PNG screenshots) are already compressed and go
+    out unchanged.
+    Endpoints listed in HTTP_ENDPOINT_CONCURRENCY admit at most that many
+    requests at once; further callers wait for a free slot.
+
+    Requests are sent once and pass through one CircuitBreaker: while
+    the backend is down they raise CircuitOpenError without touching the
+    network. Only create_session() retries in place.
+    """
+
+    def __init__(
+        self,
+        logger,
+        compression: str | None = HTTP_COMPRESSION,
+        endpoint_concurrency: dict | None = None,
+        circuit: CircuitBreaker | None = None,
+    ):
         self.logger = logger
         self.session_id = None
         self.token = None
         self.last_ai_upload_success_at = None
 
+        self._adapter = HTTPAdapter(
+            pool_connections=HTTP_POOL_CONNECTIONS,
+            pool_maxsize=HTTP_POOL_MAXSIZE,
+            pool_block=False,
+        )
+        self._local = threading.local()
+        self.compression = "gzip" if compression == "zstd" and zstandard is None else compression
+        self._stats_lock = threading.Lock()
+        self._endpoints = {}
+        limits = HTTP_ENDPOINT_CONCURRENCY if endpoint_concurrency is None else endpoint_concurrency
+        # Longest suffix first so ".../ai-metrics/batch/" is not taken for ".../ai-metrics/".
+        self._endpoint_limits = sorted(limits.items(), key=lambda item: -len(item[0]))
+        self._endpoint_slots = {}
+        self.circuit = circuit or CircuitBreaker(logger)
+
     # ==============================
     # SESSION
     # ==============================
@@ -34,8 +99,9 @@ class BackendClient:
             "ip_address": system_info["ip_address"],
         }
 
-        response = self._post_with_retry(
+        response = self._post(
             SESSION_ENDPOINT,
+            attempts=REQUEST_MAX_RETRIES,
             json=payload,
         )
         response.raise_for_status()
@@ -65,7 +131,7 @@ class BackendClient:
         if not self.session_id:
             return
 
-        response = self._post_with_retry(
+        response = self._post(
             f"{SESSION_ENDPOINT}{self.session_id}/heartbeat/",
             headers=self._auth_headers(),
         )
@@ -89,7 +155,7 @@ class BackendClient:
                 "captured_at": datetime.now(timezone.utc).isoformat(),
             }
 
-            response = self._post_with_retry(
+            response = self._post(
                 SCREENSHOT_ENDPOINT,
                 files=files,
                 data=data,
@@ -105,7 +171,7 @@ class BackendClient:
         if not self.session_id:
             return
 
-        response = self._post_with_retry(
+        response = self._post(
             f"{SESSION_ENDPOINT}{self.session_id}/recordings/",
             json=payload,
             headers=self._auth_headers(),
@@ -117,40 +183,218 @@ class BackendClient:
     # ==============================
 
     def log_ai_metric(self, payload, idempotency_key):
+        """
+        payload is a metric dict, or an already-encoded JSON body (bytes)
+        such as the AI queue stores, which is sent as is.
+        """
         if not self.session_id:
             return
 
         headers = self._auth_headers()
         headers["X-Idempotency-Key"] = idempotency_key
 
-        response = self._post_with_retry(
+        if isinstance(payload, (bytes, bytearray)):
+            headers["Content-Type"] = "application/json"
+            body = {"data": bytes(payload)}
+        else:
+            body = {"json": payload}
+
+        response = self._post(
             AI_METRICS_ENDPOINT_TEMPLATE.format(session_id=self.session_id),
-            json=payload,
             headers=headers,
+            **body,
         )
         response.raise_for_status()
         self.last_ai_upload_success_at = datetime.now(timezone.utc).isoformat()
         return response.json()
 
-    def _post_with_retry(self, url, **kwargs):
-        attempts = 0
-        last_error = None
+    def log_ai_metrics_batch(self, items):
+        """
+        Uploads [(idempotency_key, payload), ...] in one request; payloads
+        are metric dicts or encoded JSON bodies, spliced in unparsed.
+        Returns the server's per-item results, in order.
+        """
+        if not self.session_id:
+            return None
 
-        while attempts < REQUEST_MAX_RETRIES:
-            attempts += 1
-            try:
-                response = requests.post(
-                    url,
-                    timeout=REQUEST_TIMEOUT_SECONDS,
-                    **kwargs,
+        parts = []
+        for idempotency_key, payload in items:
+            if not isinstance(payload, (bytes, bytearray)):
+                payload = json.dumps(payload).encode("utf-8")
+            parts.append(b'{"idempotency_key":' + json.dumps(idempotency_key).encode("utf-8") + b',"metric":' + payload + b"}")
+        body = b'{"items":[' + b",".join(parts) + b"]}"
+
+        headers = self._auth_headers()
+        headers["Content-Type"] = "application/json"
+        response = self._post(
+            AI_METRICS_BATCH_ENDPOINT_TEMPLATE.format(session_id=self.session_id),
+            data=body,
+            headers=headers,
+        )
+        response.raise_for_status()
+        self.last_ai_upload_success_at = datetime.now(timezone.utc).isoformat()
+        return response.json()["results"]
+
+    # ==============================
+    # CONNECTIONS
+    # ==============================
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("http://", self._adapter)
+            session.mount("https://", self._adapter)
+            self._local.session = session
+        return session
+
+    def http_report(self) -> dict:
+        """
+        Connection reuse across all threads, and latency per endpoint
+        (ids in the path collapsed) over the last LATENCY_WINDOW requests.
+        """
+        pools = self._adapter.poolmanager.pools
+        requests_sent = 0
+        connections_opened = 0
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                requests_sent += pool.num_requests
+                connections_opened += pool.num_connections
+
+        with self._stats_lock:
+            snapshot = {
+                endpoint: (
+                    stats["count"],
+                    stats["errors"],
+                    np.asarray(stats["recent"]),
+                    stats["body_bytes"],
+                    stats["wire_bytes"],
+                )
+                for endpoint, stats in self._endpoints.items()
+            }
+
+        endpoints = {}
+        for endpoint, (count, errors, recent, body_bytes, wire_bytes) in snapshot.items():
+            p50, p95 = np.percentile(recent, [50, 95]) if recent.size else (0.0, 0.0)
+            endpoints[endpoint] = {
+                "count": count,
+                "errors": errors,
+                "p50_ms": round(float(p50), 3),
+                "p95_ms": round(float(p95), 3),
+                "body_bytes": body_bytes,
+                "wire_bytes": wire_bytes,
+                "bytes_saved": body_bytes - wire_bytes,
+            }
+
+        return {
+            "requests": requests_sent,
+            "connections_opened": connections_opened,
+            "reuse_rate": round(1 - connections_opened / requests_sent, 4) if requests_sent else None,
+            "circuit": self.circuit.report(),
+            "endpoints": endpoints,
+        }
+
+    def _endpoint_slot(self, endpoint: str):
+        """
+        Semaphore bounding concurrent requests to `endpoint`, or None when
+        it has no limit.
+        """
+        with self._stats_lock:
+            if endpoint not in self._endpoint_slots:
+                limit = next(
+                    (limit for suffix, limit in self._endpoint_limits if endpoint.endswith(suffix)),
+                    None,
                 )
-                if response.status_code >= 500:
-                    raise requests.HTTPError(f"Server error {response.status_code}")
-                return response
-            except (requests.RequestException, requests.HTTPError) as exc:
-                last_error = exc
-                if attempts >= REQUEST_MAX_RETRIES:
-                    break
-                backoff = REQUEST_BACKOFF_BASE_SECONDS * (2 ** (attempts - 1))
-                time.sleep(backoff)
-        raise last_error
+                self._endpoint_slots[endpoint] = threading.BoundedSemaphore(limit) if limit else None
+            return self._endpoint_slots[endpoint]
+
+    def _record_request(self, endpoint: str, seconds: float, failed: bool, body_bytes: int = 0, wire_bytes: int = 0):
+        with self._stats_lock:
+            stats = self._endpoints.get(endpoint)
+            if stats is None:
+                stats = self._endpoints[endpoint] = {
+                    "count": 0,
+                    "errors": 0,
+                    "recent": deque(maxlen=LATENCY_WINDOW),
+                    "body_bytes": 0,
+                    "wire_bytes": 0,
+                }
+            stats["count"] += 1
+            stats["body_bytes"] += body_bytes
+            stats["wire_bytes"] += wire_bytes
+            stats["errors"] += int(failed)
+            stats["recent"].append(seconds * 1000)
+
+    def _encode_body(self, kwargs: dict) -> tuple[dict, int, int]:
+        """
+        Serializes json= bodies and compresses JSON bodies.
+        Returns (request kwargs, body bytes, bytes on the wire).
+        """
+        kwargs = dict(kwargs)
+        headers = dict(kwargs.get("headers") or {})
+        if "json" in kwargs:
+            kwargs["data"] = json.dumps(kwargs.pop("json")).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+
+        body = kwargs.get("data")
+        if not isinstance(body, (bytes, bytearray)):
+            return kwargs, 0, 0
+
+        wire = body
+        if self.compression and len(body) >= HTTP_COMPRESSION_MIN_BYTES:
+            if self.compression == "zstd":
+                wire = zstandard.ZstdCompressor().compress(body)
+            else:
+                wire = gzip.compress(body, compresslevel=6)
+            headers["Content-Encoding"] = self.compression
+            kwargs["data"] = wire
+
+        kwargs["headers"] = headers
+        return kwargs, len(body), len(wire)
+
+    def _post(self, url, attempts: int = 1, **kwargs):
+        """
+        Sends one POST through the circuit breaker. With attempts > 1
+        failures (including an open circuit) are retried after
+        exponential backoff.
+        """
+        kwargs, body_bytes, wire_bytes = self._encode_body(kwargs)
+        endpoint = re.sub(r"/\d+(?=/)", "/{id}", urlsplit(url).path)
+        slot = self._endpoint_slot(endpoint)
+
+        for attempt in range(1, attempts + 1):
+            try:
+                return self._send(url, endpoint, slot, kwargs, body_bytes, wire_bytes)
+            except requests.RequestException:
+                if attempt >= attempts:
+                    raise
+            time.sleep(REQUEST_BACKOFF_BASE_SECONDS * (2 ** (attempt - 1)))
+
+    def _send(self, url, endpoint, slot, kwargs, body_bytes, wire_bytes):
+        self.circuit.before_request()
+        if slot is not None:
+            slot.acquire()
+        started = time.perf_counter()
+        response = None
+        try:
+            response = self._session().post(
+                url,
+                timeout=REQUEST_TIMEOUT_SECONDS,
+                **kwargs,
+            )
+        except Exception as exc:
+            self.circuit.record_failure(str(exc))
+            raise
+        finally:
+            if slot is not None:
+                slot.release()
+            failed = response is None or response.status_code >= 500
+            self._record_request(endpoint, time.perf_counter() - started, failed, body_bytes, wire_bytes)
+
+        if response.status_code >= 500:
+            error = requests.HTTPError(f"Server error {response.status_code}", response=response)
+            self.circuit.record_failure(str(error))
+            raise error
+        self.circuit.record_success()
+        return response
@@ -0,0 +1,123 @@
+"""
+Model inference microbenchmark.
+
+Exports a synthetic artifact (logistic productivity head plus a
+gradient-boosted stump anomaly head) to a temporary model directory,
+loads it through ModelRuntime and reports per-frame inference cost for
+several batch sizes next to the rule-based heuristics.
+
+Usage:
+    python -m agent.benchmarks.bench_model_inference [--stumps 200] [--frames 4096]
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from agent.ai.feature_engineering.text_features import FEATURE_NAMES
+from agent.ai.models.productivity_model import ProductivityModel
+from agent.ai.models.runtime import ModelRuntime, save_artifact
+
+
+def build_features(rng: np.random.Generator, frames: int) -> np.ndarray:
+    return np.column_stack(
+        [
+            rng.integers(0, 400, frames),
+            rng.integers(0, 40, frames),
+            rng.integers(0, 8, frames),
+            rng.integers(0, 5, frames),
+            rng.random(frames),
+        ]
+    ).astype(float)
+
+
+def export_artifact(model_dir: str, rng: np.random.Generator, stumps: int):
+    save_artifact(
+        model_dir,
+        "bench",
+        "1",
+        feature_names=FEATURE_NAMES,
+        heads={
+            "productivity": {
+                "kind": "logistic",
+                "scale": 100.0,
+                "weights": rng.normal(size=len(FEATURE_NAMES)) * 0.1,
+                "bias": [0.0],
+            },
+            "anomaly_static": {
+                "kind": "stumps",
+                "link": "sigmoid",
+                "feature": rng.integers(0, len(FEATURE_NAMES), stumps),
+                "threshold": rng.random(stumps) * 10,
+                "left": rng.normal(size=stumps) * 0.05,
+                "right": rng.normal(size=stumps) * 0.05,
+            },
+        },
+    )
+
+
+def _per_frame_us(fn, frames: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best / frames * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--frames", type=int, default=4096)
+    parser.add_argument("--stumps", type=int, default=200, help="boosted stumps in the anomaly head")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(args.seed)
+    features = build_features(rng, args.frames)
+    texts = ["text"] * args.frames
+    rows = [dict(zip(FEATURE_NAMES, row)) for row in features.tolist()]
+    heuristic = ProductivityModel()
+
+    with tempfile.TemporaryDirectory(prefix="worksight-models-") as model_dir:
+        export_artifact(model_dir, rng, args.stumps)
+
+        load_started = time.perf_counter()
+        runtime = ModelRuntime(model_dir=model_dir, name="bench", version="1", selector_path=None)
+        load_ms = (time.perf_counter() - load_started) * 1000
+        model = runtime.current
+
+        print(f"artifact: logistic productivity + {args.stumps} stumps, loaded (mmap) in {load_ms:.2f} ms")
+        print(f"{'batch':>8}{'productivity us/frame':>24}{'anomaly us/frame':>20}")
+
+        for batch in (1, 8, 64, args.frames):
+            chunks = [features[start:start + batch] for start in range(0, args.frames, batch)]
+            productivity_us = _per_frame_us(
+                lambda: [model.predict("productivity", chunk) for chunk in chunks],
+                args.frames,
+                args.repeat,
+            )
+            anomaly_us = _per_frame_us(
+                lambda: [model.predict("anomaly_static", chunk) for chunk in chunks],
+                args.frames,
+                args.repeat,
+            )
+            print(f"{batch:>8}{productivity_us:>24.2f}{anomaly_us:>20.2f}")
+
+    scalar_us = _per_frame_us(
+        lambda: [heuristic.predict(text, row) for text, row in zip(texts, rows)],
+        args.frames,
+        args.repeat,
+    )
+    batch_us = _per_frame_us(
+        lambda: heuristic.predict_batch(texts, features),
+        args.frames,
+        args.repeat,
+    )
+    print(f"heuristic productivity: scalar {scalar_us:.2f} us/frame, batch {batch_us:.2f} us/frame")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+AI upload queue microbenchmark.
+
+Enqueues synthetic metrics, drains them in upload-sized batches and polls
+the backlog the way the runtime does, once with AIQueueStore and once
+with the previous connect-per-call store (per-item acks, COUNT(*)
+backlog, JSON text payloads) for reference. Also reports the backlog's
+on-disk size per queued metric.
+
+Usage:
+    python -m agent.benchmarks.bench_queue_store [--items 2000] [--batch-size 20]
+"""
+
+import argparse
+import json
+import random
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from agent.ai.queue_store import AIQueueStore
+from agent.ai.types import AIMetricV1, AIResultEnvelope
+
+
+class _LegacyQueueStore:
+    # Previous implementation, kept here only as a reference point.
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        with self._connect() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ai_queue (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    idempotency_key TEXT NOT NULL UNIQUE,
+                    payload TEXT NOT NULL,
+                    attempt INTEGER NOT NULL DEFAULT 0,
+                    queued_at TEXT NOT NULL,
+                    next_retry_at REAL NOT NULL DEFAULT 0,
+                    dead_letter INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_ai_queue_retry ON ai_queue(dead_letter, next_retry_at)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.db_path)
+
+    def enqueue(self, envelope: AIResultEnvelope, idempotency_key: str) -> bool:
+        body = envelope.to_dict()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                """
+                INSERT OR IGNORE INTO ai_queue (
+                    idempotency_key, payload, attempt, queued_at, next_retry_at
+                ) VALUES (?, ?, ?, ?, ?)
+                """,
+                (idempotency_key, json.dumps(body["metric"]), body["attempt"],
+                 body["queued_at"], body["next_retry_at"]),
+            )
+            return cursor.rowcount == 1
+
+    def ready_items(self, limit: int) -> list[dict]:
+        with self._connect() as conn:
+            rows = conn.execute(
+                """
+                SELECT id, idempotency_key, payload, attempt FROM ai_queue
+                WHERE dead_letter = 0 AND next_retry_at <= ? ORDER BY id ASC LIMIT ?
+                """,
+                (time.time(), limit),
+            ).fetchall()
+        return [
+            {"id": row[0], "idempotency_key": row[1], "metric": json.loads(row[2]), "attempt": row[3]}
+            for row in rows
+        ]
+
+    def mark_success(self, row_id: int):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM ai_queue WHERE id = ?", (row_id,))
+
+    def backlog_count(self) -> int:
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM ai_queue WHERE dead_letter = 0").fetchone()[0]
+
+
+def _envelope(index: int) -> AIResultEnvelope:
+    # Shaped like a v2 metric from AIService: dense features, hashed sparse
+    # features and per-stage model info.
+    rng = random.Random(index)
+    indices = sorted(rng.sample(range(4096), 60))
+    return AIResultEnvelope(
+        metric=AIMetricV1(
+            agent_timestamp=f"2026-01-01T00:{index // 60 % 60:02d}:{index % 60:02d}+00:00",
+            source_type="screenshot",
+            source_ref=f"screenshot_{index:06d}.png",
+            ocr_text_hash=f"{rng.getrandbits(256):064x}",
+            feature_version="v2",
+            features={
+                "word_count": 120 + index % 40,
+                "line_count": 18,
+                "alpha_ratio": round(rng.random(), 4),
+                "digit_ratio": round(rng.random() / 10, 4),
+                "focus_keyword_hits": rng.randint(0, 9),
+                "distraction_keyword_hits": rng.randint(0, 3),
+                "unique_token_ratio": round(rng.random(), 4),
+                "avg_token_length": round(3 + rng.random() * 4, 4),
+            },
+            sparse_features={
+                "dimension": 4096,
+                "indices": indices,
+                "values": [round(rng.random(), 4) for _ in indices],
+            },
+            productivity_score=round(rng.random(), 4),
+            anomaly_score=round(rng.random(), 4),
+            anomaly_label="normal",
+            model_info={
+                "model_name": "heuristic",
+                "model_version": "1",
+                "stage_latency_ms": {"ocr": 812.4, "features": 3.1, "productivity": 0.4, "anomaly": 0.6},
+                "baseline_updated": True,
+                "overrun_stage": None,
+            },
+            pipeline_status="ok",
+            activity_cluster_id=f"{rng.getrandbits(64):016x}",
+            activity_seen_before=True,
+        )
+    )
+
+
+def _backlog_bytes(db_path: Path) -> tuple[int, int]:
+    """
+    (database size, total payload bytes) after folding the WAL back in.
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+        page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        payload = conn.execute("SELECT SUM(LENGTH(CAST(payload AS BLOB))) FROM ai_queue").fetchone()[0]
+        return page_count * page_size, payload or 0
+    finally:
+        conn.close()
+
+
+def _run(store, items: int, batch_size: int, batched: bool) -> dict:
+    envelopes = [_envelope(index) for index in range(items)]
+
+    started = time.perf_counter()
+    for index, envelope in enumerate(envelopes):
+        store.enqueue(envelope, f"key-{index}")
+        store.backlog_count()
+    enqueue_seconds = time.perf_counter() - started
+    db_bytes, payload_bytes = _backlog_bytes(store.db_path)
+
+    started = time.perf_counter()
+    while True:
+        if batched:
+            ready = store.claim("bench", batch_size)
+            if not ready:
+                break
+            store.complete_batch(acked=[item["id"] for item in ready], claimer="bench")
+        else:
+            ready = store.ready_items(batch_size)
+            if not ready:
+                break
+            for item in ready:
+                store.mark_success(item["id"])
+        store.backlog_count()
+    ack_seconds = time.perf_counter() - started
+
+    assert store.backlog_count() == 0
+    return {
+        "enqueue": items / enqueue_seconds,
+        "ack": items / ack_seconds,
+        "db_bytes": db_bytes / items,
+        "payload_bytes": payload_bytes / items,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=20, help="items per upload batch")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy = _run(_LegacyQueueStore(Path(tmp) / "legacy.sqlite3"), args.items, args.batch_size, batched=False)
+        store = AIQueueStore(Path(tmp) / "queue.sqlite3")
+        current = _run(store, args.items, args.batch_size, batched=True)
+        store.close()
+
+    print(f"{args.items} items, upload batches of {args.batch_size}, backlog polled after every call")
+    print(f"legacy (connect per call, per-item ack): "
+          f"enqueue {legacy['enqueue']:.0f}/s, ack {legacy['ack']:.0f}/s")
+    print(f"AIQueueStore (WAL, batched ack): "
+          f"enqueue {current['enqueue']:.0f}/s, ack {current['ack']:.0f}/s")
+    print(f"bytes per queued metric: legacy {legacy['db_bytes']:.0f} on disk "
+          f"({legacy['payload_bytes']:.0f} payload), AIQueueStore {current['db_bytes']:.0f} on disk "
+          f"({current['payload_bytes']:.0f} payload)")
+    print(f"speedup: enqueue {current['enqueue'] / legacy['enqueue']:.1f}x, "
+          f"ack {current['ack'] / legacy['ack']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+AI upload drain-time benchmark.
+
+Queues synthetic metrics and drains them through UploadService and
+BackendClient to a local batch endpoint that answers after a fixed delay,
+standing in for a high-latency link to the backend. Runs once with one
+batch in flight (the previous sequential uploader) and once with
+--in-flight batches, and checks the server stored every metric exactly
+once.
+
+Usage:
+    python -m agent.benchmarks.bench_uploader [--items 2000] [--batch-size 20] [--latency-ms 250] [--in-flight 4]
+"""
+
+import argparse
+import gzip
+import json
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock
+
+from agent.ai.queue_store import AIQueueStore
+from agent.api_client import BackendClient
+from agent.benchmarks.bench_queue_store import _envelope
+from agent.services.upload_service import UploadService
+
+
+class _Logger:
+    def info(self, message, extra=None):
+        pass
+
+    warning = error = info
+
+
+class _SlowBatchEndpoint(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    latency_seconds = 0.0
+    stored = set()
+    duplicates = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        time.sleep(self.latency_seconds)
+
+        results = []
+        with self.lock:
+            for item in json.loads(body)["items"]:
+                key = item["idempotency_key"]
+                status = "duplicate" if key in self.stored else "ok"
+                type(self).duplicates += status == "duplicate"
+                self.stored.add(key)
+                results.append({"idempotency_key": key, "status": status})
+
+        response = json.dumps({"results": results}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, *args):
+        pass
+
+
+def _drain(base_url: str, db_path: Path, items: int, batch_size: int, in_flight: int) -> dict:
+    _SlowBatchEndpoint.stored = set()
+    _SlowBatchEndpoint.duplicates = 0
+
+    store = AIQueueStore(db_path)
+    store.enqueue_many([(_envelope(index), f"key-{index}") for index in range(items)])
+
+    client = BackendClient(_Logger(), endpoint_concurrency={"/ai-metrics/batch/": in_flight})
+    client.session_id = 1
+    client.token = "bench"
+    service = UploadService(client, store, _Logger(), max_in_flight=in_flight, batch_size=batch_size, poll_seconds=0.05)
+
+    stop_event = threading.Event()
+
+    def watch():
+        while store.backlog_count():
+            time.sleep(0.01)
+        stop_event.set()
+
+    watcher = threading.Thread(target=watch, daemon=True)
+    template = f"{base_url}/sessions/{{session_id}}/ai-metrics/batch/"
+    with mock.patch("agent.api_client.AI_METRICS_BATCH_ENDPOINT_TEMPLATE", template):
+        started = time.perf_counter()
+        watcher.start()
+        service.run("bench", stop_event)
+        seconds = time.perf_counter() - started
+    store.close()
+
+    assert len(_SlowBatchEndpoint.stored) == items
+    return {
+        "seconds": seconds,
+        "duplicates": _SlowBatchEndpoint.duplicates,
+        "reuse_rate": client.http_report()["reuse_rate"],
+        "peak_in_flight": service.report()["peak_in_flight"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=20, help="items per upload batch")
+    parser.add_argument("--latency-ms", type=float, default=250.0, help="server delay per request")
+    parser.add_argument("--in-flight", type=int, default=4, help="concurrent batches for the async run")
+    args = parser.parse_args(argv)
+
+    _SlowBatchEndpoint.latency_seconds = args.latency_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SlowBatchEndpoint)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/api"
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            sequential = _drain(base_url, Path(tmp) / "sequential.sqlite3", args.items, args.batch_size, 1)
+            concurrent = _drain(base_url, Path(tmp) / "concurrent.sqlite3", args.items, args.batch_size, args.in_flight)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    print(f"{args.items} items, batches of {args.batch_size}, {args.latency_ms:.0f} ms server latency")
+    for label, result in (("1 in flight", sequential), (f"{args.in_flight} in flight", concurrent)):
+        print(f"{label}: drained in {result['seconds']:.2f}s "
+              f"({args.items / result['seconds']:.0f} items/s), peak {result['peak_in_flight']} in flight, "
+              f"{result['duplicates']} duplicates, connection reuse {result['reuse_rate']}")
+    print(f"speedup: {sequential['seconds'] / concurrent['seconds']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Circuit breaker shared by every BackendClient call.
+
+    closed      requests flow; `failure_threshold` consecutive failures
+                (connection errors, timeouts, 5xx) open the circuit
+    open        requests fail at once with CircuitOpenError until
+                `reset_seconds` have passed
+    half_open   one probe request is let through; success closes the
+                circuit, failure reopens it with the wait doubled (up to
+                `max_reset_seconds`)
+
+so a backend outage costs the agent one probe per interval instead of
+every worker thread sleeping through retries and reconnecting at once
+when the server returns.
+"""
+
+import threading
+import time
+
+import requests
+
+from agent.config import (
+    BACKEND_CIRCUIT_FAILURE_THRESHOLD,
+    BACKEND_CIRCUIT_MAX_RESET_SECONDS,
+    BACKEND_CIRCUIT_RESET_SECONDS,
+)
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """
+    Raised instead of sending a request while the circuit is open.
+    `retry_after` is the number of seconds until the next probe.
+    """
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Backend circuit open; next probe in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        logger,
+        failure_threshold: int = BACKEND_CIRCUIT_FAILURE_THRESHOLD,
+        reset_seconds: float = BACKEND_CIRCUIT_RESET_SECONDS,
+        max_reset_seconds: float = BACKEND_CIRCUIT_MAX_RESET_SECONDS,
+        clock=time.monotonic,
+    ):
+        self.logger = logger
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.max_reset_seconds = max(reset_seconds, max_reset_seconds)
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self._wait_seconds = reset_seconds
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.short_circuited = 0
+        self.transitions = 0
+
+    def before_request(self):
+        """
+        Admits a request or raises CircuitOpenError. In half-open state
+        only the first caller is admitted, as the probe.
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return
+            if self.state == OPEN:
+                remaining = self._remaining()
+                if remaining > 0:
+                    self.short_circuited += 1
+                    raise CircuitOpenError(remaining)
+                self._transition(HALF_OPEN)
+            if self._probe_in_flight:
+                self.short_circuited += 1
+                raise CircuitOpenError(0.0)
+            self._probe_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self.consecutive_failures = 0
+            self._probe_in_flight = False
+            if self.state != CLOSED:
+                self._wait_seconds = self.reset_seconds
+                self._transition(CLOSED)
+
+    def record_failure(self, error: str = ""):
+        with self._lock:
+            self.consecutive_failures += 1
+            self._probe_in_flight = False
+            if self.state == HALF_OPEN:
+                self._wait_seconds = min(self._wait_seconds * 2, self.max_reset_seconds)
+                self._open(error)
+            elif self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+                self._open(error)
+
+    def retry_after(self) -> float:
+        """
+        Seconds until requests are admitted again; 0 when they are now.
+        """
+        with self._lock:
+            if self.state == OPEN:
+                return self._remaining()
+            if self.state == HALF_OPEN and self._probe_in_flight:
+                return self._wait_seconds
+            return 0.0
+
+    def report(self) -> dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "retry_after_seconds": round(self._remaining(), 3) if self.state == OPEN else 0.0,
+                "short_circuited": self.short_circuited,
+                "transitions": self.transitions,
+            }
+
+    def _remaining(self) -> float:
+        return max(0.0, self._opened_at + self._wait_seconds - self.clock())
+
+    def _open(self, error: str):
+        self._opened_at = self.clock()
+        self._transition(OPEN, error)
+
+    def _transition(self, state: str, error: str = ""):
+        previous, self.state = self.state, state
+        self.transitions += 1
+        metadata = {
+            "from": previous,
+            "to": state,
+            "consecutive_failures": self.consecutive_failures,
+        }
+        if state == OPEN:
+            metadata.update({"retry_after_seconds": self._wait_seconds, "error": error})
+            self.logger.warning("Backend circuit opened", extra={"metadata": metadata})
+        else:
+            self.logger.info(f"Backend circuit {state.replace('_', '-')}", extra={"metadata": metadata})
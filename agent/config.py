@@ -42,10 +42,40 @@ BACKEND_BASE_URL = "http://127.0.0.1:8080/api"
 SESSION_ENDPOINT = f"{BACKEND_BASE_URL}/sessions/"
 SCREENSHOT_ENDPOINT = f"{BACKEND_BASE_URL}/screenshots/"
 AI_METRICS_ENDPOINT_TEMPLATE = f"{BACKEND_BASE_URL}/sessions/{{session_id}}/ai-metrics/"
+AI_METRICS_BATCH_ENDPOINT_TEMPLATE = f"{BACKEND_BASE_URL}/sessions/{{session_id}}/ai-metrics/batch/"
 
 REQUEST_TIMEOUT_SECONDS = 5
+# Only session registration retries in place; every other request fails
+# fast and is retried by its caller (AI queue backoff, next heartbeat).
 REQUEST_MAX_RETRIES = 3
 REQUEST_BACKOFF_BASE_SECONDS = 1.0
+# Circuit breaker shared by all backend requests: opens after
+# BACKEND_CIRCUIT_FAILURE_THRESHOLD consecutive failures, probes again
+# after BACKEND_CIRCUIT_RESET_SECONDS, doubling up to the max while
+# probes keep failing.
+BACKEND_CIRCUIT_FAILURE_THRESHOLD = 5
+BACKEND_CIRCUIT_RESET_SECONDS = 10
+BACKEND_CIRCUIT_MAX_RESET_SECONDS = 120
+# Keep-alive connections shared by every agent thread. The backend is one
+# host; pool size covers heartbeat, capture, upload and recording threads.
+HTTP_POOL_CONNECTIONS = 2
+HTTP_POOL_MAXSIZE = 8
+# Content-Encoding for JSON request bodies: "gzip", "zstd" (needs the
+# zstandard package, else gzip is used) or None. Bodies shorter than
+# HTTP_COMPRESSION_MIN_BYTES go out as is. Off by default: turn it on only
+# once the backend runs RequestDecompressionMiddleware, since older
+# backends reject compressed bodies with 400 and the metrics would be
+# dead-lettered.
+HTTP_COMPRESSION = None
+HTTP_COMPRESSION_MIN_BYTES = 512
+# Most requests in flight at once per endpoint, matched by path suffix;
+# endpoints not listed are unlimited. Keep the sum under HTTP_POOL_MAXSIZE
+# so connections are reused rather than opened and discarded.
+HTTP_ENDPOINT_CONCURRENCY = {
+    "/ai-metrics/batch/": 4,
+    "/ai-metrics/": 4,
+    "/screenshots/": 2,
+}
 
 # =========================
 # Storage Policy
@@ -74,6 +104,7 @@ FFMPEG_BUNDLED_EXE = BASE_DIR / "recording" / "bin" / "ffmpeg.exe"
 VIDEO_UPLOAD_TARGET_HEIGHT = 1080
 VIDEO_COMPRESSION_CRF = 30
 VIDEO_COMPRESSION_PRESET = "fast"
+VIDEO_COMPRESSION_NICE = 10  # ffmpeg niceness (POSIX); >= 19 maps to idle priority on Windows
 
 # =========================
 # Heartbeat Settings
@@ -88,12 +119,115 @@ HEARTBEAT_INTERVAL_SECONDS = 10
 AI_QUEUE_DB_PATH = STORAGE_DIR / "ai_queue.sqlite3"
 AI_UPLOAD_BATCH_SIZE = 20
 AI_UPLOAD_POLL_SECONDS = 2
+AI_UPLOAD_WORKERS = 1
+# Batch requests each upload worker keeps in flight (UploadService).
+AI_UPLOAD_MAX_IN_FLIGHT = 4
+# Claimed items go back to the queue when not settled within the lease
+# (uploader crashed or the agent restarted mid-batch).
+AI_UPLOAD_LEASE_SECONDS = 120
+# Share of each upload batch taken oldest-first regardless of priority,
+# so routine metrics keep moving while critical anomalies jump the queue.
+AI_UPLOAD_STARVATION_SHARE = 0.2
+# Queue maintenance: size cap (oldest rows evicted first, dead letters
+# before backlog), incremental VACUUM once no writes happened for
+# AI_QUEUE_VACUUM_IDLE_SECONDS, and automatic dead-letter requeue after
+# uploads recover (each row at most AI_DEAD_LETTER_MAX_REQUEUES times).
+AI_QUEUE_MAX_BYTES = 256 * 1024 * 1024
+AI_QUEUE_MAINTENANCE_INTERVAL_SECONDS = 60
+AI_QUEUE_VACUUM_IDLE_SECONDS = 10
+AI_QUEUE_VACUUM_PAGES = 1024
+AI_DEAD_LETTER_MAX_REQUEUES = 3
 AI_MAX_RETRIES = 5
 AI_BACKOFF_BASE_SECONDS = 2.0
-AI_PIPELINE_TIMEOUT_SECONDS = 2.5
+AI_PIPELINE_TIMEOUT_SECONDS = 2.5  # total per-frame deadline
+# Per-stage budgets within the deadline; OCR is cancelled at its budget.
+AI_STAGE_BUDGETS_SECONDS = {
+    "ocr": 2.0,
+    "activity": 0.05,
+    "features": 0.05,
+    "productivity": 0.05,
+    "anomaly": 0.05,
+    "baseline": 0.1,
+}
 AI_MAX_QUEUE_BACKLOG = 1000
-
-AI_FEATURE_VERSION = "v1"
+AI_BATCH_MAX_FRAMES = 8  # frames drained from the capture queue per AI batch
+
+AI_BASELINE_FLUSH_EVERY = 20  # baseline updates buffered before a flush
+AI_BASELINE_FLUSH_INTERVAL_SECONDS = 30
+AI_BASELINE_HALF_LIFE_SECONDS = 7 * 24 * 3600  # None keeps lifetime statistics
+AI_BASELINE_HOUR_OF_WEEK_BUCKETS = True
+AI_BASELINE_MIN_BUCKET_SAMPLES = 10  # samples before an hour-of-week bucket is used
+AI_BASELINE_MIN_SAMPLES = 10  # samples before statistical anomaly mode kicks in
+
+AI_FEATURE_VERSION = "v1"  # "v2" adds hashed bag-of-words sparse features
+AI_HASHING_FEATURES = 1 << 18  # v2 hashing dimension (power of two)
+AI_ACTIVITY_INDEX_CAPACITY = 4096  # recent SimHash fingerprints kept on the agent
+AI_ACTIVITY_MAX_HAMMING = 6  # bits; must stay below AI_ACTIVITY_INDEX_BANDS
+AI_ACTIVITY_INDEX_BANDS = 8  # LSH bands of 64 / 8 = 8 bits each
+AI_ACTIVITY_REUSE_RESULTS = False  # reuse features/productivity for repeat activities
+AI_FRAME_DOWNSAMPLE = 4  # pixel stride when diffing captured frames
+AI_FRAME_BLOCK_SIZE = 16  # dirty-block tile size, in downsampled pixels
+AI_FRAME_PIXEL_THRESHOLD = 12  # luma delta (0-255) that counts as a changed pixel
+AI_SKIP_OCR_WHEN_IDLE = True  # reuse the last OCR text while the screen is unchanged
+AI_IDLE_SECONDS = 300  # unchanged screen for this long lowers productivity
+AI_LEXICON_DIR = BASE_DIR / "ai" / "lexicons"
+AI_FOCUS_LEXICON_PATH = AI_LEXICON_DIR / "focus.txt"
+AI_DISTRACTION_LEXICON_PATH = AI_LEXICON_DIR / "distraction.txt"
 AI_MODEL_NAME = "heuristic-edge-pipeline"
 AI_MODEL_VERSION = "0.1.0"
+AI_MODEL_DIR = BASE_DIR / "ai" / "artifacts"  # <name>/<version>/manifest.json + .npy heads
+AI_MODEL_SELECTOR_PATH = AI_MODEL_DIR / "active.json"  # {"name", "version"}; polled for hot swap
+AI_MODEL_POLL_SECONDS = 10
+AI_PROCESS_WORKERS = 0  # >0 runs OCR + text features in that many child processes
+AI_PROCESS_QUEUE_SIZE = 16  # captured frames held in memory for the child processes
+AI_PROCESS_TASK_TIMEOUT_SECONDS = 30  # a child busier than this is restarted
+AI_PROCESS_TASK_GRACE_SECONDS = 1.0  # beyond a frame's OCR deadline, for features and the hand-back
 HEALTH_SNAPSHOT_INTERVAL_SECONDS = 30
+
+# Agent pipeline: capture -> encode -> ocr -> score -> persist.
+# Full queues never raise: "drop_oldest" evicts the oldest queued item,
+# "drop_newest" rejects the new one, "block" waits block_timeout seconds
+# and then drops the new one. Score keeps a single worker so baseline
+# updates stay ordered. A stage with max_workers autoscales up to it.
+PIPELINE_STAGES = {
+    "encode": {"workers": 1, "queue_size": 4, "policy": "drop_oldest"},
+    "ocr": {"workers": 1, "max_workers": 4, "queue_size": 200, "policy": "drop_oldest"},
+    "score": {"workers": 1, "queue_size": 64, "policy": "block", "block_timeout": 5.0},
+    "persist": {"workers": 1, "queue_size": 256, "policy": "block", "block_timeout": 5.0},
+}
+PIPELINE_SCALE_UP_DEPTH = 4  # queued items per worker before adding one
+PIPELINE_SCALE_UP_WAIT_MS = 2000  # recent queue-wait p95 before adding a worker
+PIPELINE_IDLE_SECONDS = 60  # empty queue for this long removes a worker
+PIPELINE_SCALE_COOLDOWN_SECONDS = 5
+SUPERVISOR_INTERVAL_SECONDS = 1
+
+# Resource governor: throttles the agent under host pressure.
+GOVERNOR_INTERVAL_SECONDS = 5
+GOVERNOR_MAX_LOAD_PER_CPU = 0.85  # 1-minute load average per CPU
+GOVERNOR_CRITICAL_LOAD_PER_CPU = 1.5
+GOVERNOR_MIN_MEMORY_AVAILABLE = 0.15  # share of RAM still available
+GOVERNOR_CRITICAL_MEMORY_AVAILABLE = 0.05
+GOVERNOR_MAX_RSS_MB = 1024  # agent process budget
+GOVERNOR_LOW_BATTERY_PERCENT = 20
+GOVERNOR_RECOVERY_SAMPLES = 3  # calm samples before relaxing a level
+# ocr_max_workers None keeps the stage's own max_workers.
+GOVERNOR_LEVELS = {
+    "normal": {
+        "capture_interval_seconds": SCREENSHOT_INTERVAL_SECONDS,
+        "ocr_max_workers": None,
+        "recording_enabled": True,
+        "compression_nice": VIDEO_COMPRESSION_NICE,
+    },
+    "reduced": {
+        "capture_interval_seconds": SCREENSHOT_INTERVAL_SECONDS * 2,
+        "ocr_max_workers": 1,
+        "recording_enabled": True,
+        "compression_nice": 15,
+    },
+    "minimal": {
+        "capture_interval_seconds": SCREENSHOT_INTERVAL_SECONDS * 3,
+        "ocr_max_workers": 1,
+        "recording_enabled": False,
+        "compression_nice": 19,
+    },
+}
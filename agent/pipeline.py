@@ -0,0 +1,404 @@
+"""
+Staged, bounded processing pipeline.
+
+Each stage owns an input StageQueue and one or more worker threads.
+Workers pull up to `batch_size` items, run the stage handler and push
+its outputs to the next stage's queue. Queues never raise on overflow;
+they apply their policy instead:
+
+    drop_oldest   evict the oldest queued item (fresh frames win)
+    drop_newest   reject the incoming item (queued work wins)
+    block         wait up to `block_timeout` for room, then drop the
+                  incoming item
+
+so overload shows up as drop counters in metrics() rather than errors.
+Stages with max_workers above their worker count autoscale between the
+two when Pipeline.supervise() is called.
+"""
+
+import threading
+import time
+from collections import deque
+from queue import Empty
+
+import numpy as np
+
+from agent.config import (
+    PIPELINE_IDLE_SECONDS,
+    PIPELINE_SCALE_COOLDOWN_SECONDS,
+    PIPELINE_SCALE_UP_DEPTH,
+    PIPELINE_SCALE_UP_WAIT_MS,
+)
+
+
+POLICIES = ("drop_oldest", "drop_newest", "block")
+LATENCY_WINDOW = 512
+
+
+class StageQueue:
+    """
+    Bounded FIFO with an overflow policy and drop accounting.
+    """
+
+    def __init__(self, name: str, maxsize: int, policy: str = "drop_oldest", block_timeout: float = 1.0):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown queue policy {policy!r}")
+
+        self.name = name
+        self.maxsize = max(1, maxsize)
+        self.policy = policy
+        self.block_timeout = block_timeout
+
+        self._items = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+
+        self.accepted = 0
+        self.dropped = 0
+        self.high_watermark = 0
+
+    def __len__(self):
+        with self._lock:
+            return len(self._items)
+
+    def put(self, item) -> bool:
+        """
+        Enqueues item. Returns False when the item itself was dropped.
+        """
+        with self._lock:
+            if len(self._items) >= self.maxsize:
+                if self.policy == "drop_newest":
+                    self.dropped += 1
+                    return False
+
+                if self.policy == "drop_oldest":
+                    self._items.popleft()
+                    self.dropped += 1
+                else:
+                    deadline = time.monotonic() + self.block_timeout
+                    while len(self._items) >= self.maxsize:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self.dropped += 1
+                            return False
+                        self._not_full.wait(remaining)
+
+            self._items.append((time.monotonic(), item))
+            self.accepted += 1
+            self.high_watermark = max(self.high_watermark, len(self._items))
+            self._not_empty.notify()
+            return True
+
+    def get_batch(self, max_items: int, timeout: float) -> list[tuple[float, object]]:
+        """
+        Waits up to timeout for one item, then takes whatever else is
+        already queued, up to max_items. Returns (enqueued_at, item) pairs.
+        """
+        with self._lock:
+            if not self._items:
+                self._not_empty.wait(timeout)
+            if not self._items:
+                raise Empty
+
+            batch = []
+            while self._items and len(batch) < max_items:
+                batch.append(self._items.popleft())
+            self._not_full.notify(len(batch))
+            return batch
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "depth": len(self._items),
+                "maxsize": self.maxsize,
+                "policy": self.policy,
+                "accepted": self.accepted,
+                "dropped": self.dropped,
+                "high_watermark": self.high_watermark,
+            }
+
+
+class Stage:
+    """
+    A pipeline stage: handler(items) -> outputs, run by worker threads.
+
+    The handler receives a list of up to batch_size items and returns a
+    list of outputs (possibly empty) for the next stage. Exceptions are
+    logged and counted; the batch is discarded and the worker carries on.
+
+    With max_workers above workers, supervise() scales the pool between
+    the two: up while the queue holds more than scale_up_depth items per
+    worker or recent queue waits exceed scale_up_wait_ms, down after the
+    queue has been empty for idle_seconds. At most one change per
+    cooldown_seconds. Worker threads that died are restarted.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        handler,
+        queue: StageQueue,
+        workers: int = 1,
+        batch_size: int = 1,
+        logger=None,
+        max_workers: int | None = None,
+        scale_up_depth: int = PIPELINE_SCALE_UP_DEPTH,
+        scale_up_wait_ms: float = PIPELINE_SCALE_UP_WAIT_MS,
+        idle_seconds: float = PIPELINE_IDLE_SECONDS,
+        cooldown_seconds: float = PIPELINE_SCALE_COOLDOWN_SECONDS,
+    ):
+        self.name = name
+        self.handler = handler
+        self.queue = queue
+        self.min_workers = max(1, workers)
+        self.max_workers = max(self.min_workers, max_workers or self.min_workers)
+        self.batch_size = max(1, batch_size)
+        self.logger = logger
+        self.next_stage = None
+
+        self.scale_up_depth = scale_up_depth
+        self.scale_up_wait_ms = scale_up_wait_ms
+        self.idle_seconds = idle_seconds
+        self.cooldown_seconds = cooldown_seconds
+
+        self.worker_limit = None
+
+        self.threads: list[threading.Thread] = []
+        self._retire: dict[str, threading.Event] = {}
+        self._next_index = 0
+        self._stop_event = None
+        self._last_busy_at = None
+        self._last_scaled_at = 0.0
+
+        self._lock = threading.Lock()
+        self._latency_ms = deque(maxlen=LATENCY_WINDOW)
+        self._wait_ms = deque(maxlen=LATENCY_WINDOW)
+        self.processed = 0
+        self.failed = 0
+        self.restarts = 0
+        self.scale_ups = 0
+        self.scale_downs = 0
+        self.started_at = None
+
+    @property
+    def workers(self) -> int:
+        return len(self.threads)
+
+    def submit(self, item) -> bool:
+        return self.queue.put(item)
+
+    def start(self, stop_event: threading.Event):
+        self._stop_event = stop_event
+        self.started_at = self._last_busy_at = time.monotonic()
+        for _ in range(self.min_workers):
+            self._spawn()
+
+    def alive_workers(self) -> int:
+        return sum(1 for thread in self.threads if thread.is_alive())
+
+    def supervise(self):
+        """
+        Restarts dead workers, then applies at most one scaling step.
+        Call periodically from a supervisor thread.
+        """
+        for thread in list(self.threads):
+            if thread.is_alive():
+                continue
+            self.threads.remove(thread)
+            self._retire.pop(thread.name, None)
+            if not self._stop_event.is_set():
+                self._spawn()
+                self.restarts += 1
+                self._log("error", "Pipeline worker restarted", worker=thread.name)
+
+        ceiling = self.max_workers
+        if self.worker_limit is not None:
+            ceiling = max(1, min(ceiling, self.worker_limit))
+        floor = min(self.min_workers, ceiling)
+
+        if self.workers > ceiling:
+            self._retire.pop(self.threads.pop().name).set()
+            self.scale_downs += 1
+            self._log("info", "Pipeline stage limited", limit=ceiling)
+            return
+
+        now = time.monotonic()
+        if ceiling == floor or now - self._last_scaled_at < self.cooldown_seconds:
+            return
+
+        depth = len(self.queue)
+        if depth:
+            self._last_busy_at = now
+
+        with self._lock:
+            recent_wait = np.asarray(list(self._wait_ms)[-32:])
+
+        if self.workers < ceiling and (
+            depth > self.scale_up_depth * self.workers
+            or _percentile(recent_wait, 95) > self.scale_up_wait_ms
+        ):
+            self._spawn()
+            self.scale_ups += 1
+            self._last_scaled_at = now
+            self._log("info", "Pipeline stage scaled up", depth=depth)
+        elif self.workers > floor and now - self._last_busy_at > self.idle_seconds:
+            self._retire.pop(self.threads.pop().name).set()
+            self.scale_downs += 1
+            self._last_scaled_at = now
+            self._log("info", "Pipeline stage scaled down", depth=depth)
+
+    def limit_workers(self, limit: int | None):
+        """
+        Caps workers below max_workers (and min_workers if need be), e.g.
+        under host pressure; None lifts the cap. Applied by supervise().
+        """
+        self.worker_limit = limit
+
+    def join(self, timeout: float):
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            latency = np.asarray(self._latency_ms)
+            wait = np.asarray(self._wait_ms)
+            processed, failed = self.processed, self.failed
+
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        return {
+            "workers": self.workers,
+            "alive_workers": self.alive_workers(),
+            "min_workers": self.min_workers,
+            "max_workers": self.max_workers,
+            "worker_limit": self.worker_limit,
+            "restarts": self.restarts,
+            "scale_ups": self.scale_ups,
+            "scale_downs": self.scale_downs,
+            "processed": processed,
+            "failed": failed,
+            "throughput_per_s": round(processed / elapsed, 3) if elapsed > 0 else 0.0,
+            "latency_ms_p50": _percentile(latency, 50),
+            "latency_ms_p95": _percentile(latency, 95),
+            "queue_wait_ms_p50": _percentile(wait, 50),
+            "queue_wait_ms_p95": _percentile(wait, 95),
+            "queue": self.queue.stats(),
+        }
+
+    def _spawn(self):
+        name = f"{self.name}-worker-{self._next_index}"
+        self._next_index += 1
+        retire = self._retire[name] = threading.Event()
+        thread = threading.Thread(
+            target=self._run,
+            args=(self._stop_event, retire),
+            name=name,
+            daemon=True,
+        )
+        self.threads.append(thread)
+        thread.start()
+
+    def _log(self, level: str, message: str, **metadata):
+        if self.logger is not None:
+            getattr(self.logger, level)(
+                message,
+                extra={"metadata": {"stage": self.name, "workers": self.workers, **metadata}},
+            )
+
+    def _run(self, stop_event: threading.Event, retire: threading.Event):
+        while not stop_event.is_set() and not retire.is_set():
+            try:
+                batch = self.queue.get_batch(self.batch_size, timeout=0.5)
+            except Empty:
+                continue
+
+            dequeued_at = self._last_busy_at = time.monotonic()
+            items = [item for _, item in batch]
+            try:
+                outputs = self.handler(items) or []
+            except Exception as exc:
+                with self._lock:
+                    self.failed += len(items)
+                self._log("error", "Pipeline stage failed", error=str(exc), batch_size=len(items))
+                continue
+
+            finished_at = self._last_busy_at = time.monotonic()
+            per_item_ms = (finished_at - dequeued_at) * 1000 / len(items)
+            with self._lock:
+                self.processed += len(items)
+                self._latency_ms.extend([per_item_ms] * len(items))
+                self._wait_ms.extend((dequeued_at - enqueued_at) * 1000 for enqueued_at, _ in batch)
+
+            if self.next_stage is not None:
+                for output in outputs:
+                    self.next_stage.submit(output)
+
+
+class Pipeline:
+    """
+    Ordered chain of stages. submit() feeds the first stage.
+    """
+
+    def __init__(self, logger=None):
+        self.logger = logger
+        self.stages: list[Stage] = []
+
+    def add_stage(
+        self,
+        name: str,
+        handler,
+        workers: int = 1,
+        batch_size: int = 1,
+        queue_size: int = 16,
+        policy: str = "drop_oldest",
+        block_timeout: float = 1.0,
+        **scaling,
+    ) -> Stage:
+        """
+        Appends a stage; scaling takes Stage's max_workers and autoscaling
+        thresholds.
+        """
+        stage = Stage(
+            name,
+            handler,
+            StageQueue(name, queue_size, policy, block_timeout),
+            workers=workers,
+            batch_size=batch_size,
+            logger=self.logger,
+            **scaling,
+        )
+        if self.stages:
+            self.stages[-1].next_stage = stage
+        self.stages.append(stage)
+        return stage
+
+    def submit(self, item) -> bool:
+        return self.stages[0].submit(item)
+
+    def start(self, stop_event: threading.Event) -> list[threading.Thread]:
+        for stage in self.stages:
+            stage.start(stop_event)
+        return [thread for stage in self.stages for thread in stage.threads]
+
+    def supervise(self):
+        for stage in self.stages:
+            stage.supervise()
+
+    def join(self, timeout: float):
+        for stage in self.stages:
+            stage.join(timeout)
+
+    def stage(self, name: str) -> Stage | None:
+        for stage in self.stages:
+            if stage.name == name:
+                return stage
+        return None
+
+    def metrics(self) -> dict:
+        return {stage.name: stage.metrics() for stage in self.stages}
+
+
+def _percentile(values: np.ndarray, q: float) -> float:
+    if not values.size:
+        return 0.0
+    return round(float(np.percentile(values, q)), 3)
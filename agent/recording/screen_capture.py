@@ -2,22 +2,52 @@ from datetime import datetime
 from pathlib import Path
 import mss
 import mss.tools
+import numpy as np
 
 
-def capture_screen(output_dir: Path, image_format: str = "png") -> Path:
+def grab_screen() -> np.ndarray:
     """
-    Captures the primary screen and saves it to the given directory.
+    Grabs the primary screen as raw (H, W, 3) uint8 RGB pixels.
+    """
+    with mss.mss() as sct:
+        monitor = sct.monitors[1]  # primary monitor
+        screenshot = sct.grab(monitor)
+
+    width, height = screenshot.size
+    return np.frombuffer(screenshot.rgb, dtype=np.uint8).reshape(height, width, 3)
+
+
+def save_frame(
+    frame: np.ndarray,
+    output_dir: Path,
+    image_format: str = "png",
+    captured_at: datetime | None = None,
+) -> Path:
+    """
+    Encodes a frame from grab_screen() into the given directory.
     Returns the full path of the saved screenshot.
     """
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    timestamp = (captured_at or datetime.now()).strftime("%Y%m%d_%H%M%S")
     filename = f"screenshot_{timestamp}.{image_format}"
     file_path = output_dir / filename
 
-    with mss.mss() as sct:
-        monitor = sct.monitors[1]  # primary monitor
-        screenshot = sct.grab(monitor)
-        mss.tools.to_png(screenshot.rgb, screenshot.size, output=str(file_path))
+    height, width = frame.shape[:2]
+    mss.tools.to_png(np.ascontiguousarray(frame).tobytes(), (width, height), output=str(file_path))
+    return file_path
+
+
+def capture_screen(output_dir: Path, image_format: str = "png", with_frame: bool = False):
+    """
+    Captures the primary screen and saves it to the given directory.
+    Returns the full path of the saved screenshot, or (path, frame)
+    with the raw (H, W, 3) uint8 RGB pixels when with_frame is set.
+    """
+    frame = grab_screen()
+    file_path = save_frame(frame, output_dir, image_format)
+
+    if with_frame:
+        return file_path, frame
 
     return file_path
@@ -44,3 +44,22 @@ def test_compress_video_falls_back_to_original_on_failure(tmp_path, monkeypatch)
     assert result == input_path
     assert input_path.exists()
     assert input_path.read_bytes() == b"original"
+
+
+def test_compress_video_runs_ffmpeg_niced(tmp_path, monkeypatch):
+    input_path = tmp_path / "clip.mp4"
+    input_path.write_bytes(b"original")
+    commands = []
+
+    def fake_run(cmd, **kwargs):
+        commands.append(cmd)
+        Path(cmd[-1]).write_bytes(b"compressed")
+        return 0
+
+    monkeypatch.setattr("agent.recording.video_compressor.os.name", "posix")
+    monkeypatch.setattr("agent.recording.video_compressor.shutil.which", lambda name: "/usr/bin/nice")
+    monkeypatch.setattr("agent.recording.video_compressor.subprocess.run", fake_run)
+
+    compress_video(input_path, logger=_Logger(), nice=15)
+
+    assert commands[0][:3] == ["nice", "-n", "15"]
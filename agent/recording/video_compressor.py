@@ -1,8 +1,11 @@
+import os
+import shutil
 import subprocess
 from pathlib import Path
 
 from agent.config import (
     FFMPEG_BUNDLED_EXE,
+    VIDEO_COMPRESSION_NICE,
     VIDEO_COMPRESSION_CRF,
     VIDEO_COMPRESSION_PRESET,
     VIDEO_COMPRESSION_TIMEOUT_SECONDS,
@@ -16,7 +19,20 @@ def _resolve_ffmpeg_executable() -> str:
     return "ffmpeg"
 
 
-def compress_video(input_path: Path, logger=None) -> Path:
+def _low_priority(cmd: list[str], nice: int) -> tuple[list[str], dict]:
+    """
+    Runs ffmpeg below normal priority: `nice -n` on POSIX, a priority
+    class on Windows.
+    """
+    if os.name == "nt":
+        flag = subprocess.IDLE_PRIORITY_CLASS if nice >= 19 else subprocess.BELOW_NORMAL_PRIORITY_CLASS
+        return cmd, {"creationflags": flag}
+    if nice > 0 and shutil.which("nice"):
+        return ["nice", "-n", str(nice), *cmd], {}
+    return cmd, {}
+
+
+def compress_video(input_path: Path, logger=None, nice: int = VIDEO_COMPRESSION_NICE) -> Path:
     if not input_path.exists() or input_path.stat().st_size == 0:
         if logger:
             logger.warning(
@@ -49,9 +65,12 @@ def compress_video(input_path: Path, logger=None) -> Path:
         str(compressed_path),
     ]
 
+    cmd, priority = _low_priority(cmd, nice)
+
     try:
         subprocess.run(
             cmd,
+            **priority,
             check=True,
             timeout=VIDEO_COMPRESSION_TIMEOUT_SECONDS,
             capture_output=True,
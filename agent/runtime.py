@@ -1,16 +1,16 @@
+import os
 import time
 import socket
 import threading
 import hashlib
-import random
-from queue import Queue, Empty
+import functools
 
 from agent.api_client import BackendClient
 from agent.logger import get_logger
+from agent.pipeline import Pipeline
 from agent.system_info import collect_system_info
-from agent.ai import AIResultEnvelope, AIQueueStore
+from agent.ai import AIResultEnvelope, AIQueueStore, QueueMaintenance
 from agent.config import (
-    SCREENSHOT_INTERVAL_SECONDS,
     HEARTBEAT_INTERVAL_SECONDS,
     LOG_DIR,
     LOG_FILE_NAME,
@@ -18,18 +18,25 @@ from agent.config import (
     AGENT_NAME,
     AGENT_VERSION,
     AI_QUEUE_DB_PATH,
-    AI_UPLOAD_BATCH_SIZE,
     AI_UPLOAD_POLL_SECONDS,
-    AI_MAX_RETRIES,
-    AI_BACKOFF_BASE_SECONDS,
+    AI_UPLOAD_WORKERS,
+    AI_QUEUE_MAINTENANCE_INTERVAL_SECONDS,
     AI_MAX_QUEUE_BACKLOG,
+    AI_BATCH_MAX_FRAMES,
+    AI_PROCESS_QUEUE_SIZE,
+    AI_PROCESS_WORKERS,
     HEALTH_SNAPSHOT_INTERVAL_SECONDS,
+    PIPELINE_STAGES,
+    SUPERVISOR_INTERVAL_SECONDS,
+    GOVERNOR_INTERVAL_SECONDS,
 )
 
 from agent.services.screenshot_service import ScreenshotService
 from agent.services.heartbeat_service import HeartbeatService
 from agent.services.recording_service import RecordingService
 from agent.services.ai_service import AIService
+from agent.services.resource_governor import ResourceGovernor
+from agent.services.upload_service import UploadService
 
 
 class WorkSightAgent:
@@ -42,7 +49,8 @@ class WorkSightAgent:
         agent_id = self.system_info["hostname"]
         self.ai_service = AIService(self.logger, agent_id)
         self.ai_queue_store = AIQueueStore(AI_QUEUE_DB_PATH)
-        self.capture_queue = Queue(maxsize=200)
+        self.queue_maintenance = QueueMaintenance(self.ai_queue_store, self.logger)
+        self.upload_service = UploadService(self.backend, self.ai_queue_store, self.logger)
         self.stop_event = threading.Event()
         self.worker_threads = []
 
@@ -56,6 +64,9 @@ class WorkSightAgent:
             stop_event=self.stop_event,
         )
 
+        self.pipeline = self._build_pipeline()
+        self.governor = ResourceGovernor(self.logger)
+
     def start(self):
         self.logger.info(
             f"Agent started on {self.hostname}",
@@ -75,9 +86,9 @@ class WorkSightAgent:
 
         try:
             while True:
-                time.sleep(1)
-                if any(not worker.is_alive() for worker in self.worker_threads):
-                    raise RuntimeError("A critical worker thread stopped unexpectedly")
+                time.sleep(SUPERVISOR_INTERVAL_SECONDS)
+                self._supervise_workers()
+                self.pipeline.supervise()
 
         except KeyboardInterrupt:
             self.logger.info("Agent stopped by user")
@@ -91,17 +102,65 @@ class WorkSightAgent:
             self.stop_event.set()
             for worker in self.worker_threads:
                 worker.join(timeout=2)
+            self.pipeline.join(timeout=2)
+            self.ai_service.close()
+            self.ai_queue_store.close()
+
+    def _worker_loops(self) -> dict:
+        loops = {
+            "heartbeat-worker": self._heartbeat_loop,
+            "capture-worker": self._capture_loop,
+            "health-worker": self._health_loop,
+            "governor-worker": self._governor_loop,
+            "queue-maintenance-worker": self._queue_maintenance_loop,
+        }
+        for index in range(max(1, AI_UPLOAD_WORKERS)):
+            name = f"upload-worker-{index}"
+            loops[name] = functools.partial(self._upload_loop, f"{self.hostname}:{os.getpid()}:{name}")
+        return loops
 
     def _start_workers(self):
         self.worker_threads = [
-            threading.Thread(target=self._heartbeat_loop, name="heartbeat-worker", daemon=True),
-            threading.Thread(target=self._capture_loop, name="capture-worker", daemon=True),
-            threading.Thread(target=self._ai_loop, name="ai-worker", daemon=True),
-            threading.Thread(target=self._upload_loop, name="upload-worker", daemon=True),
-            threading.Thread(target=self._health_loop, name="health-worker", daemon=True),
+            threading.Thread(target=target, name=name, daemon=True)
+            for name, target in self._worker_loops().items()
         ]
         for worker in self.worker_threads:
             worker.start()
+        self.pipeline.start(self.stop_event)
+
+    def _supervise_workers(self):
+        """
+        Restarts loop threads that died instead of stopping the agent.
+        """
+        loops = self._worker_loops()
+        for index, worker in enumerate(self.worker_threads):
+            if worker.is_alive() or self.stop_event.is_set():
+                continue
+
+            self.logger.error(
+                "Worker thread stopped unexpectedly; restarting",
+                extra={"metadata": {"worker": worker.name}},
+            )
+            replacement = threading.Thread(target=loops[worker.name], name=worker.name, daemon=True)
+            self.worker_threads[index] = replacement
+            replacement.start()
+
+    def _build_pipeline(self) -> Pipeline:
+        pipeline = Pipeline(self.logger)
+        pipeline.add_stage("encode", self._encode_stage, **PIPELINE_STAGES["encode"])
+        ocr_settings = PIPELINE_STAGES["ocr"]
+        if self.ai_service.process_pool is not None:
+            # One OCR thread per child process; queued items hold raw frames.
+            ocr_settings = {
+                **ocr_settings,
+                "workers": AI_PROCESS_WORKERS,
+                "max_workers": AI_PROCESS_WORKERS,
+                "queue_size": min(ocr_settings["queue_size"], AI_PROCESS_QUEUE_SIZE),
+            }
+        pipeline.add_stage("ocr", self._ocr_stage, **ocr_settings)
+        pipeline.add_stage("score", self._score_stage, batch_size=AI_BATCH_MAX_FRAMES, **PIPELINE_STAGES["score"])
+        pipeline.add_stage("persist", self._persist_stage, batch_size=AI_BATCH_MAX_FRAMES, **PIPELINE_STAGES["persist"])
+        return pipeline
 
     def _heartbeat_loop(self):
         while not self.stop_event.is_set():
@@ -117,61 +176,114 @@ class WorkSightAgent:
     def _capture_loop(self):
         while not self.stop_event.is_set():
             try:
-                item = self.screenshot_service.capture_and_send()
+                self.pipeline.submit(self.screenshot_service.capture())
                 self.recording_service.maybe_record()
-                if item:
-                    self.capture_queue.put(item, timeout=1)
             except Exception as exc:
                 self.logger.error(
                     "Capture worker failed",
                     extra={"metadata": {"error": str(exc)}},
                 )
-            self.stop_event.wait(SCREENSHOT_INTERVAL_SECONDS)
+            self.stop_event.wait(self.governor.current.capture_interval_seconds)
+
+    def _encode_stage(self, captures: list[dict]) -> list[dict]:
+        items = [self.screenshot_service.encode_and_send(capture) for capture in captures]
+        if self.ai_service.process_pool is not None:
+            # Child processes OCR the raw frame instead of re-reading the PNG.
+            for item, capture in zip(items, captures):
+                item["frame"] = capture["frame"]
+        return items
+
+    def _ocr_stage(self, items: list[dict]) -> list[dict]:
+        backlog = self.ai_queue_store.backlog_count()
+        if backlog >= AI_MAX_QUEUE_BACKLOG:
+            self.logger.warning(
+                "AI metric dropped due to backlog limit",
+                extra={"metadata": {"backlog": backlog, "dropped": len(items)}},
+            )
+            return []
+
+        frame_activities = [item.get("activity") for item in items]
+        captured_at = [item.get("captured_at") for item in items]
+        # The frame's pipeline deadline starts with OCR and carries on into scoring.
+        deadline_started = time.perf_counter()
+        if self.ai_service.process_pool is not None:
+            ocr_results = self.ai_service.analyze_frames(
+                [item.pop("frame") for item in items],
+                frame_activities=frame_activities,
+                captured_at=captured_at,
+            )
+        else:
+            ocr_results = self.ai_service.ocr_frames(
+                [item["path"] for item in items],
+                frame_activities=frame_activities,
+                captured_at=captured_at,
+            )
+        return [
+            {**item, "ocr": result, "deadline_started": deadline_started}
+            for item, result in zip(items, ocr_results)
+        ]
+
+    def _score_stage(self, items: list[dict]) -> list:
+        # OCR workers may finish out of order; the baseline wants capture order.
+        items = sorted(items, key=lambda item: item.get("captured_at") or 0.0)
+        return self.ai_service.score_frames(
+            [item["path"] for item in items],
+            [item["ocr"] for item in items],
+            frame_activities=[item.get("activity") for item in items],
+            captured_at=[item.get("captured_at") for item in items],
+            deadline_started=[item.get("deadline_started") for item in items],
+        )
+
+    def _persist_stage(self, metrics: list) -> list:
+        for metric in metrics:
+            envelope = AIResultEnvelope(metric=metric)
+            idempotency_key = self._build_idempotency_key(metric)
+            inserted = self.ai_queue_store.enqueue(envelope, idempotency_key)
+            if inserted:
+                self.logger.info(
+                    "AI metric queued",
+                    extra={
+                        "metadata": {
+                            "source_ref": metric.source_ref,
+                            "idempotency_key": idempotency_key,
+                            "pipeline_status": metric.pipeline_status,
+                        }
+                    },
+                )
+        return []
 
-    def _ai_loop(self):
+    def _governor_loop(self):
         while not self.stop_event.is_set():
             try:
-                item = self.capture_queue.get(timeout=1)
-            except Empty:
-                continue
+                decision = self.governor.update()
+                self.pipeline.stage("ocr").limit_workers(decision.ocr_max_workers)
+                self.recording_service.enabled = decision.recording_enabled
+                self.recording_service.compression_nice = decision.compression_nice
+            except Exception as exc:
+                self.logger.error(
+                    "Resource governor failed",
+                    extra={"metadata": {"error": str(exc)}},
+                )
+            self.stop_event.wait(GOVERNOR_INTERVAL_SECONDS)
 
+    def _queue_maintenance_loop(self):
+        last_success_seen = self.backend.last_ai_upload_success_at
+        while not self.stop_event.is_set():
             try:
-                if self.ai_queue_store.backlog_count() >= AI_MAX_QUEUE_BACKLOG:
-                    self.logger.warning(
-                        "AI metric dropped due to backlog limit",
-                        extra={"metadata": {"backlog": self.ai_queue_store.backlog_count()}},
-                    )
-                    continue
-
-                metric = self.ai_service.process_screenshot(item["path"])
-                envelope = AIResultEnvelope(metric=metric)
-                idempotency_key = self._build_idempotency_key(metric)
-                inserted = self.ai_queue_store.enqueue(envelope, idempotency_key)
-                if inserted:
-                    self.logger.info(
-                        "AI metric queued",
-                        extra={
-                            "metadata": {
-                                "source_ref": metric.source_ref,
-                                "idempotency_key": idempotency_key,
-                                "pipeline_status": metric.pipeline_status,
-                            }
-                        },
-                    )
+                last_success = self.backend.last_ai_upload_success_at
+                self.queue_maintenance.run(uploads_succeeding=last_success != last_success_seen)
+                last_success_seen = last_success
             except Exception as exc:
                 self.logger.error(
-                    "AI worker failed",
+                    "Queue maintenance failed",
                     extra={"metadata": {"error": str(exc)}},
                 )
-            finally:
-                self.capture_queue.task_done()
+            self.stop_event.wait(AI_QUEUE_MAINTENANCE_INTERVAL_SECONDS)
 
-    def _upload_loop(self):
+    def _upload_loop(self, claimer: str):
         while not self.stop_event.is_set():
             try:
-                items = self.ai_queue_store.ready_items(AI_UPLOAD_BATCH_SIZE)
-                for item in items:
-                    self._upload_single(item)
+                self.upload_service.run(claimer, self.stop_event)
             except Exception as exc:
                 self.logger.error(
                     "Uploader worker failed",
@@ -186,10 +298,26 @@ class WorkSightAgent:
                     "Agent health snapshot",
                     extra={
                         "metadata": {
-                            "ai_worker_alive": self._is_worker_alive("ai-worker"),
+                            "ai_worker_alive": self.pipeline.stage("score").alive_workers() > 0,
                             "upload_worker_alive": self._is_worker_alive("upload-worker"),
                             "queue_backlog": self.ai_queue_store.backlog_count(),
+                            "uploader": self.upload_service.report(),
+                            "queue_claimers": self.ai_queue_store.claimer_report(),
+                            "queue_delivery": self.ai_queue_store.delivery_report(),
+                            "queue_store": self.queue_maintenance.report(),
                             "last_ai_upload_success_at": self.backend.last_ai_upload_success_at,
+                            "http": self.backend.http_report(),
+                            "baseline_flush": self.ai_service.baseline.flush_report(),
+                            "model": self.ai_service.model_runtime.report(),
+                            "activity": self.ai_service.activity_report(),
+                            "ai_stage_latency": self.ai_service.latency_report(),
+                            "pipeline": self.pipeline.metrics(),
+                            "governor": self.governor.report(),
+                            "ai_processes": (
+                                self.ai_service.process_pool.report()
+                                if self.ai_service.process_pool is not None
+                                else None
+                            ),
                         }
                     },
                 )
@@ -200,40 +328,17 @@ class WorkSightAgent:
                 )
             self.stop_event.wait(HEALTH_SNAPSHOT_INTERVAL_SECONDS)
 
-    def _upload_single(self, item: dict):
-        row_id = item["id"]
-        idempotency_key = item["idempotency_key"]
-        payload = item["metric"]
-        attempt = item["attempt"] + 1
-
-        try:
-            self.backend.log_ai_metric(payload, idempotency_key=idempotency_key)
-            self.ai_queue_store.mark_success(row_id)
-        except Exception as exc:
-            if attempt >= AI_MAX_RETRIES:
-                self.ai_queue_store.mark_dead_letter(row_id, str(exc))
-                self.logger.error(
-                    "AI metric moved to dead-letter queue",
-                    extra={"metadata": {"error": str(exc), "idempotency_key": idempotency_key}},
-                )
-                return
-
-            retry_delay = AI_BACKOFF_BASE_SECONDS * (2 ** (attempt - 1))
-            retry_delay += random.uniform(0.0, 0.75)
-            self.ai_queue_store.reschedule(
-                row_id=row_id,
-                attempt=attempt,
-                next_retry_at=time.time() + retry_delay,
-                error=str(exc),
-            )
-
     def _build_idempotency_key(self, metric) -> str:
         timestamp_bucket = metric.agent_timestamp[:16]
         raw = f"{self.backend.session_id}:{metric.source_ref}:{metric.feature_version}:{timestamp_bucket}"
         return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
-    def _is_worker_alive(self, name: str) -> bool:
-        for worker in self.worker_threads:
-            if worker.name == name:
-                return worker.is_alive()
-        return False
+    def _is_worker_alive(self, prefix: str) -> bool:
+        """
+        True when any worker named `prefix` or `prefix-<n>` is alive.
+        """
+        return any(
+            worker.is_alive()
+            for worker in self.worker_threads
+            if worker.name == prefix or worker.name.startswith(f"{prefix}-")
+        )
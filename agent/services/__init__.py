@@ -3,6 +3,7 @@ __all__ = [
     "HeartbeatService",
     "RecordingService",
     "AIService",
+    "UploadService",
 ]
 
 
@@ -19,4 +20,7 @@ def __getattr__(name):
     if name == "AIService":
         from .ai_service import AIService
         return AIService
+    if name == "UploadService":
+        from .upload_service import UploadService
+        return UploadService
     raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
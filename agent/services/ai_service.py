@@ -1,22 +1,36 @@
 import hashlib
+import threading
 import time
 from datetime import datetime, timezone
 from pathlib import Path
 
+import numpy as np
+
+from agent.ai.activity_index import ActivityIndex
+from agent.ai.deadline import Deadline, StageLatencyHistogram
 from agent.ai.types import AIMetricV1
 from agent.ai.extractors.ocr_extractor import OCRExtractor
-from agent.ai.feature_engineering.text_features import TextFeatureEngineer
+from agent.ai.feature_engineering.frame_activity import PIPELINE_FEATURE_NAMES
+from agent.ai.feature_engineering.keyword_matcher import tokenize
+from agent.ai.feature_engineering.simhash import simhash
+from agent.ai.feature_engineering.text_features import FEATURE_NAMES, TextFeatureEngineer, feature_matrix
 from agent.ai.models.productivity_model import ProductivityModel
-from agent.ai.models.anomaly_model import AnomalyModel
+from agent.ai.models.anomaly_model import AnomalyModel, features_tracked
+from agent.ai.models.runtime import ModelRuntime
+from agent.ai.process_pool import AIProcessPool
 from agent.ai.baseline_store import BaselineStore
 from agent.config import (
-    AI_FEATURE_VERSION,
-    AI_MODEL_NAME,
-    AI_MODEL_VERSION,
-    AI_PIPELINE_TIMEOUT_SECONDS,
+    AI_ACTIVITY_REUSE_RESULTS,
+    AI_HASHING_FEATURES,
+    AI_PROCESS_WORKERS,
+    AI_SKIP_OCR_WHEN_IDLE,
 )
 
 
+# OCR error codes that mean the OCR stage ran out of time.
+OCR_DEADLINE_CODES = ("OCR_TIMEOUT", "PIPELINE_TIMEOUT", "WORKER_TIMEOUT")
+
+
 class AIService:
     """
     AI Pipeline Orchestrator.
@@ -35,104 +49,236 @@ class AIService:
     - ML logic
     """
 
-    def __init__(self, logger, agent_id: str):
+    def __init__(
+        self,
+        logger,
+        agent_id: str,
+        baseline_path: str | None = None,
+        process_workers: int = AI_PROCESS_WORKERS,
+    ):
         self.logger = logger
 
         # Core pipeline modules
         self.extractor = OCRExtractor()
         self.feature_engineer = TextFeatureEngineer()
         self.productivity_model = ProductivityModel()
+        self.model_runtime = ModelRuntime(logger=self.logger)
+
+        # Optional child processes for OCR + text features (see analyze_frames)
+        self.process_pool = None
+        if process_workers > 0:
+            vectorizer = self.feature_engineer.vectorizer
+            self.process_pool = AIProcessPool(
+                process_workers,
+                self.logger,
+                feature_version=self.feature_engineer.feature_version,
+                hashing_features=vectorizer.n_features if vectorizer else AI_HASHING_FEATURES,
+            )
+
+        # Recent activities (SimHash of redacted OCR text)
+        self.activity_index = ActivityIndex()
+        self.reuse_activity_results = AI_ACTIVITY_REUSE_RESULTS
+        self.activity_reuse_count = 0
+
+        # Stage latency against AI_STAGE_BUDGETS_SECONDS
+        self.stage_latency = StageLatencyHistogram()
+
+        # Last OCR result, reused while the screen has not changed
+        self.skip_ocr_when_idle = AI_SKIP_OCR_WHEN_IDLE
+        self._last_ocr = None
+        self._ocr_lock = threading.Lock()
+        self.ocr_skipped_count = 0
 
         # Per-agent baseline
-        baseline_dir = Path("agent/ai/baselines")
-        baseline_dir.mkdir(parents=True, exist_ok=True)
-        baseline_path = baseline_dir / f"{agent_id}.json"
+        if baseline_path is None:
+            baseline_dir = Path("agent/ai/baselines")
+            baseline_dir.mkdir(parents=True, exist_ok=True)
+            baseline_path = baseline_dir / f"{agent_id}.sqlite3"
 
-        self.baseline = BaselineStore(str(baseline_path))
+        self.baseline = BaselineStore(
+            str(baseline_path),
+            logger=self.logger,
+            feature_names=PIPELINE_FEATURE_NAMES,
+            ready_features=features_tracked(),
+        )
 
         # Inject baseline into anomaly model
         self.anomaly_model = AnomalyModel(self.baseline)
         self._baseline_mature_logged = False
 
+    def close(self):
+        """
+        Flushes pending baseline updates and stops worker processes.
+        """
+        if self.process_pool is not None:
+            self.process_pool.close()
+        self.baseline.close()
+
     # ---------------------------------------------------------
 
-    def process_screenshot(self, image_path: str) -> AIMetricV1:
+    def process_screenshot(
+        self,
+        image_path: str,
+        frame_activity: dict | None = None,
+        captured_at: float | None = None,
+    ) -> AIMetricV1:
+        """
+        Runs the full pipeline for one screenshot.
+
+        frame_activity holds the capture-side screen-change features
+        (see FrameActivityTracker); they are merged into the feature dict.
+        When the screen has not changed since the last OCR'd capture,
+        that OCR text is reused instead of running OCR again.
+
+        Each stage runs against a Deadline. OCR is cancelled at its
+        budget; any overrun marks the metric partial (model_info
+        overrun_stage) and leaves the baseline untouched.
+        """
         started = time.perf_counter()
+        sample_ts = time.time() if captured_at is None else captured_at
         now_iso = datetime.now(timezone.utc).isoformat()
         source_ref = str(Path(image_path).resolve())
+        self.model_runtime.refresh()
+        model = self.model_runtime.current
 
-        pipeline_status = "ok"
-        error_code = None
-        error_message = None
+        deadline = Deadline(histogram=self.stage_latency)
 
         try:
             # -------------------------------------------------
             # 1️⃣ OCR
             # -------------------------------------------------
-            raw_text, err_code, err_msg = self.extractor.extract_text(image_path)
+            raw_text = self._idle_ocr_text(frame_activity, captured_at)
+            ocr_skipped = raw_text is not None
+            if ocr_skipped:
+                err_code = err_msg = None
+            else:
+                raw_text, err_code, err_msg = self.extractor.extract_text(
+                    image_path,
+                    timeout=deadline.timeout_for("ocr"),
+                )
+                self._remember_ocr(raw_text, err_code, captured_at)
+            deadline.lap("ocr")
+        except Exception as exc:
+            return self._failed_metric(source_ref, model, started, now_iso, exc)
 
-            if err_code:
-                pipeline_status = "partial"
-                error_code = err_code
-                error_message = err_msg
+        return self._score_frame(
+            source_ref,
+            (raw_text, err_code, err_msg, ocr_skipped),
+            frame_activity,
+            model,
+            deadline,
+            started=started,
+            sample_ts=sample_ts,
+            now_iso=now_iso,
+        )
 
-            # -------------------------------------------------
-            # 2️⃣ Timeout Guard
-            # -------------------------------------------------
-            if (time.perf_counter() - started) > AI_PIPELINE_TIMEOUT_SECONDS:
-                pipeline_status = "partial"
-                error_code = "PIPELINE_TIMEOUT"
-                error_message = (
-                    f"pipeline exceeded {AI_PIPELINE_TIMEOUT_SECONDS}s"
-                )
+    def _score_frame(
+        self,
+        source_ref: str,
+        ocr_result: tuple,
+        frame_activity: dict | None,
+        model,
+        deadline: Deadline,
+        started: float,
+        sample_ts: float,
+        now_iso: str,
+        analysis: dict | None = None,
+        match: tuple | None = None,
+        activity_remembered: bool = False,
+    ) -> AIMetricV1:
+        """
+        Stages after OCR for one frame. score_frames() falls back to this
+        with whatever its batch already computed: the text `analysis`,
+        the activity `match`, and whether the activity was remembered.
+        """
+        raw_text, err_code, err_msg, ocr_skipped = ocr_result
+        pipeline_status = "partial" if err_code else "ok"
+        error_code = err_code
+        error_message = err_msg
+        if err_code in OCR_DEADLINE_CODES:
+            deadline.mark_overrun("ocr")
 
+        try:
             # -------------------------------------------------
-            # 3️⃣ Redaction + Feature Engineering
+            # 2️⃣ Redaction + Activity Fingerprint
             # -------------------------------------------------
-            redacted = self.feature_engineer.redact(raw_text)
-            features = self.feature_engineer.extract(redacted)
+            if analysis is None:
+                analysis = self._analyze_text(ocr_result)
+            redacted = analysis["redacted"]
+            if match is None:
+                match = self._match_activity(analysis["fingerprint"], model)
+            fingerprint, activity, reused = match
+            deadline.lap("activity")
 
             # -------------------------------------------------
-            # 4️⃣ Productivity Scoring
+            # 3️⃣ Feature Engineering + Productivity Scoring
+            # (skipped for repeat activities when reuse is enabled)
             # -------------------------------------------------
-            productivity = self.productivity_model.predict(
-                redacted,
-                features,
-            )
+            if reused is not None:
+                text_features, sparse_features, productivity = reused
+            elif analysis["features"] is not None:
+                # Computed in a child process
+                text_features, sparse_features = analysis["features"], analysis["sparse_features"]
+                productivity = None
+            else:
+                text_features, sparse = self.feature_engineer.featurize(redacted, analysis["tokens"])
+                sparse_features = sparse.to_payload() if sparse is not None else None
+                productivity = None
+                deadline.lap("features")
+
+            features = {**text_features, **frame_activity} if frame_activity else text_features
+
+            if productivity is None:
+                productivity = self.productivity_model.predict(
+                    redacted,
+                    features,
+                    model=model,
+                )
+            if reused is None and not activity_remembered:
+                self._remember_activity(
+                    fingerprint,
+                    model,
+                    text_features,
+                    sparse_features,
+                    None if frame_activity else productivity,
+                )
+            deadline.lap("productivity")
 
             # -------------------------------------------------
-            # 5️⃣ Anomaly Scoring (uses baseline)
+            # 4️⃣ Anomaly Scoring (uses baseline)
             # IMPORTANT: Score BEFORE updating baseline
             # -------------------------------------------------
-            anomaly_score, explanation = self.anomaly_model.evaluate(features)
+            anomaly_score, explanation = self.anomaly_model.evaluate(
+                features,
+                timestamp=sample_ts,
+                model=model,
+            )
             anomaly_label = self.anomaly_model.label(anomaly_score)
             anomaly_mode = explanation.get("mode")
-
+            deadline.lap("anomaly")
 
             # -------------------------------------------------
-            # 6️⃣ Update Baseline AFTER scoring
+            # 5️⃣ Update Baseline AFTER scoring
+            # (skipped once any stage overran)
             # -------------------------------------------------
-            self.baseline.update(features)
+            baseline_updated = deadline.overrun_stage is None
+            if baseline_updated:
+                self.baseline.update(features, timestamp=sample_ts)
+                deadline.lap("baseline")
+
+            if deadline.overrun_stage is not None:
+                pipeline_status = "partial"
+                if error_code is None:
+                    error_code = "PIPELINE_TIMEOUT"
+                    error_message = f"{deadline.overrun_stage} stage exceeded its budget"
 
             # -------------------------------------------------
             # Baseline maturity tracking (log once)
             # -------------------------------------------------
-            if (
-                not self._baseline_mature_logged
-                and self.anomaly_model._baseline_ready()
-            ):
-                self.logger.info(
-                    "Baseline matured — switching to statistical anomaly mode.",
-                    extra={
-                        "metadata": {
-                            "source": "ai_service",
-                        }
-                    },
-                )
-                self._baseline_mature_logged = True
+            self._log_baseline_maturity()
 
             # -------------------------------------------------
-            # 7️⃣ Hash OCR Text
+            # 6️⃣ Hash OCR Text
             # -------------------------------------------------
             ocr_hash = (
                 hashlib.sha256(redacted.encode("utf-8")).hexdigest()
@@ -141,27 +287,34 @@ class AIService:
             )
 
             # -------------------------------------------------
-            # 8️⃣ Build Metric DTO
+            # 7️⃣ Build Metric DTO
             # -------------------------------------------------
             return AIMetricV1(
                 agent_timestamp=now_iso,
                 source_type="screenshot",
                 source_ref=source_ref,
                 ocr_text_hash=ocr_hash,
-                feature_version=AI_FEATURE_VERSION,
+                feature_version=self.feature_engineer.feature_version,
                 features=features,
+                sparse_features=sparse_features,
                 productivity_score=productivity,
                 anomaly_score=anomaly_score,
                 anomaly_label=anomaly_label,
                 anomaly_mode=anomaly_mode,
                 anomaly_explanation=explanation,
+                activity_cluster_id=activity.cluster_id if activity else None,
+                activity_seen_before=activity.seen_before if activity else None,
                 model_info={
-                    "name": AI_MODEL_NAME,
-                    "version": AI_MODEL_VERSION,
+                    "name": model.name,
+                    "version": model.version,
                     "latency_ms": round(
                         (time.perf_counter() - started) * 1000,
                         2,
                     ),
+                    "stage_latency_ms": deadline.timings,
+                    "ocr_skipped": ocr_skipped,
+                    "overrun_stage": deadline.overrun_stage,
+                    "baseline_updated": baseline_updated,
                 },
                 pipeline_status=pipeline_status,
                 error_code=error_code,
@@ -169,37 +322,458 @@ class AIService:
             )
 
         except Exception as exc:
-            # Structured logging
+            return self._failed_metric(source_ref, model, started, now_iso, exc)
+
+    def _failed_metric(self, source_ref: str, model, started: float, now_iso: str, exc: Exception) -> AIMetricV1:
+        # Structured logging
+        self.logger.error(
+            "AI pipeline failed",
+            extra={
+                "metadata": {
+                    "error": str(exc),
+                    "source_ref": source_ref,
+                }
+            },
+        )
+
+        # Safe fallback metric (never crash agent)
+        return AIMetricV1(
+            agent_timestamp=now_iso,
+            source_type="screenshot",
+            source_ref=source_ref,
+            ocr_text_hash=None,
+            feature_version=self.feature_engineer.feature_version,
+            features={},
+            productivity_score=0.0,
+            anomaly_score=1.0,
+            anomaly_label="critical",
+            model_info={
+                "name": model.name,
+                "version": model.version,
+                "latency_ms": round(
+                    (time.perf_counter() - started) * 1000,
+                    2,
+                ),
+            },
+            pipeline_status="failed",
+            error_code="PIPELINE_ERROR",
+            error_message=str(exc),
+        )
+
+    # ---------------------------------------------------------
+
+    def process_screenshots(
+        self,
+        image_paths,
+        frame_activities=None,
+        captured_at=None,
+    ) -> list[AIMetricV1]:
+        """
+        Batch form of process_screenshot() for draining several frames.
+
+        frame_activities and captured_at, when given, are per-frame lists
+        matching image_paths.
+
+        Productivity is computed as one array; anomaly scoring and
+        baseline updates stay in frame order so every metric equals what
+        process_screenshot() would have produced for that frame.
+        """
+        started = time.perf_counter()
+        ocr_results = self.ocr_frames(image_paths, frame_activities, captured_at)
+        return self.score_frames(
+            image_paths,
+            ocr_results,
+            frame_activities,
+            captured_at,
+            started=started,
+        )
+
+    def ocr_frames(self, image_paths, frame_activities=None, captured_at=None) -> list[tuple]:
+        """
+        OCR stage of process_screenshots(), safe to run from several
+        threads. Returns one (raw_text, error_code, error_message,
+        ocr_skipped) tuple per frame.
+        """
+        frame_activities = frame_activities or [None] * len(image_paths)
+        captured_at = captured_at or [None] * len(image_paths)
+        return [
+            self._timed_ocr(path, frame_activities[index], captured_at[index])
+            for index, path in enumerate(image_paths)
+        ]
+
+    def analyze_frames(self, frames, frame_activities=None, captured_at=None) -> list[dict]:
+        """
+        OCR + text features for captured (H, W, 3) frames in the child
+        processes (process_workers > 0). Safe to run from several
+        threads; feed the results to score_frames().
+        """
+        frame_activities = frame_activities or [None] * len(frames)
+        captured_at = captured_at or [None] * len(frames)
+
+        results = []
+        for index, frame in enumerate(frames):
+            raw_text = self._idle_ocr_text(frame_activities[index], captured_at[index])
+            deadline = Deadline(histogram=self.stage_latency if raw_text is None else None)
+            timeout = deadline.timeout_for("ocr") if raw_text is None else None
+            result = self.process_pool.analyze(frame, raw_text, timeout=timeout)
+            if raw_text is None:
+                text, err_code, _, _ = result["ocr"]
+                self._remember_ocr(text, err_code, captured_at[index])
+                deadline.lap("ocr")
+            results.append(result)
+        return results
+
+    def score_frames(
+        self,
+        image_paths,
+        ocr_results,
+        frame_activities=None,
+        captured_at=None,
+        started: float | None = None,
+        deadline_started=None,
+    ) -> list[AIMetricV1]:
+        """
+        Features, scoring and baseline stage of process_screenshots().
+
+        ocr_results holds ocr_frames() tuples or analyze_frames() dicts,
+        whose text features are already computed. Updates the baseline,
+        so it must be called from one thread at a time, in frame order.
+
+        Batched stages are checked against per-frame budgets. deadline_started
+        holds the time.perf_counter() at which each frame's OCR began; the
+        frame's total deadline runs from there (from this call when
+        missing), so time spent queued between stages counts against it. A
+        frame whose OCR or any later stage overran, or whose total ran out,
+        is marked partial and does not update the baseline.
+        """
+        started = time.perf_counter() if started is None else started
+        now_iso = datetime.now(timezone.utc).isoformat()
+        source_refs = [str(Path(path).resolve()) for path in image_paths]
+        frame_activities = frame_activities or [None] * len(source_refs)
+        captured_at = captured_at or [None] * len(source_refs)
+        # Baseline decay and hour-of-week buckets follow capture time, not
+        # the moment a (possibly backlogged) batch is scored.
+        now = time.time()
+        sample_ts = [now if frame_ts is None else frame_ts for frame_ts in captured_at]
+        self.model_runtime.refresh()
+        model = self.model_runtime.current
+
+        deadline = Deadline(histogram=self.stage_latency, items=len(source_refs))
+        deadline_started = [
+            deadline.started if frame_started is None else frame_started
+            for frame_started in (deadline_started or [None] * len(source_refs))
+        ]
+        # Progress so far, for the per-frame fallback below.
+        analyses = []
+        activities = []
+        remembered = set()
+
+        try:
+            for result in ocr_results:
+                analyses.append(result if isinstance(result, dict) else self._analyze_text(result))
+            redacted_texts = [analysis["redacted"] for analysis in analyses]
+            for analysis in analyses:
+                activities.append(self._match_activity(analysis["fingerprint"], model))
+            deadline.lap("activity")
+
+            text_rows = [None] * len(source_refs)
+            feature_rows = [None] * len(source_refs)
+            sparse_rows = [None] * len(source_refs)
+            productivity = np.zeros(len(source_refs))
+            pending = []
+            for index, (_, _, reused) in enumerate(activities):
+                analysis = analyses[index]
+                cached_productivity = None
+                if reused is not None:
+                    text_rows[index], sparse_rows[index], cached_productivity = reused
+                elif analysis["features"] is not None:
+                    text_rows[index], sparse_rows[index] = analysis["features"], analysis["sparse_features"]
+                else:
+                    text_rows[index], sparse = self.feature_engineer.featurize(
+                        analysis["redacted"],
+                        analysis["tokens"],
+                    )
+                    sparse_rows[index] = sparse.to_payload() if sparse is not None else None
+
+                frame_activity = frame_activities[index]
+                feature_rows[index] = (
+                    {**text_rows[index], **frame_activity} if frame_activity else text_rows[index]
+                )
+                if cached_productivity is None:
+                    pending.append(index)
+                else:
+                    productivity[index] = cached_productivity
+            deadline.lap("features")
+
+            if pending:
+                productivity[pending] = self.productivity_model.predict_batch(
+                    [redacted_texts[index] for index in pending],
+                    feature_matrix([feature_rows[index] for index in pending], PIPELINE_FEATURE_NAMES),
+                    PIPELINE_FEATURE_NAMES,
+                    model=model,
+                )
+
+            for index, (fingerprint, _, reused) in enumerate(activities):
+                if reused is None:
+                    self._remember_activity(
+                        fingerprint,
+                        model,
+                        text_rows[index],
+                        sparse_rows[index],
+                        None if frame_activities[index] else float(productivity[index]),
+                    )
+                    remembered.add(index)
+            deadline.lap("productivity")
+        except Exception as exc:
             self.logger.error(
-                "AI pipeline failed",
-                extra={
-                    "metadata": {
-                        "error": str(exc),
-                        "source_ref": source_ref,
-                    }
-                },
+                "AI batch pipeline failed",
+                extra={"metadata": {"error": str(exc), "batch_size": len(source_refs)}},
             )
+            # Score frame by frame from the OCR already done; nothing is OCR'd again.
+            return [
+                self._score_frame(
+                    source_ref,
+                    result["ocr"] if isinstance(result, dict) else result,
+                    frame_activities[index],
+                    model,
+                    Deadline(histogram=self.stage_latency, started=deadline_started[index]),
+                    started=started,
+                    sample_ts=sample_ts[index],
+                    now_iso=now_iso,
+                    analysis=analyses[index] if index < len(analyses) else None,
+                    match=activities[index] if index < len(activities) else None,
+                    activity_remembered=index in remembered,
+                )
+                for index, (source_ref, result) in enumerate(zip(source_refs, ocr_results))
+            ]
 
-            # Safe fallback metric (never crash agent)
-            return AIMetricV1(
-                agent_timestamp=now_iso,
-                source_type="screenshot",
-                source_ref=source_ref,
-                ocr_text_hash=None,
-                feature_version=AI_FEATURE_VERSION,
-                features={},
-                productivity_score=0.0,
-                anomaly_score=1.0,
-                anomaly_label="critical",
-                model_info={
-                    "name": AI_MODEL_NAME,
-                    "version": AI_MODEL_VERSION,
-                    "latency_ms": round(
-                        (time.perf_counter() - started) * 1000,
-                        2,
+        metrics = []
+        for index, source_ref in enumerate(source_refs):
+            _, err_code, err_msg, ocr_skipped = analyses[index]["ocr"]
+            features = feature_rows[index]
+            redacted = redacted_texts[index]
+            activity = activities[index][1]
+
+            # Anomaly and baseline run per frame, against what is left of the
+            # frame's total deadline after OCR, queueing and the batched stages.
+            frame_deadline = Deadline(histogram=self.stage_latency, started=deadline_started[index])
+            anomaly_score, explanation = self.anomaly_model.evaluate(
+                features,
+                timestamp=sample_ts[index],
+                model=model,
+            )
+            frame_deadline.lap("anomaly")
+
+            overrun_stage = (
+                "ocr" if err_code in OCR_DEADLINE_CODES
+                else deadline.overrun_stage or frame_deadline.overrun_stage
+            )
+            baseline_updated = overrun_stage is None
+            if baseline_updated:
+                self.baseline.update(features, timestamp=sample_ts[index])
+                frame_deadline.lap("baseline")
+                self._log_baseline_maturity()
+            if overrun_stage is not None and err_code is None:
+                err_code = "PIPELINE_TIMEOUT"
+                err_msg = f"{overrun_stage} stage exceeded its budget"
+
+            metrics.append(
+                AIMetricV1(
+                    agent_timestamp=now_iso,
+                    source_type="screenshot",
+                    source_ref=source_ref,
+                    ocr_text_hash=(
+                        hashlib.sha256(redacted.encode("utf-8")).hexdigest()
+                        if redacted
+                        else None
                     ),
+                    feature_version=self.feature_engineer.feature_version,
+                    features=features,
+                    sparse_features=sparse_rows[index],
+                    productivity_score=float(productivity[index]),
+                    anomaly_score=anomaly_score,
+                    anomaly_label=self.anomaly_model.label(anomaly_score),
+                    anomaly_mode=explanation.get("mode"),
+                    anomaly_explanation=explanation,
+                    activity_cluster_id=activity.cluster_id if activity else None,
+                    activity_seen_before=activity.seen_before if activity else None,
+                    model_info={
+                        "name": model.name,
+                        "version": model.version,
+                        "latency_ms": round(
+                            (time.perf_counter() - started) * 1000 / len(source_refs),
+                            2,
+                        ),
+                        "batch_size": len(source_refs),
+                        "stage_latency_ms": {**deadline.timings, **frame_deadline.timings},
+                        "ocr_skipped": ocr_skipped,
+                        "overrun_stage": overrun_stage,
+                        "baseline_updated": baseline_updated,
+                    },
+                    pipeline_status="partial" if err_code else "ok",
+                    error_code=err_code,
+                    error_message=err_msg,
+                )
+            )
+
+        return metrics
+
+    def score_texts(self, texts) -> dict:
+        """
+        Rescores historical OCR texts without touching the baseline.
+
+        Returns NumPy arrays: features (N, F), productivity (N,), anomaly (N,),
+        plus the anomaly mode used for the whole batch.
+        """
+        model = self.model_runtime.current
+        redacted_texts, feature_rows = self.feature_engineer.analyze_batch(texts)
+        anomaly_scores, anomaly_mode = self.anomaly_model.evaluate_batch(feature_rows, model=model)
+
+        return {
+            "feature_names": FEATURE_NAMES,
+            "features": feature_rows,
+            "productivity": self.productivity_model.predict_batch(
+                redacted_texts,
+                feature_rows,
+                model=model,
+            ),
+            "anomaly": anomaly_scores,
+            "anomaly_mode": anomaly_mode,
+        }
+
+    def latency_report(self) -> dict:
+        """
+        Per-stage latency percentiles and budget-ratio histogram.
+        """
+        return self.stage_latency.report()
+
+    def activity_report(self) -> dict:
+        return {
+            **self.activity_index.stats(),
+            "reuse_enabled": self.reuse_activity_results,
+            "reused": self.activity_reuse_count,
+            "ocr_skipped": self.ocr_skipped_count,
+        }
+
+    def _match_activity(self, fingerprint: int | None, model):
+        """
+        Records a SimHash fingerprint of redacted tokens in the activity index.
+
+        Returns (fingerprint, ActivityMatch, reused) where reused is a
+        (features, sparse_features, productivity) tuple from a matching
+        earlier frame scored by the same model, or None. Empty text
+        (fingerprint None) is not indexed.
+        """
+        if fingerprint is None:
+            return None, None, None
+
+        activity = self.activity_index.observe(fingerprint)
+
+        cached = activity.cached if self.reuse_activity_results else None
+        if cached is None or cached["model"] != (model.name, model.version, self.feature_engineer.feature_version):
+            return fingerprint, activity, None
+
+        self.activity_reuse_count += 1
+        return fingerprint, activity, (dict(cached["features"]), cached["sparse_features"], cached["productivity"])
+
+    def _analyze_text(self, ocr_result: tuple) -> dict:
+        """
+        In-process counterpart of a child's analysis; features are left
+        to score_frames() so repeat activities can skip them.
+        """
+        redacted = self.feature_engineer.redact(ocr_result[0])
+        tokens = tokenize(redacted)
+        return {
+            "ocr": ocr_result,
+            "redacted": redacted,
+            "tokens": tokens,
+            "fingerprint": simhash(tokens) if tokens else None,
+            "features": None,
+            "sparse_features": None,
+        }
+
+    def _remember_activity(self, fingerprint, model, features, sparse_features, productivity):
+        if fingerprint is None or not self.reuse_activity_results:
+            return
+
+        self.activity_index.remember(
+            fingerprint,
+            {
+                "model": (model.name, model.version, self.feature_engineer.feature_version),
+                "features": dict(features),
+                "sparse_features": sparse_features,
+                "productivity": productivity,
+            },
+        )
+
+    def _timed_ocr(
+        self,
+        image_path: str,
+        frame_activity: dict | None = None,
+        captured_at: float | None = None,
+    ) -> tuple[str, str | None, str | None, bool]:
+        raw_text = self._idle_ocr_text(frame_activity, captured_at)
+        if raw_text is not None:
+            return raw_text, None, None, True
+
+        deadline = Deadline(histogram=self.stage_latency)
+        raw_text, err_code, err_msg = self.extractor.extract_text(
+            image_path,
+            timeout=deadline.timeout_for("ocr"),
+        )
+        self._remember_ocr(raw_text, err_code, captured_at)
+
+        if deadline.lap("ocr") and not err_code:
+            err_code = "PIPELINE_TIMEOUT"
+            err_msg = "ocr stage exceeded its budget"
+
+        return raw_text, err_code, err_msg, False
+
+    def _idle_ocr_text(self, frame_activity: dict | None, captured_at: float | None) -> str | None:
+        """
+        Last OCR text if nothing on screen changed since it was captured.
+
+        Only OCR of an earlier or equal capture qualifies: with several
+        OCR workers a later frame may have been read first.
+        """
+        if not (self.skip_ocr_when_idle and frame_activity and captured_at is not None):
+            return None
+
+        with self._ocr_lock:
+            if not self._last_ocr:
+                return None
+
+            last_change_at = captured_at - frame_activity.get("seconds_since_change", 0.0)
+            ocr_captured_at, raw_text = self._last_ocr
+            # seconds_since_change is rounded to milliseconds
+            if (
+                frame_activity.get("dirty_blocks")
+                or ocr_captured_at > captured_at
+                or last_change_at > ocr_captured_at + 0.001
+            ):
+                return None
+
+            self.ocr_skipped_count += 1
+            return raw_text
+
+    def _remember_ocr(self, raw_text: str, err_code: str | None, captured_at: float | None):
+        with self._ocr_lock:
+            if captured_at is None or err_code:
+                self._last_ocr = None
+            elif self._last_ocr is None or self._last_ocr[0] <= captured_at:
+                self._last_ocr = (captured_at, raw_text)
+
+    def _log_baseline_maturity(self):
+        if (
+            not self._baseline_mature_logged
+            and self.baseline.snapshot.ready
+        ):
+            self.logger.info(
+                "Baseline matured — switching to statistical anomaly mode.",
+                extra={
+                    "metadata": {
+                        "source": "ai_service",
+                    }
                 },
-                pipeline_status="failed",
-                error_code="PIPELINE_ERROR",
-                error_message=str(exc),
             )
+            self._baseline_mature_logged = True
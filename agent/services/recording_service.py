@@ -7,6 +7,7 @@ from agent.config import (
     RECORDING_INTERVAL_SECONDS,
     RECORDING_DURATION_SECONDS,
     VIDEO_COMPRESSION_ENABLED,
+    VIDEO_COMPRESSION_NICE,
 )
 from agent.recording.video_compressor import compress_video
 
@@ -21,6 +22,10 @@ class RecordingService:
         self.is_recording = False
         self.last_recording_time = 0
 
+        # Adjusted by the resource governor
+        self.enabled = True
+        self.compression_nice = VIDEO_COMPRESSION_NICE
+
         self.drive = drive_client
         if self.drive is None:
             try:
@@ -38,7 +43,7 @@ class RecordingService:
 
     def maybe_record(self):
         """Checks if recording interval has passed and starts background job."""
-        if self._should_stop():
+        if self._should_stop() or not self.enabled:
             return
 
         now = time.time()
@@ -95,7 +100,11 @@ class RecordingService:
             )
 
             if VIDEO_COMPRESSION_ENABLED:
-                video_path = compress_video(video_path, logger=self.logger)
+                video_path = compress_video(
+                    video_path,
+                    logger=self.logger,
+                    nice=self.compression_nice,
+                )
                 stage = "compressed"
             else:
                 stage = "compression_skipped"
@@ -0,0 +1,223 @@
+import os
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from agent.config import (
+    GOVERNOR_CRITICAL_LOAD_PER_CPU,
+    GOVERNOR_CRITICAL_MEMORY_AVAILABLE,
+    GOVERNOR_LEVELS,
+    GOVERNOR_LOW_BATTERY_PERCENT,
+    GOVERNOR_MAX_LOAD_PER_CPU,
+    GOVERNOR_MAX_RSS_MB,
+    GOVERNOR_MIN_MEMORY_AVAILABLE,
+    GOVERNOR_RECOVERY_SAMPLES,
+)
+
+
+PROC_MEMINFO = Path("/proc/meminfo")
+PROC_SELF_STATUS = Path("/proc/self/status")
+POWER_SUPPLY_DIR = Path("/sys/class/power_supply")
+
+LEVEL_ORDER = ("normal", "reduced", "minimal")
+
+
+@dataclass
+class ResourceSample:
+    """
+    Host and process load. Fields are None where the platform does not
+    expose them.
+    """
+
+    load_per_cpu: float | None = None
+    memory_available_ratio: float | None = None
+    rss_mb: float | None = None
+    on_battery: bool | None = None
+    battery_percent: float | None = None
+
+
+@dataclass
+class ThrottleDecision:
+    level: str
+    capture_interval_seconds: float
+    ocr_max_workers: int | None
+    recording_enabled: bool
+    compression_nice: int
+    reasons: list[str] = field(default_factory=list)
+
+
+def _read_kib_fields(path: Path, names: tuple[str, ...]) -> dict:
+    values = {}
+    for line in path.read_text().splitlines():
+        key, _, rest = line.partition(":")
+        if key in names:
+            values[key] = int(rest.split()[0])
+    return values
+
+
+def _power_state() -> tuple[bool | None, float | None]:
+    """
+    (on_battery, battery_percent) from sysfs; (None, None) without a battery.
+    """
+    if not POWER_SUPPLY_DIR.is_dir():
+        return None, None
+
+    mains_online = None
+    discharging = None
+    percent = None
+    for supply in POWER_SUPPLY_DIR.iterdir():
+        kind = _read_text(supply / "type")
+        if kind == "Mains" and _read_text(supply / "online") is not None:
+            mains_online = bool(mains_online) or _read_text(supply / "online") == "1"
+        elif kind == "Battery":
+            capacity = _read_text(supply / "capacity")
+            percent = float(capacity) if capacity is not None else percent
+            discharging = _read_text(supply / "status") == "Discharging"
+
+    if discharging is None:
+        return None, None
+    on_battery = not mains_online if mains_online is not None else discharging
+    return on_battery, percent
+
+
+def _read_text(path: Path) -> str | None:
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return None
+
+
+def sample_resources() -> ResourceSample:
+    """
+    Reads load average, /proc memory figures and battery state.
+    Each source is optional; failures leave the field as None.
+    """
+    sample = ResourceSample()
+
+    try:
+        sample.load_per_cpu = round(os.getloadavg()[0] / (os.cpu_count() or 1), 3)
+    except (AttributeError, OSError):
+        pass
+
+    try:
+        meminfo = _read_kib_fields(PROC_MEMINFO, ("MemTotal", "MemAvailable"))
+        sample.memory_available_ratio = round(meminfo["MemAvailable"] / meminfo["MemTotal"], 3)
+    except (OSError, KeyError, ValueError, ZeroDivisionError):
+        pass
+
+    try:
+        status = _read_kib_fields(PROC_SELF_STATUS, ("VmRSS",))
+        sample.rss_mb = round(status["VmRSS"] / 1024, 1)
+    except (OSError, KeyError, ValueError):
+        pass
+
+    try:
+        sample.on_battery, sample.battery_percent = _power_state()
+    except (OSError, ValueError):
+        pass
+
+    return sample
+
+
+class ResourceGovernor:
+    """
+    Maps host pressure to a throttling level from GOVERNOR_LEVELS.
+
+        reduced   load above GOVERNOR_MAX_LOAD_PER_CPU, available memory
+                  below GOVERNOR_MIN_MEMORY_AVAILABLE, or running on battery
+        minimal   load above GOVERNOR_CRITICAL_LOAD_PER_CPU, memory below
+                  GOVERNOR_CRITICAL_MEMORY_AVAILABLE, agent RSS above
+                  GOVERNOR_MAX_RSS_MB, or battery below
+                  GOVERNOR_LOW_BATTERY_PERCENT
+
+    Throttling applies immediately; relaxing to a lighter level needs
+    `recovery_samples` consecutive calmer samples, so the agent does not
+    flap around a threshold. Every change of level or reasons is logged.
+    """
+
+    def __init__(self, logger, sampler=sample_resources, recovery_samples: int = GOVERNOR_RECOVERY_SAMPLES):
+        self.logger = logger
+        self.sampler = sampler
+        self.recovery_samples = recovery_samples
+
+        self.current = self._decision("normal", [])
+        self.last_sample = None
+        self.changes = 0
+        self.changed_at = None
+        self._calm_samples = 0
+
+    def update(self) -> ThrottleDecision:
+        sample = self.sampler()
+        level, reasons = self._assess(sample)
+        self.last_sample = sample
+
+        current_rank = LEVEL_ORDER.index(self.current.level)
+        target_rank = LEVEL_ORDER.index(level)
+        if target_rank >= current_rank:
+            self._calm_samples = 0
+        else:
+            self._calm_samples += 1
+            if self._calm_samples < self.recovery_samples:
+                self.current.reasons = reasons
+                return self.current
+            self._calm_samples = 0
+
+        previous = self.current
+        self.current = self._decision(level, reasons)
+        if previous.level != level or previous.reasons != reasons:
+            self.changes += 1
+            self.changed_at = time.time()
+            log = self.logger.warning if target_rank > current_rank else self.logger.info
+            log(
+                "Resource governor changed throttling level",
+                extra={
+                    "metadata": {
+                        "previous_level": previous.level,
+                        **asdict(self.current),
+                        "sample": asdict(sample),
+                    }
+                },
+            )
+        return self.current
+
+    def report(self) -> dict:
+        return {
+            **asdict(self.current),
+            "sample": asdict(self.last_sample) if self.last_sample else None,
+            "changes": self.changes,
+            "changed_at": self.changed_at,
+        }
+
+    def _assess(self, sample: ResourceSample) -> tuple[str, list[str]]:
+        critical = []
+        elevated = []
+
+        if sample.load_per_cpu is not None:
+            if sample.load_per_cpu > GOVERNOR_CRITICAL_LOAD_PER_CPU:
+                critical.append("cpu")
+            elif sample.load_per_cpu > GOVERNOR_MAX_LOAD_PER_CPU:
+                elevated.append("cpu")
+
+        if sample.memory_available_ratio is not None:
+            if sample.memory_available_ratio < GOVERNOR_CRITICAL_MEMORY_AVAILABLE:
+                critical.append("memory")
+            elif sample.memory_available_ratio < GOVERNOR_MIN_MEMORY_AVAILABLE:
+                elevated.append("memory")
+
+        if sample.rss_mb is not None and sample.rss_mb > GOVERNOR_MAX_RSS_MB:
+            critical.append("rss")
+
+        if sample.on_battery:
+            if sample.battery_percent is not None and sample.battery_percent < GOVERNOR_LOW_BATTERY_PERCENT:
+                critical.append("battery_low")
+            else:
+                elevated.append("battery")
+
+        if critical:
+            return "minimal", critical + elevated
+        if elevated:
+            return "reduced", elevated
+        return "normal", []
+
+    def _decision(self, level: str, reasons: list[str]) -> ThrottleDecision:
+        return ThrottleDecision(level=level, reasons=reasons, **GOVERNOR_LEVELS[level])
@@ -1,4 +1,8 @@
-from agent.recording.screen_capture import capture_screen
+import time
+from datetime import datetime
+
+from agent.ai.feature_engineering.frame_activity import FrameActivityTracker
+from agent.recording.screen_capture import grab_screen, save_frame
 from agent.storage.local import LocalStorage
 from agent.storage.cleanup import cleanup_old_screenshots
 from agent.config import SCREENSHOT_DIR
@@ -9,9 +13,30 @@ class ScreenshotService:
         self.backend = backend
         self.logger = logger
         self.storage = LocalStorage()
+        self.frame_tracker = FrameActivityTracker()
 
-    def capture_and_send(self):
-        screenshot_path = capture_screen(SCREENSHOT_DIR)
+    def capture(self) -> dict:
+        """
+        Grabs a frame and its screen-change features, without encoding.
+        Must be called from one thread: the tracker diffs consecutive frames.
+        """
+        frame = grab_screen()
+        captured_at = time.time()
+        return {
+            "frame": frame,
+            "captured_at": captured_at,
+            "activity": self.frame_tracker.update(frame, captured_at),
+        }
+
+    def encode_and_send(self, capture: dict) -> dict:
+        """
+        Encodes a captured frame, stores it and reports it to the backend.
+        """
+        screenshot_path = save_frame(
+            capture["frame"],
+            SCREENSHOT_DIR,
+            captured_at=datetime.fromtimestamp(capture["captured_at"]),
+        )
         stored_path = self.storage.save(screenshot_path)
 
         self.backend.log_screenshot(stored_path)
@@ -20,10 +45,14 @@ class ScreenshotService:
 
         self.logger.info(
             "Screenshot captured",
-            extra={"metadata": {"path": str(screenshot_path)}},
+            extra={"metadata": {"path": str(screenshot_path), **capture["activity"]}},
         )
 
         return {
             "path": stored_path,
-            "captured_at": screenshot_path.stat().st_mtime,
+            "captured_at": capture["captured_at"],
+            "activity": capture["activity"],
         }
+
+    def capture_and_send(self):
+        return self.encode_and_send(self.capture())
@@ -0,0 +1,318 @@
+import time
+
+import numpy as np
+
+from agent.ai.baseline_store import BaselineStore
+from agent.ai.feature_engineering.text_features import FEATURE_NAMES, TextFeatureEngineer
+from agent.ai.models.anomaly_model import AnomalyModel
+from agent.ai.models.productivity_model import ProductivityModel
+from agent.config import AI_STAGE_BUDGETS_SECONDS
+from agent.services.ai_service import AIService
+
+
+TEXTS = [
+    "Jira ticket review for the deploy build",
+    "",
+    "youtube netflix game shopping",
+    "x",
+    "Code review with bob@example.com about 12345 items\nsecond line",
+    "design spec draft\n\nmore design",
+    "!!! ### 123",
+    "instagram instagram youtube",
+    "python code build deploy review jira ticket spec",
+    "lorem ipsum dolor sit amet",
+    "word",
+    "netflix",
+    "plain words on a screen here",
+    "jira",
+    "?",
+    "deploy deploy deploy",
+]
+
+
+class _Logger:
+    def info(self, *args, **kwargs):
+        pass
+
+    def warning(self, *args, **kwargs):
+        pass
+
+    def error(self, *args, **kwargs):
+        pass
+
+
+class _Extractor:
+    def extract_text(self, image_path, timeout=None):
+        index = int(image_path.rsplit("_", 1)[1].split(".")[0])
+        text = TEXTS[index]
+        if not text:
+            return "", "OCR_ERROR", "no text"
+        return text, None, None
+
+
+def _service(tmp_path, name):
+    service = AIService(_Logger(), "agent-x", baseline_path=str(tmp_path / f"{name}.json"))
+    service.extractor = _Extractor()
+    return service
+
+
+def _paths(tmp_path):
+    return [str(tmp_path / f"frame_{index}.png") for index in range(len(TEXTS))]
+
+
+def test_process_screenshots_matches_scalar_path(tmp_path, monkeypatch):
+    # Freeze wall time so baseline decay is identical for both services.
+    monkeypatch.setattr("agent.services.ai_service.time.time", lambda: 1_700_000_000.0)
+    scalar_service = _service(tmp_path, "scalar")
+    batch_service = _service(tmp_path, "batch")
+    paths = _paths(tmp_path)
+
+    scalar = [scalar_service.process_screenshot(path) for path in paths]
+    batch = batch_service.process_screenshots(paths[:5]) + batch_service.process_screenshots(paths[5:])
+
+    assert len(batch) == len(scalar)
+    for expected, actual in zip(scalar, batch):
+        assert actual.features == expected.features
+        assert actual.productivity_score == expected.productivity_score
+        assert actual.anomaly_score == expected.anomaly_score
+        assert actual.anomaly_label == expected.anomaly_label
+        assert actual.anomaly_mode == expected.anomaly_mode
+        assert actual.anomaly_explanation == expected.anomaly_explanation
+        assert actual.ocr_text_hash == expected.ocr_text_hash
+        assert actual.pipeline_status == expected.pipeline_status
+        assert actual.error_code == expected.error_code
+        assert actual.activity_cluster_id == expected.activity_cluster_id
+        assert actual.activity_seen_before == expected.activity_seen_before
+
+    # The sequence is long enough to cross into statistical mode.
+    assert {metric.anomaly_mode for metric in batch} == {"static", "statistical"}
+
+
+def test_feature_and_productivity_batches_match_scalar():
+    engineer = TextFeatureEngineer()
+    model = ProductivityModel()
+
+    redacted, matrix = engineer.analyze_batch(TEXTS)
+
+    assert matrix.shape == (len(TEXTS), len(FEATURE_NAMES))
+    for index, text in enumerate(TEXTS):
+        expected_text, expected = engineer.analyze(text)
+        assert redacted[index] == expected_text
+        assert matrix[index].tolist() == [expected[name] for name in FEATURE_NAMES]
+
+    scores = model.predict_batch(redacted, matrix)
+    expected_scores = [
+        model.predict(text, engineer.extract(text)) for text in redacted
+    ]
+    np.testing.assert_array_equal(scores, expected_scores)
+
+
+def test_anomaly_batch_matches_scalar_in_both_modes(tmp_path):
+    engineer = TextFeatureEngineer()
+    baseline = BaselineStore(str(tmp_path / "baseline.json"))
+    model = AnomalyModel(baseline)
+    rows = [engineer.extract(engineer.redact(text)) for text in TEXTS]
+    matrix = np.array([[row[name] for name in FEATURE_NAMES] for row in rows], dtype=float)
+
+    scores, mode = model.evaluate_batch(matrix)
+    assert mode == "static"
+    np.testing.assert_allclose(scores, [model.evaluate(row)[0] for row in rows])
+
+    for row in rows:
+        baseline.update(row)
+
+    scores, mode = model.evaluate_batch(matrix)
+    assert mode == "statistical"
+    np.testing.assert_allclose(scores, [model.evaluate(row)[0] for row in rows])
+    assert model.label_batch(scores).tolist() == [model.label(score) for score in scores]
+
+
+def test_score_texts_does_not_update_baseline(tmp_path):
+    service = _service(tmp_path, "rescore")
+
+    result = service.score_texts(TEXTS)
+
+    assert result["features"].shape == (len(TEXTS), len(FEATURE_NAMES))
+    assert result["productivity"].shape == (len(TEXTS),)
+    assert result["anomaly"].shape == (len(TEXTS),)
+    assert result["anomaly_mode"] == "static"
+    assert service.baseline.get_stats("word_count") is None
+
+
+def test_repeat_activity_reuses_features_and_productivity(tmp_path):
+    service = _service(tmp_path, "reuse")
+    service.reuse_activity_results = True
+    path = _paths(tmp_path)[8]
+
+    first = service.process_screenshot(path)
+    repeat = service.process_screenshot(path)
+
+    assert first.activity_seen_before is False
+    assert repeat.activity_seen_before is True
+    assert repeat.activity_cluster_id == first.activity_cluster_id
+    assert repeat.features == first.features
+    assert repeat.productivity_score == first.productivity_score
+    assert "features" not in repeat.model_info["stage_latency_ms"]
+    assert service.activity_report()["reused"] == 1
+
+
+class _CountingExtractor(_Extractor):
+    def __init__(self):
+        self.calls = 0
+
+    def extract_text(self, image_path, timeout=None):
+        self.calls += 1
+        return super().extract_text(image_path, timeout)
+
+
+def test_idle_frames_reuse_ocr_and_carry_frame_features(tmp_path):
+    service = _service(tmp_path, "idle")
+    service.extractor = _CountingExtractor()
+    path = _paths(tmp_path)[0]
+    busy = {"changed_pixel_ratio": 0.2, "dirty_blocks": 12, "seconds_since_change": 0.0}
+    idle = {"changed_pixel_ratio": 0.0, "dirty_blocks": 0, "seconds_since_change": 600.0}
+
+    first = service.process_screenshot(path, frame_activity=busy, captured_at=1000.0)
+    second = service.process_screenshot(path, frame_activity=idle, captured_at=1600.0)
+    still_idle = dict(idle, seconds_since_change=610.0)
+    batch = service.process_screenshots([path], frame_activities=[still_idle], captured_at=[1610.0])
+
+    assert service.extractor.calls == 1
+    assert first.model_info["ocr_skipped"] is False
+    assert second.model_info["ocr_skipped"] is True
+    assert batch[0].model_info["ocr_skipped"] is True
+    assert second.features["seconds_since_change"] == 600.0
+    assert second.ocr_text_hash == first.ocr_text_hash
+    assert second.productivity_score == first.productivity_score - 20.0
+    assert batch[0].productivity_score == second.productivity_score
+
+
+def test_changed_screen_runs_ocr_again(tmp_path):
+    service = _service(tmp_path, "changed")
+    service.extractor = _CountingExtractor()
+    path = _paths(tmp_path)[0]
+    busy = {"changed_pixel_ratio": 0.2, "dirty_blocks": 12, "seconds_since_change": 0.0}
+    # Idle now, but the last change happened after the OCR'd capture.
+    idle_after_change = {"changed_pixel_ratio": 0.0, "dirty_blocks": 0, "seconds_since_change": 5.0}
+
+    service.process_screenshot(path, frame_activity=busy, captured_at=1000.0)
+    service.process_screenshot(path, frame_activity=idle_after_change, captured_at=1020.0)
+
+    assert service.extractor.calls == 2
+
+
+def test_ocr_of_a_later_frame_is_not_reused_for_an_earlier_one(tmp_path):
+    service = _service(tmp_path, "ordering")
+    service.extractor = _CountingExtractor()
+    path = _paths(tmp_path)[0]
+    idle = {"changed_pixel_ratio": 0.0, "dirty_blocks": 0, "seconds_since_change": 600.0}
+
+    # Two OCR workers: the frame captured at 1600 is read before the one at 1500.
+    service.ocr_frames([path], [idle], [1600.0])
+    results = service.ocr_frames([path], [dict(idle, seconds_since_change=500.0)], [1500.0])
+
+    assert service.extractor.calls == 2
+    assert results[0][3] is False
+    assert service._last_ocr[0] == 1600.0
+
+
+class _SlowExtractor(_Extractor):
+    def __init__(self):
+        self.timeouts = []
+
+    def extract_text(self, image_path, timeout=None):
+        self.timeouts.append(timeout)
+        time.sleep(0.02)
+        return super().extract_text(image_path, timeout)
+
+
+def test_stage_overrun_marks_partial_and_skips_baseline(tmp_path, monkeypatch):
+    monkeypatch.setitem(AI_STAGE_BUDGETS_SECONDS, "ocr", 0.005)
+    service = _service(tmp_path, "overrun")
+    service.extractor = _SlowExtractor()
+    path = _paths(tmp_path)[0]
+
+    metric = service.process_screenshot(path)
+    batch = service.process_screenshots([path])
+
+    assert service.extractor.timeouts[0] <= 0.005
+    for result in (metric, batch[0]):
+        assert result.pipeline_status == "partial"
+        assert result.error_code == "PIPELINE_TIMEOUT"
+        assert result.model_info["overrun_stage"] == "ocr"
+        assert result.model_info["baseline_updated"] is False
+    assert service.baseline.get_stats("word_count") is None
+    assert service.latency_report()["ocr"]["overruns"] == 2
+
+
+def test_batch_failure_falls_back_without_running_ocr_again(tmp_path, monkeypatch):
+    service = _service(tmp_path, "fallback")
+    paths = _paths(tmp_path)[:4]
+    ocr_calls = []
+    remembered = []
+    extract_text = service.extractor.extract_text
+    remember_activity = service._remember_activity
+
+    def counting_extract(image_path, timeout=None):
+        ocr_calls.append(image_path)
+        return extract_text(image_path, timeout)
+
+    def counting_remember(fingerprint, *args):
+        remembered.append(fingerprint)
+        return remember_activity(fingerprint, *args)
+
+    def failing_predict_batch(*args, **kwargs):
+        raise RuntimeError("model unavailable")
+
+    monkeypatch.setattr(service.extractor, "extract_text", counting_extract)
+    monkeypatch.setattr(service, "_remember_activity", counting_remember)
+    monkeypatch.setattr(service.productivity_model, "predict_batch", failing_predict_batch)
+
+    metrics = service.process_screenshots(paths)
+
+    assert ocr_calls == paths
+    assert [metric.pipeline_status for metric in metrics] == ["ok", "partial", "ok", "ok"]
+    assert all(metric.features for metric in metrics)
+    assert len(remembered) == len(paths)
+
+
+def test_frame_deadline_runs_from_ocr_start(tmp_path):
+    service = _service(tmp_path, "carried")
+    paths = _paths(tmp_path)[:2]
+    ocr_results = service.ocr_frames(paths)
+    # The first frame began OCR long enough ago to have used up its total.
+    deadline_started = [time.perf_counter() - 10.0, time.perf_counter()]
+
+    stale, fresh = service.score_frames(paths, ocr_results, deadline_started=deadline_started)
+
+    assert stale.pipeline_status == "partial"
+    assert stale.error_code == "PIPELINE_TIMEOUT"
+    assert stale.model_info["overrun_stage"] == "anomaly"
+    assert stale.model_info["baseline_updated"] is False
+    assert fresh.model_info["overrun_stage"] is None
+    assert fresh.model_info["baseline_updated"] is True
+
+
+def test_scoring_uses_each_frame_capture_time(tmp_path, monkeypatch):
+    service = _service(tmp_path, "captured")
+    paths = _paths(tmp_path)[:3]
+    captured_at = [1_700_000_000.0, None, 1_700_003_600.0]
+    monkeypatch.setattr("agent.services.ai_service.time.time", lambda: 1_700_009_999.0)
+    evaluated, updated = [], []
+    evaluate, update = service.anomaly_model.evaluate, service.baseline.update
+
+    def spy_evaluate(features, timestamp=None, model=None):
+        evaluated.append(timestamp)
+        return evaluate(features, timestamp=timestamp, model=model)
+
+    def spy_update(features, timestamp=None):
+        updated.append(timestamp)
+        return update(features, timestamp=timestamp)
+
+    monkeypatch.setattr(service.anomaly_model, "evaluate", spy_evaluate)
+    monkeypatch.setattr(service.baseline, "update", spy_update)
+    service.process_screenshots(paths, captured_at=captured_at)
+
+    expected = [1_700_000_000.0, 1_700_009_999.0, 1_700_003_600.0]
+    assert evaluated == expected
+    assert updated == expected
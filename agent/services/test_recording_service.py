@@ -53,7 +53,7 @@ def _inject_fake_screen_recorder(monkeypatch):
 
 def test_recording_successful_flow_logs_uploaded(monkeypatch):
     _inject_fake_screen_recorder(monkeypatch)
-    monkeypatch.setattr("agent.services.recording_service.compress_video", lambda p, logger=None: p)
+    monkeypatch.setattr("agent.services.recording_service.compress_video", lambda p, logger=None, nice=None: p)
 
     backend = _Backend()
     logger = _Logger()
@@ -70,7 +70,7 @@ def test_recording_successful_flow_logs_uploaded(monkeypatch):
 
 def test_recording_drive_failure_logs_failed_payload(monkeypatch):
     _inject_fake_screen_recorder(monkeypatch)
-    monkeypatch.setattr("agent.services.recording_service.compress_video", lambda p, logger=None: p)
+    monkeypatch.setattr("agent.services.recording_service.compress_video", lambda p, logger=None, nice=None: p)
 
     backend = _Backend()
     logger = _Logger()
@@ -87,7 +87,7 @@ def test_recording_drive_failure_logs_failed_payload(monkeypatch):
 
 def test_recording_compression_fallback_still_uploads(monkeypatch):
     _inject_fake_screen_recorder(monkeypatch)
-    monkeypatch.setattr("agent.services.recording_service.compress_video", lambda p, logger=None: p)
+    monkeypatch.setattr("agent.services.recording_service.compress_video", lambda p, logger=None, nice=None: p)
 
     backend = _Backend()
     logger = _Logger()
@@ -102,7 +102,7 @@ def test_recording_compression_fallback_still_uploads(monkeypatch):
 
 def test_recording_backend_failure_does_not_leave_stuck_state(monkeypatch):
     _inject_fake_screen_recorder(monkeypatch)
-    monkeypatch.setattr("agent.services.recording_service.compress_video", lambda p, logger=None: p)
+    monkeypatch.setattr("agent.services.recording_service.compress_video", lambda p, logger=None, nice=None: p)
 
     backend = _Backend(fail=True)
     logger = _Logger()
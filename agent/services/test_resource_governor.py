@@ -0,0 +1,64 @@
+from agent.services.resource_governor import ResourceGovernor, ResourceSample, sample_resources
+
+
+class _Logger:
+    def __init__(self):
+        self.records = []
+
+    def info(self, message, extra=None):
+        self.records.append(("info", message, extra))
+
+    def warning(self, message, extra=None):
+        self.records.append(("warning", message, extra))
+
+
+class _Sampler:
+    def __init__(self, *samples):
+        self.samples = list(samples)
+
+    def __call__(self):
+        return self.samples.pop(0)
+
+
+CALM = ResourceSample(load_per_cpu=0.2, memory_available_ratio=0.6, rss_mb=200.0, on_battery=False)
+
+
+def test_pressure_throttles_immediately_and_recovers_gradually():
+    busy = ResourceSample(load_per_cpu=1.0, memory_available_ratio=0.6, rss_mb=200.0)
+    logger = _Logger()
+    governor = ResourceGovernor(logger, sampler=_Sampler(busy, CALM, CALM, CALM), recovery_samples=3)
+
+    throttled = governor.update()
+    assert throttled.level == "reduced"
+    assert throttled.reasons == ["cpu"]
+    assert throttled.ocr_max_workers == 1
+
+    assert governor.update().level == "reduced"
+    assert governor.update().level == "reduced"
+    recovered = governor.update()
+
+    assert recovered.level == "normal"
+    assert recovered.recording_enabled is True
+    assert [level for level, _, _ in logger.records] == ["warning", "info"]
+    assert logger.records[0][2]["metadata"]["previous_level"] == "normal"
+    assert governor.report()["changes"] == 2
+
+
+def test_critical_pressure_disables_recording():
+    sample = ResourceSample(load_per_cpu=0.2, memory_available_ratio=0.6, on_battery=True, battery_percent=10.0)
+    governor = ResourceGovernor(_Logger(), sampler=_Sampler(sample))
+
+    decision = governor.update()
+
+    assert decision.level == "minimal"
+    assert decision.reasons == ["battery_low"]
+    assert decision.recording_enabled is False
+    assert decision.compression_nice == 19
+    assert decision.capture_interval_seconds > ResourceGovernor(_Logger()).current.capture_interval_seconds
+
+
+def test_sample_resources_never_raises():
+    sample = sample_resources()
+
+    assert sample.load_per_cpu is None or sample.load_per_cpu >= 0
+    assert sample.rss_mb is None or sample.rss_mb > 0
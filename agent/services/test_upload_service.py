@@ -0,0 +1,195 @@
+import sqlite3
+import threading
+import time
+
+import requests
+
+from agent.ai.queue_store import AIQueueStore
+from agent.ai.test_queue_store import _envelope
+from agent.api_client import BackendClient
+from agent.circuit_breaker import CircuitOpenError
+from agent.services.upload_service import UploadService
+
+
+class _Logger:
+    def __init__(self):
+        self.records = []
+
+    def info(self, message, extra=None):
+        self.records.append(("info", message, extra))
+
+    def warning(self, message, extra=None):
+        self.records.append(("warning", message, extra))
+
+    def error(self, message, extra=None):
+        self.records.append(("error", message, extra))
+
+
+class _Backend:
+    """
+    Answers batch uploads after `delay` seconds; `stop_event` is set once
+    `expected` items were acknowledged.
+    """
+
+    def __init__(self, delay=0.0, statuses=None, expected=0, stop_event=None):
+        self.delay = delay
+        self.statuses = statuses or {}
+        self.expected = expected
+        self.stop_event = stop_event
+        self.keys = []
+        self.single_keys = []
+        self.in_flight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def log_ai_metrics_batch(self, items):
+        with self._lock:
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        time.sleep(self.delay)
+        with self._lock:
+            self.in_flight -= 1
+            self.keys.extend(key for key, _ in items)
+            if self.stop_event is not None and len(self.keys) >= self.expected:
+                self.stop_event.set()
+        return [{"idempotency_key": key, "status": self.statuses.get(key, "ok")} for key, _ in items]
+
+    def log_ai_metric(self, payload, idempotency_key):
+        self.single_keys.append(idempotency_key)
+
+
+def _store(tmp_path, count):
+    store = AIQueueStore(tmp_path / "queue.sqlite3")
+    store.enqueue_many([(_envelope(index), f"key-{index}") for index in range(count)])
+    return store
+
+
+def test_keeps_batches_in_flight_up_to_the_limit_and_acks_each_item_once(tmp_path):
+    store = _store(tmp_path, 60)
+    stop_event = threading.Event()
+    backend = _Backend(delay=0.05, expected=60, stop_event=stop_event)
+    service = UploadService(backend, store, _Logger(), max_in_flight=3, batch_size=5, poll_seconds=0.1)
+
+    service.run("uploader", stop_event)
+
+    assert sorted(backend.keys) == sorted(f"key-{index}" for index in range(60))
+    assert backend.peak == 3
+    assert store.backlog_count() == 0
+    report = service.report()
+    assert report["batches"] == 12
+    assert report["in_flight"] == 0
+    assert report["peak_in_flight"] == 3
+
+
+def test_claim_failure_is_logged_and_batches_in_flight_are_settled(tmp_path):
+    store = _store(tmp_path, 10)
+    stop_event = threading.Event()
+    backend = _Backend(delay=0.2, expected=10, stop_event=stop_event)
+    logger = _Logger()
+    service = UploadService(backend, store, logger, max_in_flight=2, batch_size=5, poll_seconds=0.05)
+    claim = store.claim
+    calls = {"count": 0}
+
+    def flaky_claim(claimer, limit):
+        calls["count"] += 1
+        if calls["count"] == 2:
+            raise sqlite3.OperationalError("database is locked")
+        return claim(claimer, limit)
+
+    store.claim = flaky_claim
+    service.run("uploader", stop_event)
+
+    assert sorted(backend.keys) == sorted(f"key-{index}" for index in range(10))
+    assert store.backlog_count() == 0
+    assert service.report()["in_flight"] == 0
+    assert ("error", "Uploader claim failed", {"metadata": {"error": "database is locked"}}) in logger.records
+
+
+def test_outcomes_settle_rows_in_the_store(tmp_path):
+    store = _store(tmp_path, 3)
+    backend = _Backend(statuses={"key-1": "invalid", "key-2": "duplicate"})
+    service = UploadService(backend, store, _Logger())
+
+    items = store.claim("uploader", 10)
+    store.complete_batch(**service.upload_batch(items), claimer="uploader")
+
+    assert store.backlog_count() == 0
+    assert [row["idempotency_key"] for row in store.dead_letters()] == ["key-1"]
+
+
+def test_failed_batch_is_rescheduled_with_backoff(tmp_path):
+    store = _store(tmp_path, 2)
+
+    class _Down(_Backend):
+        def log_ai_metrics_batch(self, items):
+            raise requests.ConnectionError("refused")
+
+    service = UploadService(_Down(), store, _Logger())
+    outcomes = service.upload_batch(store.claim("uploader", 10))
+
+    assert outcomes["acked"] == []
+    assert [attempt for _, attempt, _, _ in outcomes["rescheduled"]] == [1, 1]
+    assert all(retry_at > time.time() for _, _, retry_at, _ in outcomes["rescheduled"])
+
+
+def test_open_circuit_reschedules_without_using_an_attempt(tmp_path):
+    store = _store(tmp_path, 2)
+
+    class _Open(_Backend):
+        def log_ai_metrics_batch(self, items):
+            raise CircuitOpenError(30.0)
+
+    service = UploadService(_Open(), store, _Logger())
+    outcomes = service.upload_batch(store.claim("uploader", 10))
+
+    assert outcomes["dead_lettered"] == []
+    assert [attempt for _, attempt, _, _ in outcomes["rescheduled"]] == [0, 0]
+    assert all(retry_at >= time.time() + 29 for _, _, retry_at, _ in outcomes["rescheduled"])
+
+
+def test_falls_back_to_single_uploads_without_batch_endpoint(tmp_path):
+    store = _store(tmp_path, 2)
+    response = requests.Response()
+    response.status_code = 404
+
+    class _Legacy(_Backend):
+        def log_ai_metrics_batch(self, items):
+            raise requests.HTTPError("Not Found", response=response)
+
+    backend = _Legacy()
+    service = UploadService(backend, store, _Logger())
+    outcomes = service.upload_batch(store.claim("uploader", 10))
+
+    assert len(outcomes["acked"]) == 2
+    assert backend.single_keys == ["key-0", "key-1"]
+    assert service.report()["batch_ingest"] is False
+
+
+def test_backend_client_bounds_concurrency_per_endpoint(monkeypatch):
+    client = BackendClient(_Logger(), endpoint_concurrency={"/ai-metrics/batch/": 2})
+    lock = threading.Lock()
+    active = {"now": 0, "peak": 0}
+
+    def fake_post(session, url, **kwargs):
+        with lock:
+            active["now"] += 1
+            active["peak"] = max(active["peak"], active["now"])
+        time.sleep(0.05)
+        with lock:
+            active["now"] -= 1
+        response = requests.Response()
+        response.status_code = 200
+        return response
+
+    monkeypatch.setattr("agent.api_client.requests.Session.post", fake_post)
+    threads = [
+        threading.Thread(target=client._post, args=("http://backend/api/sessions/1/ai-metrics/batch/",))
+        for _ in range(6)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert active["peak"] == 2
+    assert client._endpoint_slot("/api/sessions/{id}/ai-metrics/") is None
@@ -0,0 +1,246 @@
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from agent.circuit_breaker import CircuitOpenError
+from agent.config import (
+    AI_BACKOFF_BASE_SECONDS,
+    AI_MAX_RETRIES,
+    AI_UPLOAD_BATCH_SIZE,
+    AI_UPLOAD_MAX_IN_FLIGHT,
+    AI_UPLOAD_POLL_SECONDS,
+)
+
+
+class UploadService:
+    """
+    Drains the AI queue to the backend with several batch requests in
+    flight.
+
+    run() drives an asyncio loop on the calling thread: it keeps claiming
+    batches while fewer than `max_in_flight` requests are outstanding and
+    sends each through BackendClient on a worker thread
+    (asyncio.to_thread), so the pooled keep-alive connections are shared.
+    Every batch is settled with one AIQueueStore.complete_batch(). Items
+    stay leased while in flight and carry their idempotency key, so a
+    retried or duplicated send is stored once.
+
+    While the backend circuit is open nothing is claimed; items caught
+    by it mid-batch are rescheduled for the next probe without using up
+    a retry attempt.
+    """
+
+    def __init__(
+        self,
+        backend,
+        store,
+        logger,
+        max_in_flight: int = AI_UPLOAD_MAX_IN_FLIGHT,
+        batch_size: int = AI_UPLOAD_BATCH_SIZE,
+        poll_seconds: float = AI_UPLOAD_POLL_SECONDS,
+    ):
+        self.backend = backend
+        self.store = store
+        self.logger = logger
+        self.max_in_flight = max(1, max_in_flight)
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+
+        self.batch_ingest = True
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.batches = 0
+        self.failed_batches = 0
+
+    def run(self, claimer: str, stop_event: threading.Event):
+        """
+        Uploads until stop_event is set; batches in flight are finished.
+        """
+        with ThreadPoolExecutor(self.max_in_flight + 1, thread_name_prefix=f"{claimer}-io") as executor:
+            loop = asyncio.new_event_loop()
+            loop.set_default_executor(executor)
+            try:
+                loop.run_until_complete(self._drain(claimer, stop_event))
+            finally:
+                loop.close()
+
+    def report(self) -> dict:
+        with self._lock:
+            return {
+                "max_in_flight": self.max_in_flight,
+                "in_flight": self.in_flight,
+                "peak_in_flight": self.peak_in_flight,
+                "batches": self.batches,
+                "failed_batches": self.failed_batches,
+                "batch_ingest": self.batch_ingest,
+            }
+
+    async def _drain(self, claimer: str, stop_event: threading.Event):
+        slots = asyncio.Semaphore(self.max_in_flight)
+        in_flight = set()
+
+        try:
+            while not stop_event.is_set():
+                circuit = getattr(self.backend, "circuit", None)
+                if circuit is not None and circuit.retry_after() > 0:
+                    await self._idle(stop_event, in_flight, min(circuit.retry_after(), self.poll_seconds))
+                    continue
+
+                await slots.acquire()
+                try:
+                    items = await asyncio.to_thread(self.store.claim, claimer, self.batch_size)
+                except Exception as exc:
+                    # e.g. "database is locked"; batches in flight keep going.
+                    slots.release()
+                    self.logger.error(
+                        "Uploader claim failed",
+                        extra={"metadata": {"error": str(exc)}},
+                    )
+                    await self._idle(stop_event, in_flight)
+                    continue
+
+                if not items:
+                    slots.release()
+                    await self._idle(stop_event, in_flight)
+                    continue
+
+                task = asyncio.create_task(self._send(claimer, items, slots))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+        finally:
+            # Settle every claimed batch before run() closes the loop.
+            if in_flight:
+                await asyncio.gather(*in_flight, return_exceptions=True)
+
+    async def _idle(self, stop_event: threading.Event, in_flight: set, seconds: float | None = None):
+        # Nothing due: wait for a request to finish or the poll interval,
+        # waking every 100 ms to notice a stop.
+        deadline = time.monotonic() + (self.poll_seconds if seconds is None else seconds)
+        while not stop_event.is_set() and time.monotonic() < deadline:
+            if in_flight:
+                await asyncio.wait(in_flight, timeout=0.1)
+                if not in_flight:
+                    return
+            else:
+                await asyncio.sleep(0.1)
+
+    async def _send(self, claimer: str, items: list[dict], slots: asyncio.Semaphore):
+        with self._lock:
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            outcomes = await asyncio.to_thread(self.upload_batch, items)
+            await asyncio.to_thread(self.store.complete_batch, **outcomes, claimer=claimer)
+            with self._lock:
+                self.batches += 1
+                self.failed_batches += int(not outcomes["acked"])
+        except Exception as exc:
+            # Leases expire and the items are claimed again.
+            with self._lock:
+                self.failed_batches += 1
+            self.logger.error(
+                "Uploader batch failed",
+                extra={"metadata": {"error": str(exc), "items": len(items)}},
+            )
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+            slots.release()
+
+    # ---------------------------
+    # Outcomes
+    # ---------------------------
+
+    def upload_batch(self, items: list[dict]) -> dict:
+        """
+        Uploads claimed items and returns their outcomes as keyword
+        arguments for AIQueueStore.complete_batch(). Whole batches go to
+        the batch endpoint; servers without it get one request per item.
+        """
+        outcomes = {"acked": [], "rescheduled": [], "dead_lettered": []}
+        if not self.batch_ingest:
+            for item in items:
+                kind, outcome = self.upload_single(item)
+                outcomes[kind].append(outcome)
+            return outcomes
+
+        try:
+            results = self.backend.log_ai_metrics_batch(
+                [(item["idempotency_key"], item["body"]) for item in items]
+            )
+        except requests.HTTPError as exc:
+            if exc.response is not None and exc.response.status_code in (404, 405):
+                self.batch_ingest = False
+                self.logger.warning(
+                    "Backend has no batch AI metric endpoint; uploading one metric per request",
+                    extra={"metadata": {"status_code": exc.response.status_code}},
+                )
+                return self.upload_batch(items)
+            results = exc
+        except Exception as exc:
+            results = exc
+
+        if results is None or isinstance(results, Exception):
+            error = results if results is not None else "No backend session"
+            for item in items:
+                kind, outcome = self.failure_outcome(item, error)
+                outcomes[kind].append(outcome)
+            return outcomes
+
+        by_key = {result.get("idempotency_key"): result for result in results}
+        for item in items:
+            result = by_key.get(item["idempotency_key"])
+            if result is not None and result.get("status") in ("ok", "duplicate"):
+                outcomes["acked"].append(item["id"])
+            elif result is not None and result.get("status") == "invalid":
+                # Rejected by validation; retrying the same payload cannot help.
+                error = f"Rejected by server: {result.get('error')}"
+                self.logger.error(
+                    "AI metric moved to dead-letter queue",
+                    extra={"metadata": {"error": error, "idempotency_key": item["idempotency_key"]}},
+                )
+                outcomes["dead_lettered"].append((item["id"], error))
+            else:
+                kind, outcome = self.failure_outcome(item, "Missing from batch response")
+                outcomes[kind].append(outcome)
+        return outcomes
+
+    def upload_single(self, item: dict) -> tuple[str, object]:
+        """
+        Uploads one queued metric and returns its outcome for
+        AIQueueStore.complete_batch(): ("acked", row_id),
+        ("rescheduled", (row_id, attempt, next_retry_at, error)) or
+        ("dead_lettered", (row_id, error)).
+        """
+        try:
+            self.backend.log_ai_metric(item["body"], idempotency_key=item["idempotency_key"])
+            return "acked", item["id"]
+        except Exception as exc:
+            return self.failure_outcome(item, exc)
+
+    def failure_outcome(self, item: dict, error) -> tuple[str, object]:
+        """
+        `error` is the exception or a message. An open circuit means the
+        request was never sent: the item waits for the next probe and
+        keeps its attempt count.
+        """
+        if isinstance(error, CircuitOpenError):
+            return "rescheduled", (item["id"], item["attempt"], time.time() + error.retry_after, str(error))
+
+        error = str(error)
+        attempt = item["attempt"] + 1
+        if attempt >= AI_MAX_RETRIES:
+            self.logger.error(
+                "AI metric moved to dead-letter queue",
+                extra={"metadata": {"error": error, "idempotency_key": item["idempotency_key"]}},
+            )
+            return "dead_lettered", (item["id"], error)
+
+        retry_delay = AI_BACKOFF_BASE_SECONDS * (2 ** (attempt - 1))
+        retry_delay += random.uniform(0.0, 0.75)
+        return "rescheduled", (item["id"], attempt, time.time() + retry_delay, error)
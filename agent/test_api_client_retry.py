@@ -1,6 +1,12 @@
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
 import requests
 
 from agent.api_client import BackendClient
+from agent.circuit_breaker import CircuitBreaker, CircuitOpenError
 
 
 class _Logger:
@@ -14,42 +20,267 @@ class _Logger:
         pass
 
 
+class _RecordingLogger(_Logger):
+    def __init__(self):
+        self.records = []
+
+    def info(self, message, extra=None):
+        self.records.append((message, extra))
+
+    warning = info
+
+
 class _Response:
     def __init__(self, status_code=200):
         self.status_code = status_code
 
 
-def test_post_with_retry_retries_then_succeeds(monkeypatch):
+def test_requests_are_sent_once_without_sleeping(monkeypatch):
     client = BackendClient(_Logger())
     calls = {"count": 0}
 
+    def fake_post(*args, **kwargs):
+        calls["count"] += 1
+        raise requests.ConnectionError("down")
+
+    def no_sleep(*_):
+        raise AssertionError("request paths must not sleep")
+
+    monkeypatch.setattr("agent.api_client.requests.Session.post", fake_post)
+    monkeypatch.setattr("agent.api_client.time.sleep", no_sleep)
+
+    try:
+        client._post("http://example.com")
+        assert False, "Expected ConnectionError"
+    except requests.ConnectionError:
+        assert calls["count"] == 1
+
+
+def test_create_session_retries_then_succeeds(monkeypatch):
+    client = BackendClient(_Logger())
+    calls = {"count": 0}
+
+    class _SessionResponse(_Response):
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"session_id": 4, "token": "secret"}
+
     def fake_post(*args, **kwargs):
         calls["count"] += 1
         if calls["count"] < 3:
             raise requests.ConnectionError("temporary failure")
-        return _Response(status_code=200)
+        return _SessionResponse()
 
-    monkeypatch.setattr("agent.api_client.requests.post", fake_post)
+    monkeypatch.setattr("agent.api_client.requests.Session.post", fake_post)
     monkeypatch.setattr("agent.api_client.time.sleep", lambda *_: None)
 
-    response = client._post_with_retry("http://example.com")
-    assert response.status_code == 200
+    system_info = {"hostname": "host", "username": "user", "ip_address": "10.0.0.1"}
+    assert client.create_session(system_info) == 4
     assert calls["count"] == 3
 
 
-def test_post_with_retry_raises_after_max_attempts(monkeypatch):
-    client = BackendClient(_Logger())
-    calls = {"count": 0}
+def test_circuit_opens_short_circuits_and_closes_after_probe(monkeypatch):
+    logger = _RecordingLogger()
+    now = {"t": 0.0}
+    circuit = CircuitBreaker(logger, failure_threshold=2, reset_seconds=10, clock=lambda: now["t"])
+    client = BackendClient(logger, circuit=circuit)
+    calls = {"count": 0, "status": 503}
 
     def fake_post(*args, **kwargs):
         calls["count"] += 1
-        raise requests.ConnectionError("down")
+        return _Response(status_code=calls["status"])
 
-    monkeypatch.setattr("agent.api_client.requests.post", fake_post)
-    monkeypatch.setattr("agent.api_client.time.sleep", lambda *_: None)
+    monkeypatch.setattr("agent.api_client.requests.Session.post", fake_post)
+
+    for _ in range(2):
+        try:
+            client._post("http://example.com/api/sessions/1/heartbeat/")
+        except requests.HTTPError:
+            pass
+    assert circuit.state == "open"
 
     try:
-        client._post_with_retry("http://example.com")
-        assert False, "Expected ConnectionError"
-    except requests.ConnectionError:
-        assert calls["count"] >= 1
+        client._post("http://example.com/api/sessions/1/heartbeat/")
+        assert False, "Expected CircuitOpenError"
+    except CircuitOpenError as exc:
+        assert exc.retry_after == 10
+    assert calls["count"] == 2
+
+    # A failed probe reopens with the wait doubled.
+    now["t"] = 10.0
+    try:
+        client._post("http://example.com/api/sessions/1/heartbeat/")
+    except requests.HTTPError:
+        pass
+    assert circuit.state == "open"
+    assert circuit.retry_after() == 20
+
+    now["t"] = 30.0
+    calls["status"] = 200
+    assert client._post("http://example.com/api/sessions/1/heartbeat/").status_code == 200
+    assert circuit.state == "closed"
+    assert calls["count"] == 4
+
+    assert [message for message, _ in logger.records] == [
+        "Backend circuit opened",
+        "Backend circuit half-open",
+        "Backend circuit opened",
+        "Backend circuit half-open",
+        "Backend circuit closed",
+    ]
+    assert client.http_report()["circuit"]["short_circuited"] == 1
+
+
+def test_half_open_circuit_admits_a_single_probe():
+    circuit = CircuitBreaker(_Logger(), failure_threshold=1, reset_seconds=0)
+    circuit.record_failure("down")
+
+    circuit.before_request()
+    try:
+        circuit.before_request()
+        assert False, "Expected CircuitOpenError"
+    except CircuitOpenError:
+        pass
+
+    circuit.record_success()
+    circuit.before_request()
+    assert circuit.report()["state"] == "closed"
+
+
+def test_log_ai_metric_sends_encoded_body_as_is(monkeypatch):
+    client = BackendClient(_Logger())
+    client.session_id = "session-1"
+    sent = {}
+
+    class _JSONResponse(_Response):
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"status": "ok"}
+
+    def fake_post(session, url, **kwargs):
+        sent.update(kwargs)
+        return _JSONResponse()
+
+    monkeypatch.setattr("agent.api_client.requests.Session.post", fake_post)
+
+    client.log_ai_metric(b'{"productivity_score":0.5}', idempotency_key="key-1")
+
+    assert sent["data"] == b'{"productivity_score":0.5}'
+    assert "json" not in sent
+    assert sent["headers"]["Content-Type"] == "application/json"
+    assert sent["headers"]["X-Idempotency-Key"] == "key-1"
+
+
+def test_log_ai_metrics_batch_splices_encoded_bodies(monkeypatch):
+    client = BackendClient(_Logger())
+    client.session_id = "session-1"
+    sent = {}
+
+    class _JSONResponse(_Response):
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"results": [{"idempotency_key": "key-1", "status": "ok"}]}
+
+    def fake_post(session, url, **kwargs):
+        sent["url"] = url
+        sent.update(kwargs)
+        return _JSONResponse()
+
+    monkeypatch.setattr("agent.api_client.requests.Session.post", fake_post)
+
+    results = client.log_ai_metrics_batch([("key-1", b'{"a":1}'), ("key-2", {"b": 2})])
+
+    assert sent["url"].endswith("/sessions/session-1/ai-metrics/batch/")
+    assert json.loads(sent["data"]) == {
+        "items": [
+            {"idempotency_key": "key-1", "metric": {"a": 1}},
+            {"idempotency_key": "key-2", "metric": {"b": 2}},
+        ]
+    }
+    assert results == [{"idempotency_key": "key-1", "status": "ok"}]
+    assert client.last_ai_upload_success_at is not None
+
+
+def test_connections_are_reused_across_threads_and_latency_is_reported():
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            body = b'{"status": "ok"}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}/api/sessions"
+    client = BackendClient(_Logger())
+
+    def send(count):
+        for _ in range(count):
+            client._post(f"{base}/7/heartbeat/")
+
+    try:
+        send(10)
+        worker = threading.Thread(target=send, args=(10,))
+        worker.start()
+        worker.join()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    report = client.http_report()
+    assert report["requests"] == 20
+    assert report["connections_opened"] == 1
+    assert report["reuse_rate"] == 0.95
+    assert report["endpoints"]["/api/sessions/{id}/heartbeat/"]["count"] == 20
+    assert report["endpoints"]["/api/sessions/{id}/heartbeat/"]["errors"] == 0
+
+
+def test_large_json_bodies_are_gzipped_and_savings_reported(monkeypatch):
+    client = BackendClient(_Logger(), compression="gzip")
+    sent = {}
+
+    def fake_post(session, url, **kwargs):
+        sent.update(kwargs)
+        return _Response(status_code=200)
+
+    monkeypatch.setattr("agent.api_client.requests.Session.post", fake_post)
+    payload = {"items": [{"idempotency_key": f"key-{index}", "metric": {"word_count": 3}} for index in range(50)]}
+
+    client._post("http://example.com/api/sessions/3/ai-metrics/batch/", json=payload)
+
+    assert sent["headers"]["Content-Encoding"] == "gzip"
+    assert json.loads(gzip.decompress(sent["data"])) == payload
+    stats = client.http_report()["endpoints"]["/api/sessions/{id}/ai-metrics/batch/"]
+    assert stats["wire_bytes"] == len(sent["data"])
+    assert stats["bytes_saved"] > stats["wire_bytes"]
+
+
+def test_json_bodies_go_out_uncompressed_by_default(monkeypatch):
+    client = BackendClient(_Logger())
+    sent = {}
+
+    def fake_post(session, url, **kwargs):
+        sent.update(kwargs)
+        return _Response(status_code=200)
+
+    monkeypatch.setattr("agent.api_client.requests.Session.post", fake_post)
+    payload = {"items": [{"idempotency_key": f"key-{index}", "metric": {"word_count": 3}} for index in range(50)]}
+
+    client._post("http://example.com/api/sessions/3/ai-metrics/batch/", json=payload)
+
+    assert "Content-Encoding" not in sent["headers"]
+    assert json.loads(sent["data"]) == payload
@@ -0,0 +1,202 @@
+import threading
+import time
+
+import pytest
+
+from agent.pipeline import Pipeline, StageQueue
+
+
+class _Logger:
+    def __init__(self):
+        self.errors = []
+
+    def error(self, message, extra=None):
+        self.errors.append((message, extra))
+
+
+def _drain(queue):
+    return [item for _, item in queue.get_batch(100, timeout=0)]
+
+
+def test_drop_oldest_keeps_newest_items():
+    queue = StageQueue("q", maxsize=3, policy="drop_oldest")
+
+    results = [queue.put(index) for index in range(5)]
+
+    assert results == [True] * 5
+    assert _drain(queue) == [2, 3, 4]
+    assert queue.stats()["dropped"] == 2
+    assert queue.stats()["high_watermark"] == 3
+
+
+def test_drop_newest_rejects_incoming_items():
+    queue = StageQueue("q", maxsize=3, policy="drop_newest")
+
+    results = [queue.put(index) for index in range(5)]
+
+    assert results == [True, True, True, False, False]
+    assert _drain(queue) == [0, 1, 2]
+    assert queue.stats()["dropped"] == 2
+
+
+def test_block_waits_for_room_then_drops():
+    queue = StageQueue("q", maxsize=1, policy="block", block_timeout=0.05)
+    queue.put("a")
+
+    started = time.monotonic()
+    assert queue.put("b") is False
+    assert time.monotonic() - started >= 0.04
+
+    threading.Timer(0.02, lambda: queue.get_batch(1, timeout=0)).start()
+    assert queue.put("c") is True
+    assert queue.stats()["dropped"] == 1
+
+
+def test_unknown_policy_is_rejected():
+    with pytest.raises(ValueError):
+        StageQueue("q", maxsize=1, policy="drop_random")
+
+
+def test_pipeline_runs_stages_and_reports_metrics():
+    results = []
+    done = threading.Event()
+
+    def collect(items):
+        results.extend(items)
+        if len(results) == 10:
+            done.set()
+        return []
+
+    pipeline = Pipeline()
+    pipeline.add_stage("double", lambda items: [item * 2 for item in items], workers=2)
+    pipeline.add_stage("collect", collect, batch_size=4)
+
+    stop_event = threading.Event()
+    threads = pipeline.start(stop_event)
+    for index in range(10):
+        pipeline.submit(index)
+
+    assert done.wait(5)
+    stop_event.set()
+    for thread in threads:
+        thread.join(timeout=2)
+
+    assert sorted(results) == [index * 2 for index in range(10)]
+    assert {thread.name for thread in threads} == {"double-worker-0", "double-worker-1", "collect-worker-0"}
+
+    metrics = pipeline.metrics()
+    assert metrics["double"]["processed"] == 10
+    assert metrics["collect"]["processed"] == 10
+    assert metrics["double"]["queue"]["dropped"] == 0
+    assert metrics["double"]["latency_ms_p95"] >= metrics["double"]["latency_ms_p50"] >= 0.0
+
+
+def test_failing_handler_is_counted_and_worker_survives():
+    logger = _Logger()
+    seen = []
+    done = threading.Event()
+
+    def handler(items):
+        if items == ["bad"]:
+            raise RuntimeError("boom")
+        seen.extend(items)
+        done.set()
+        return []
+
+    pipeline = Pipeline(logger)
+    stage = pipeline.add_stage("flaky", handler)
+
+    stop_event = threading.Event()
+    threads = pipeline.start(stop_event)
+    pipeline.submit("bad")
+    pipeline.submit("good")
+
+    assert done.wait(5)
+    assert stage.alive_workers() == 1
+    stop_event.set()
+    for thread in threads:
+        thread.join(timeout=2)
+
+    assert seen == ["good"]
+    assert stage.metrics()["failed"] == 1
+    assert logger.errors[0][1]["metadata"]["stage"] == "flaky"
+
+
+def test_stage_scales_up_under_backlog_and_down_when_idle():
+    release = threading.Event()
+    pipeline = Pipeline()
+    stage = pipeline.add_stage(
+        "slow",
+        lambda items: release.wait(5) and [],
+        queue_size=50,
+        max_workers=3,
+        scale_up_depth=2,
+        idle_seconds=0.05,
+        cooldown_seconds=0,
+    )
+
+    stop_event = threading.Event()
+    pipeline.start(stop_event)
+    for index in range(20):
+        pipeline.submit(index)
+
+    pipeline.supervise()
+    pipeline.supervise()
+    pipeline.supervise()
+    assert stage.workers == 3
+    assert stage.metrics()["scale_ups"] == 2
+
+    release.set()
+    deadline = time.monotonic() + 5
+    while stage.workers > 1 and time.monotonic() < deadline:
+        time.sleep(0.06)
+        pipeline.supervise()
+
+    stop_event.set()
+    assert stage.workers == 1
+    assert stage.metrics()["scale_downs"] == 2
+    assert stage.metrics()["processed"] == 20
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_dead_worker_is_restarted():
+    logger = _Logger()
+    handled = threading.Event()
+
+    def handler(items):
+        if items == ["exit"]:
+            raise SystemExit
+        handled.set()
+        return []
+
+    pipeline = Pipeline(logger)
+    stage = pipeline.add_stage("fragile", handler)
+
+    stop_event = threading.Event()
+    pipeline.start(stop_event)
+    pipeline.submit("exit")
+    stage.threads[0].join(timeout=2)
+
+    pipeline.supervise()
+    pipeline.submit("ok")
+
+    assert handled.wait(5)
+    stop_event.set()
+    assert stage.alive_workers() == 1
+    assert stage.metrics()["restarts"] == 1
+    assert logger.errors[0][0] == "Pipeline worker restarted"
+
+
+def test_worker_limit_caps_a_scaled_stage():
+    pipeline = Pipeline()
+    stage = pipeline.add_stage("capped", lambda items: [], workers=2, max_workers=4, cooldown_seconds=0)
+
+    stop_event = threading.Event()
+    pipeline.start(stop_event)
+    stage.limit_workers(1)
+    pipeline.supervise()
+    pipeline.supervise()
+
+    assert stage.workers == 1
+    assert stage.metrics()["worker_limit"] == 1
+    stop_event.set()
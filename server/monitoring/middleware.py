@@ -0,0 +1,104 @@
+import io
+import zlib
+
+from django.conf import settings
+from django.http import JsonResponse
+
+try:
+    import zstandard
+except ImportError:  # optional; zstd bodies are refused without it
+    zstandard = None
+
+
+_CHUNK = 64 * 1024
+
+
+class RequestDecompressionMiddleware:
+    """
+    Inflates request bodies sent with Content-Encoding gzip, deflate or
+    zstd before views read them.
+
+    Output is capped at REQUEST_MAX_DECOMPRESSED_BYTES and inflated in
+    bounded chunks, so a small decompression bomb is rejected with 413
+    without ever being expanded in full. Unsupported encodings get 415,
+    corrupt bodies 400.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        encoding = request.headers.get("Content-Encoding", "").strip().lower()
+        if encoding in ("", "identity"):
+            return self.get_response(request)
+
+        limit = settings.REQUEST_MAX_DECOMPRESSED_BYTES
+        try:
+            body = self._decompress(request.body, encoding, limit)
+        except _Unsupported:
+            return JsonResponse({"error": f"Unsupported Content-Encoding: {encoding}"}, status=415)
+        except _TooLarge:
+            return JsonResponse({"error": f"Decompressed body exceeds {limit} bytes"}, status=413)
+        except (zlib.error, EOFError, ValueError) as exc:
+            return JsonResponse({"error": f"Invalid {encoding} body: {exc}"}, status=400)
+
+        request._body = body
+        request.META["CONTENT_LENGTH"] = str(len(body))
+        request.META.pop("HTTP_CONTENT_ENCODING", None)
+        return self.get_response(request)
+
+    def _decompress(self, data: bytes, encoding: str, limit: int) -> bytes:
+        if encoding in ("gzip", "x-gzip"):
+            inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == "deflate":
+            inflater = zlib.decompressobj()
+        elif encoding == "zstd" and zstandard is not None:
+            return self._decompress_zstd(data, limit)
+        else:
+            raise _Unsupported()
+
+        output = bytearray()
+        pending = data
+        while pending:
+            output += inflater.decompress(pending, _CHUNK)
+            if len(output) > limit:
+                raise _TooLarge()
+            pending = inflater.unconsumed_tail
+        output += inflater.flush()
+        if not inflater.eof:
+            raise EOFError("truncated stream")
+        if len(output) > limit:
+            raise _TooLarge()
+        return bytes(output)
+
+    def _decompress_zstd(self, data: bytes, limit: int) -> bytes:
+        try:
+            # stream_reader inflates lazily, so this pass holds one chunk at a
+            # time and stops as soon as the output passes `limit`.
+            reader = zstandard.ZstdDecompressor().stream_reader(io.BytesIO(data), read_across_frames=False)
+            inflated = 0
+            while chunk := reader.read(_CHUNK):
+                inflated += len(chunk)
+                if inflated > limit:
+                    raise _TooLarge()
+
+            # The output is now known to fit. stream_reader stops quietly at a
+            # truncated frame, so decode again to check the frame is complete
+            # and nothing follows it.
+            inflater = zstandard.ZstdDecompressor().decompressobj()
+            output = inflater.decompress(data)
+        except zstandard.ZstdError as exc:
+            raise ValueError(str(exc)) from exc
+        if not inflater.eof:
+            raise EOFError("truncated stream")
+        if inflater.unused_data:
+            raise ValueError("trailing data after zstd frame")
+        return output
+
+
+class _Unsupported(Exception):
+    pass
+
+
+class _TooLarge(Exception):
+    pass
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.11 on 2026-10-19 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("monitoring", "0008_aimetric_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="aimetric",
+            name="sparse_features",
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="aimetric",
+            name="sparse_features_dim",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
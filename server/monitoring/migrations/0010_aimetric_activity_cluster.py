@@ -0,0 +1,27 @@
+# Generated by Django 5.2.11 on 2026-10-19 00:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitoring', '0009_aimetric_sparse_features'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aimetric',
+            name='activity_cluster_id',
+            field=models.CharField(blank=True, max_length=16, null=True),
+        ),
+        migrations.AddField(
+            model_name='aimetric',
+            name='activity_seen_before',
+            field=models.BooleanField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='aimetric',
+            index=models.Index(fields=['session', 'activity_cluster_id'], name='monitoring__session_00451c_idx'),
+        ),
+    ]
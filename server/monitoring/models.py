@@ -120,6 +120,12 @@ class AIMetric(models.Model):
     ocr_text_hash = models.CharField(max_length=64, blank=True, null=True)
     feature_version = models.CharField(max_length=64)
     features = models.JSONField(default=dict)
+    # v2 hashed bag-of-words, kept as the agent's compressed bytes
+    # (zlib over delta-encoded uint32 indices + float32 values).
+    sparse_features = models.BinaryField(blank=True, null=True)
+    sparse_features_dim = models.PositiveIntegerField(blank=True, null=True)
+    activity_cluster_id = models.CharField(max_length=16, blank=True, null=True)
+    activity_seen_before = models.BooleanField(blank=True, null=True)
     productivity_score = models.FloatField()
     anomaly_score = models.FloatField()
     anomaly_label = models.CharField(max_length=32, choices=ANOMALY_LABEL_CHOICES)
@@ -136,6 +142,7 @@ class AIMetric(models.Model):
             models.Index(fields=["session", "created_at"]),
             models.Index(fields=["anomaly_label"]),
             models.Index(fields=["created_at"]),
+            models.Index(fields=["session", "activity_cluster_id"]),
         ]
 
     def __str__(self):
@@ -0,0 +1,194 @@
+import base64
+import json
+import zlib
+from unittest import mock
+
+from django.test import TestCase
+
+from monitoring.models import AIMetric, AgentSession, AgentToken
+
+
+def _payload(**overrides):
+    payload = {
+        "agent_timestamp": "2026-10-19T10:00:00+00:00",
+        "source_type": "screenshot",
+        "source_ref": "/tmp/shot.png",
+        "ocr_text_hash": None,
+        "feature_version": "v1",
+        "features": {"word_count": 3},
+        "productivity_score": 55.0,
+        "anomaly_score": 0.1,
+        "anomaly_label": "normal",
+        "model_info": {"name": "heuristic-edge-pipeline"},
+        "pipeline_status": "ok",
+    }
+    payload.update(overrides)
+    return payload
+
+
+def _fields():
+    return {
+        "agent_timestamp": "2026-10-19T09:00:00+00:00",
+        "source_type": "screenshot",
+        "source_ref": "/tmp/old.png",
+        "feature_version": "v1",
+        "features": {},
+        "productivity_score": 1.0,
+        "anomaly_score": 0.0,
+        "anomaly_label": "normal",
+        "model_info": {},
+        "pipeline_status": "ok",
+    }
+
+
+class AIMetricIngestTests(TestCase):
+    def setUp(self):
+        self.session = AgentSession.objects.create(
+            agent_name="agent-x",
+            agent_version="1.0.0",
+            hostname="host-1",
+            username="user-1",
+            ip_address="127.0.0.1",
+        )
+        AgentToken.objects.create(session=self.session, token="token-1")
+        self.url = f"/api/sessions/{self.session.id}/ai-metrics/"
+
+    def _post(self, payload, key="idem-1"):
+        return self.client.post(
+            self.url,
+            data=json.dumps(payload),
+            content_type="application/json",
+            HTTP_AUTHORIZATION="Bearer token-1",
+            HTTP_X_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_v2_sparse_features_are_stored_as_compressed_bytes(self):
+        raw = zlib.compress(b"\x01\x00\x00\x00" + b"\x00\x00\x80\x3f")
+        sparse = {
+            "encoding": "zlib-delta-u32-f32",
+            "dim": 262144,
+            "nnz": 1,
+            "data": base64.b64encode(raw).decode("ascii"),
+        }
+
+        response = self._post(_payload(feature_version="v2", sparse_features=sparse))
+
+        self.assertEqual(response.status_code, 201)
+        metric = AIMetric.objects.get()
+        self.assertEqual(bytes(metric.sparse_features), raw)
+        self.assertEqual(metric.sparse_features_dim, 262144)
+        self.assertEqual(metric.features, {"word_count": 3})
+
+    def test_v1_payload_leaves_sparse_columns_empty(self):
+        response = self._post(_payload())
+
+        self.assertEqual(response.status_code, 201)
+        metric = AIMetric.objects.get()
+        self.assertIsNone(metric.sparse_features)
+        self.assertIsNone(metric.sparse_features_dim)
+
+    def test_malformed_sparse_features_are_rejected(self):
+        bad = {"encoding": "zlib-delta-u32-f32", "dim": 16, "data": "not base64!"}
+
+        response = self._post(_payload(sparse_features=bad))
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(AIMetric.objects.exists())
+
+    def test_activity_cluster_fields_are_stored(self):
+        response = self._post(_payload(activity_cluster_id="0f1e2d3c4b5a6978", activity_seen_before=True))
+
+        self.assertEqual(response.status_code, 201)
+        metric = AIMetric.objects.get()
+        self.assertEqual(metric.activity_cluster_id, "0f1e2d3c4b5a6978")
+        self.assertTrue(metric.activity_seen_before)
+
+    def test_invalid_activity_seen_before_is_rejected(self):
+        response = self._post(_payload(activity_seen_before="yes"))
+
+        self.assertEqual(response.status_code, 400)
+
+
+class AIMetricBatchIngestTests(TestCase):
+    def setUp(self):
+        self.session = AgentSession.objects.create(
+            agent_name="agent-x",
+            agent_version="1.0.0",
+            hostname="host-1",
+            username="user-1",
+            ip_address="127.0.0.1",
+        )
+        AgentToken.objects.create(session=self.session, token="token-1")
+        self.url = f"/api/sessions/{self.session.id}/ai-metrics/batch/"
+
+    def _post(self, items):
+        return self.client.post(
+            self.url,
+            data=json.dumps({"items": items}),
+            content_type="application/json",
+            HTTP_AUTHORIZATION="Bearer token-1",
+        )
+
+    def test_batch_stores_valid_items_and_reports_each_status(self):
+        AIMetric.objects.create(
+            session=self.session,
+            idempotency_key="idem-old",
+            **_fields(),
+        )
+
+        response = self._post(
+            [
+                {"idempotency_key": "idem-1", "metric": _payload()},
+                {"idempotency_key": "idem-2", "metric": _payload(anomaly_label="critical")},
+                {"idempotency_key": "idem-1", "metric": _payload()},
+                {"idempotency_key": "idem-old", "metric": _payload()},
+                {"idempotency_key": "idem-3", "metric": _payload(anomaly_score=4)},
+            ]
+        )
+
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(
+            [result["status"] for result in body["results"]],
+            ["ok", "ok", "duplicate", "duplicate", "invalid"],
+        )
+        self.assertEqual((body["ok"], body["duplicate"], body["invalid"]), (2, 2, 1))
+        self.assertEqual(body["results"][0]["ai_metric_id"], body["results"][2]["ai_metric_id"])
+        self.assertIn("anomaly_score", body["results"][4]["error"])
+        self.assertEqual(AIMetric.objects.count(), 3)
+        self.assertEqual(AIMetric.objects.get(idempotency_key="idem-2").anomaly_label, "critical")
+
+    def test_repeating_a_batch_is_idempotent(self):
+        items = [{"idempotency_key": f"idem-{index}", "metric": _payload()} for index in range(20)]
+
+        first = self._post(items).json()
+        second = self._post(items).json()
+
+        self.assertEqual(first["ok"], 20)
+        self.assertEqual(second["duplicate"], 20)
+        self.assertEqual(AIMetric.objects.count(), 20)
+
+    def test_batch_requires_items(self):
+        self.assertEqual(self._post([]).status_code, 400)
+
+    def test_key_stored_concurrently_after_the_lookup_is_reported_as_duplicate(self):
+        raced = AIMetric.objects.create(session=self.session, idempotency_key="idem-2", **_fields())
+        manager_filter = AIMetric.objects.filter
+        lookups = []
+
+        def filter_before_race(*args, **kwargs):
+            # The existing-key lookup runs before another upload commits idem-2.
+            lookups.append(kwargs)
+            if len(lookups) == 1:
+                return manager_filter(*args, **kwargs).exclude(pk=raced.pk)
+            return manager_filter(*args, **kwargs)
+
+        with mock.patch.object(AIMetric.objects, "filter", side_effect=filter_before_race):
+            body = self._post(
+                [{"idempotency_key": f"idem-{index}", "metric": _payload()} for index in range(1, 4)]
+            ).json()
+
+        self.assertEqual([result["status"] for result in body["results"]], ["ok", "duplicate", "ok"])
+        self.assertEqual((body["ok"], body["duplicate"]), (2, 1))
+        self.assertEqual(body["results"][1]["ai_metric_id"], raced.pk)
+        self.assertEqual(AIMetric.objects.count(), 3)
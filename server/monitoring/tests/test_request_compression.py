@@ -0,0 +1,85 @@
+import gzip
+import json
+import zlib
+from unittest import skipUnless
+
+from django.test import TestCase, override_settings
+
+from monitoring.models import AIMetric, AgentSession, AgentToken
+from monitoring.tests.test_ai_metric_ingest import _payload
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class RequestDecompressionTests(TestCase):
+    def setUp(self):
+        self.session = AgentSession.objects.create(
+            agent_name="agent-x",
+            agent_version="1.0.0",
+            hostname="host-1",
+            username="user-1",
+            ip_address="127.0.0.1",
+        )
+        AgentToken.objects.create(session=self.session, token="token-1")
+        self.url = f"/api/sessions/{self.session.id}/ai-metrics/batch/"
+
+    def _post(self, body, encoding):
+        return self.client.post(
+            self.url,
+            data=body,
+            content_type="application/json",
+            HTTP_AUTHORIZATION="Bearer token-1",
+            HTTP_CONTENT_ENCODING=encoding,
+        )
+
+    def _batch(self, count=3):
+        items = [{"idempotency_key": f"idem-{index}", "metric": _payload()} for index in range(count)]
+        return json.dumps({"items": items}).encode("utf-8")
+
+    def test_gzip_and_deflate_bodies_are_inflated(self):
+        response = self._post(gzip.compress(self._batch()), "gzip")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["ok"], 3)
+
+        response = self._post(zlib.compress(self._batch(5)), "deflate")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["ok"], 2)
+        self.assertEqual(AIMetric.objects.count(), 5)
+
+    @override_settings(REQUEST_MAX_DECOMPRESSED_BYTES=64 * 1024)
+    def test_decompression_bomb_is_rejected(self):
+        bomb = gzip.compress(b" " * (8 * 1024 * 1024))
+        self.assertLess(len(bomb), 64 * 1024)
+
+        response = self._post(bomb, "gzip")
+
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(AIMetric.objects.exists())
+
+    def test_unknown_or_corrupt_encodings_are_rejected(self):
+        self.assertEqual(self._post(self._batch(), "br").status_code, 415)
+        self.assertEqual(self._post(b"not gzip at all", "gzip").status_code, 400)
+        self.assertEqual(self._post(gzip.compress(self._batch())[:-12], "gzip").status_code, 400)
+
+    @skipUnless(zstandard is not None, "zstandard is not installed")
+    def test_zstd_bodies_are_inflated_and_truncated_frames_rejected(self):
+        frame = zstandard.ZstdCompressor().compress(self._batch())
+
+        self.assertEqual(self._post(frame[:-8], "zstd").status_code, 400)
+        self.assertEqual(self._post(frame + b"junk", "zstd").status_code, 400)
+        self.assertEqual(self._post(b"not zstd at all", "zstd").status_code, 400)
+        self.assertFalse(AIMetric.objects.exists())
+
+        response = self._post(frame, "zstd")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["ok"], 3)
+
+    @skipUnless(zstandard is not None, "zstandard is not installed")
+    @override_settings(REQUEST_MAX_DECOMPRESSED_BYTES=64 * 1024)
+    def test_zstd_decompression_bomb_is_rejected(self):
+        bomb = zstandard.ZstdCompressor().compress(b" " * (8 * 1024 * 1024))
+
+        self.assertEqual(self._post(bomb, "zstd").status_code, 413)
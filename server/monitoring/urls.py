@@ -10,6 +10,7 @@ urlpatterns = [
     path("sessions/<int:session_id>/heartbeat/", views.heartbeat),
     path("sessions/<int:session_id>/recordings/", views.upload_recording),
     path("sessions/<int:session_id>/ai-metrics/", views.create_ai_metric),
+    path("sessions/<int:session_id>/ai-metrics/batch/", views.create_ai_metric_batch),
 
     path('dashboard/', dashboard_home, name='dashboard_home'),
     path('', dashboard_home, name='home'),
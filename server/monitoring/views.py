@@ -1,3 +1,5 @@
+import base64
+import binascii
 import json
 import secrets
 from datetime import datetime
@@ -6,6 +8,7 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import render
 from django.core.paginator import Paginator
+from django.db import IntegrityError, transaction
 from django.db.models import Q
 from django.utils.timezone import now
 
@@ -21,6 +24,11 @@ from .auth import require_agent_token
 from .services.analytics import get_session_analytics
 
 
+SPARSE_FEATURES_ENCODING = "zlib-delta-u32-f32"
+SPARSE_FEATURES_MAX_BYTES = 256 * 1024
+AI_METRIC_BATCH_MAX_ITEMS = 500
+
+
 # ==============================
 # SESSION CREATION
 # ==============================
@@ -160,6 +168,112 @@ def create_ai_metric(request, session_id):
     except json.JSONDecodeError:
         return JsonResponse({"error": "Invalid JSON"}, status=400)
 
+    try:
+        fields = _validate_ai_metric(data)
+    except ValueError as exc:
+        return JsonResponse({"error": str(exc)}, status=400)
+
+    existing = AIMetric.objects.filter(idempotency_key=idempotency_key).first()
+    if existing:
+        return JsonResponse({"ai_metric_id": existing.id, "status": "duplicate"}, status=200)
+
+    metric = AIMetric.objects.create(session_id=session_id, idempotency_key=idempotency_key, **fields)
+
+    return JsonResponse({"ai_metric_id": metric.id, "status": "ok"}, status=201)
+
+
+@csrf_exempt
+@require_agent_token
+def create_ai_metric_batch(request, session_id):
+    """
+    Ingests {"items": [{"idempotency_key": ..., "metric": {...}}, ...]}
+    in one transaction. Each item gets its own status: "ok" (stored by
+    this request), "duplicate" (key already stored, by an earlier or a
+    concurrent request, or repeated in the batch) or "invalid" with an
+    error; one bad item does not reject the others.
+    """
+    if request.method != "POST":
+        return JsonResponse({"error": "POST required"}, status=405)
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({"error": "Invalid JSON"}, status=400)
+
+    items = data.get("items") if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return JsonResponse({"error": "items must be a non-empty list"}, status=400)
+    if len(items) > AI_METRIC_BATCH_MAX_ITEMS:
+        return JsonResponse({"error": f"At most {AI_METRIC_BATCH_MAX_ITEMS} items per batch"}, status=400)
+
+    results = []
+    pending = {}
+    for item in items:
+        key = item.get("idempotency_key") if isinstance(item, dict) else None
+        if not isinstance(key, str) or not key or len(key) > 64:
+            results.append(
+                {
+                    "idempotency_key": key,
+                    "status": "invalid",
+                    "error": "idempotency_key must be a string of at most 64 characters",
+                }
+            )
+            continue
+        try:
+            fields = _validate_ai_metric(item.get("metric"))
+        except ValueError as exc:
+            results.append({"idempotency_key": key, "status": "invalid", "error": str(exc)})
+            continue
+
+        result = {"idempotency_key": key, "status": "duplicate" if key in pending else "ok"}
+        if key not in pending:
+            pending[key] = AIMetric(session_id=session_id, idempotency_key=key, **fields)
+        results.append(result)
+
+    with transaction.atomic():
+        existing = set(
+            AIMetric.objects.filter(idempotency_key__in=list(pending)).values_list("idempotency_key", flat=True)
+        )
+        new_metrics = [metric for key, metric in pending.items() if key not in existing]
+        try:
+            with transaction.atomic():
+                AIMetric.objects.bulk_create(new_metrics)
+        except IntegrityError:
+            # A concurrent upload stored some of these keys after the lookup.
+            # Insert one at a time so each key is "ok" only if stored here.
+            for metric in new_metrics:
+                try:
+                    with transaction.atomic():
+                        metric.save(force_insert=True)
+                except IntegrityError:
+                    existing.add(metric.idempotency_key)
+    # Read after commit so rows stored by a concurrent upload are visible.
+    stored = dict(
+        AIMetric.objects.filter(idempotency_key__in=list(pending)).values_list("idempotency_key", "id")
+    )
+
+    for result in results:
+        key = result["idempotency_key"]
+        if result["status"] == "invalid":
+            continue
+        if key in existing:
+            result["status"] = "duplicate"
+        result["ai_metric_id"] = stored.get(key)
+
+    counts = {status: 0 for status in ("ok", "duplicate", "invalid")}
+    for result in results:
+        counts[result["status"]] += 1
+    return JsonResponse({"results": results, **counts}, status=200)
+
+
+def _validate_ai_metric(data) -> dict:
+    """
+    Validates one AI metric payload and returns the AIMetric field values.
+    Raises ValueError with the client-facing message.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("metric must be an object")
+
     required_fields = [
         "agent_timestamp",
         "source_type",
@@ -174,51 +288,93 @@ def create_ai_metric(request, session_id):
     ]
     missing = [field for field in required_fields if field not in data]
     if missing:
-        return JsonResponse({"error": f"Missing fields: {', '.join(missing)}"}, status=400)
+        raise ValueError(f"Missing fields: {', '.join(missing)}")
 
     if data["source_type"] not in {"screenshot", "recording_window"}:
-        return JsonResponse({"error": "Invalid source_type"}, status=400)
+        raise ValueError("Invalid source_type")
     if data["anomaly_label"] not in {"normal", "suspicious", "critical"}:
-        return JsonResponse({"error": "Invalid anomaly_label"}, status=400)
+        raise ValueError("Invalid anomaly_label")
     if data["pipeline_status"] not in {"ok", "partial", "failed"}:
-        return JsonResponse({"error": "Invalid pipeline_status"}, status=400)
+        raise ValueError("Invalid pipeline_status")
     if not isinstance(data.get("features"), dict):
-        return JsonResponse({"error": "features must be an object"}, status=400)
+        raise ValueError("features must be an object")
     if not isinstance(data.get("model_info"), dict):
-        return JsonResponse({"error": "model_info must be an object"}, status=400)
+        raise ValueError("model_info must be an object")
+
+    sparse_features, sparse_features_dim = _decode_sparse_features(data.get("sparse_features"))
+
+    activity_cluster_id = data.get("activity_cluster_id")
+    if activity_cluster_id is not None and (
+        not isinstance(activity_cluster_id, str) or len(activity_cluster_id) > 16
+    ):
+        raise ValueError("activity_cluster_id must be a string of at most 16 characters")
+    activity_seen_before = data.get("activity_seen_before")
+    if activity_seen_before is not None and not isinstance(activity_seen_before, bool):
+        raise ValueError("activity_seen_before must be a boolean")
 
-    productivity_score = float(data["productivity_score"])
-    anomaly_score = float(data["anomaly_score"])
+    try:
+        productivity_score = float(data["productivity_score"])
+        anomaly_score = float(data["anomaly_score"])
+    except (TypeError, ValueError):
+        raise ValueError("productivity_score and anomaly_score must be numbers")
     if productivity_score < 0 or productivity_score > 100:
-        return JsonResponse({"error": "productivity_score must be between 0 and 100"}, status=400)
+        raise ValueError("productivity_score must be between 0 and 100")
     if anomaly_score < 0 or anomaly_score > 1:
-        return JsonResponse({"error": "anomaly_score must be between 0 and 1"}, status=400)
+        raise ValueError("anomaly_score must be between 0 and 1")
 
-    existing = AIMetric.objects.filter(idempotency_key=idempotency_key).first()
-    if existing:
-        return JsonResponse({"ai_metric_id": existing.id, "status": "duplicate"}, status=200)
+    try:
+        agent_timestamp = datetime.fromisoformat(str(data["agent_timestamp"]).replace("Z", "+00:00"))
+    except ValueError:
+        raise ValueError("Invalid agent_timestamp")
+
+    return {
+        "agent_timestamp": agent_timestamp,
+        "source_type": data["source_type"],
+        "source_ref": data["source_ref"],
+        "ocr_text_hash": data.get("ocr_text_hash"),
+        "feature_version": data["feature_version"],
+        "features": data["features"],
+        "sparse_features": sparse_features,
+        "sparse_features_dim": sparse_features_dim,
+        "activity_cluster_id": activity_cluster_id,
+        "activity_seen_before": activity_seen_before,
+        "productivity_score": productivity_score,
+        "anomaly_score": anomaly_score,
+        "anomaly_label": data["anomaly_label"],
+        "model_info": data["model_info"],
+        "pipeline_status": data["pipeline_status"],
+        "error_code": data.get("error_code"),
+        "error_message": data.get("error_message"),
+    }
 
-    agent_timestamp_raw = data["agent_timestamp"].replace("Z", "+00:00")
-
-    metric = AIMetric.objects.create(
-        session_id=session_id,
-        agent_timestamp=datetime.fromisoformat(agent_timestamp_raw),
-        source_type=data["source_type"],
-        source_ref=data["source_ref"],
-        ocr_text_hash=data.get("ocr_text_hash"),
-        feature_version=data["feature_version"],
-        features=data["features"],
-        productivity_score=productivity_score,
-        anomaly_score=anomaly_score,
-        anomaly_label=data["anomaly_label"],
-        model_info=data["model_info"],
-        pipeline_status=data["pipeline_status"],
-        error_code=data.get("error_code"),
-        error_message=data.get("error_message"),
-        idempotency_key=idempotency_key,
-    )
 
-    return JsonResponse({"ai_metric_id": metric.id, "status": "ok"}, status=201)
+def _decode_sparse_features(payload):
+    """
+    Validates the optional sparse_features object and returns
+    (compressed bytes, dim). The bytes are stored as sent, never inflated.
+    """
+    if payload is None:
+        return None, None
+    if not isinstance(payload, dict):
+        raise ValueError("sparse_features must be an object")
+    if payload.get("encoding") != SPARSE_FEATURES_ENCODING:
+        raise ValueError("Unsupported sparse_features encoding")
+
+    dim = payload.get("dim")
+    if not isinstance(dim, int) or isinstance(dim, bool) or dim <= 0:
+        raise ValueError("sparse_features.dim must be a positive integer")
+
+    data = payload.get("data")
+    if not isinstance(data, str):
+        raise ValueError("sparse_features.data must be a base64 string")
+    try:
+        raw = base64.b64decode(data, validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError("sparse_features.data is not valid base64")
+    if len(raw) > SPARSE_FEATURES_MAX_BYTES:
+        raise ValueError("sparse_features too large")
+
+    return raw, dim
 
 
 # ==============================